@@ -1,14 +1,46 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from startup import LazyClient, StartupReport, warm_in_background
+startup_report = StartupReport()  # First, so the import phase below is timed
+from flask import Flask, request, jsonify, render_template, send_file, send_from_directory, Response, stream_with_context, has_request_context, g, url_for
 import requests
 import os
 from dotenv import load_dotenv
-import flet as ft
-from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
-import assemblyai as aai
-import google.generativeai as genai
 import logging  # Add this import
-import io
+import json
+import queue
+import threading
+import time
+import contextvars
+import math
+from urllib.parse import urljoin
+from contextlib import contextmanager
+from functools import partial
+from http_client import PooledHTTPClient
+from audio_relay import AudioRelay
+from blob_store import BlobStore, valid_key
+from cache import build_cache, make_key, hash_content
+from fallback_audio import FallbackAudio
+from voice_catalog import VoiceCatalog
+from session_store import build_session_store
+from history_window import HistoryWindow
+from single_flight import SingleFlight
+from circuit_breaker import AdaptiveTimeout, CircuitBreaker, CircuitOpenError
+from tts_chunks import MURF_MAX_CHARS, split_text, iter_synthesized
+from voice_stream import sse_event, iter_text, stream_speech
+from stt_stream import StreamingTranscription
+from metrics import REGISTRY, Counter, Histogram
+from uploads import SpooledUploadRequest, UploadReader, UploadStats, copy_upload, open_upload
+from audio_preprocess import AudioPreprocessor
+from jobs import JobError, JobQueue, QueueFull, SQLiteJobStore
+from rate_limit import Limit, RateLimited, build_rate_limiter
+from pipeline import Middleware, NoSpeechError, Pipeline, ProgressEvents, RetryStages, Stage, StageFailed, TranscriptionError, Turn
+
+try:
+    from flask_sock import Sock  # Optional: enables the real-time /ws/transcribe endpoint
+except ImportError:
+    Sock = None
+startup_report.mark("imports")
 # Initialize logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +49,62 @@ logging.basicConfig(level=logging.INFO)
 load_dotenv()
 
 app = Flask(__name__)
+# Behind N trusted proxies (e.g. the sticky router in workers.py), take the
+# client address from X-Forwarded-For so per-IP rate limits still apply per client
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Per-stage latency and upstream error metrics, exposed on /metrics
+STAGE_VENDORS = {"stt": "assemblyai", "llm": "gemini", "tts": "murf", "fallback": "murf"}
+stage_seconds = Histogram(
+    "voice_agent_stage_seconds",
+    "Latency of one voice pipeline stage",
+    ["stage", "route", "voice"]
+)
+upstream_errors = Counter(
+    "voice_agent_upstream_errors_total",
+    "Failed calls to an upstream vendor",
+    ["vendor", "stage", "route"]
+)
+fallback_responses = Counter(
+    "voice_agent_fallback_responses_total",
+    "Error responses, by whether their fallback clip was ready",
+    ["route", "ready"]
+)
+
+# Route label for work done outside a request (set by background job workers)
+job_route = contextvars.ContextVar("job_route", default="background")
+
+def route_label():
+    """Flask endpoint of the current request (the job's route, or "background", outside requests)"""
+    if has_request_context() and request.endpoint:
+        return request.endpoint
+    return job_route.get()
+
+def counts_as_upstream_error(exc):
+    """Rejections never reached the vendor, and silence isn't the vendor's fault"""
+    return not isinstance(exc, (CircuitOpenError, RateLimited, NoSpeechError))
+
+def record_upstream_error(stage, route=None):
+    """Count a failed vendor call; each code path records its failures in one place only
+
+    Pipeline stages are counted by StageMetrics, the streaming paths by
+    timed_llm_stream / route_synthesizer and fallback clips by
+    render_fallback_clip. stage_timer only measures latency.
+    """
+    vendor = STAGE_VENDORS.get(stage.split("_", 1)[0], "unknown")
+    upstream_errors.inc(vendor=vendor, stage=stage, route=route or route_label())
+
+@contextmanager
+def stage_timer(stage, route=None, voice=""):
+    """Time a stage (successful or not); errors are counted by the caller"""
+    route = route or route_label()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage=stage, route=route, voice=voice)
 
 from flask_cors import CORS
 CORS(app)
@@ -27,9 +115,7 @@ MURF_API_KEY = os.getenv("MURF_API_KEY")
 AAI_API_KEY = os.getenv("AAI_API_KEY")   # Make sure to set this in your .env file
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if AAI_API_KEY:
-    aai.settings.api_key = AAI_API_KEY
-else:
+if not AAI_API_KEY:
     logger.error("AssemblyAI API key not found in environment variables")
 
 if not all([AAI_API_KEY, MURF_API_KEY, GEMINI_API_KEY]):
@@ -43,37 +129,76 @@ if not all([AAI_API_KEY, MURF_API_KEY, GEMINI_API_KEY]):
     if not GEMINI_API_KEY: missing.append("Gemini")
     logger.critical(f"Missing API keys for: {', '.join(missing)}")
 
-genai.configure(api_key=GEMINI_API_KEY)
+# Vendor SDKs are imported and configured on first use (or by the background
+# warm-up below), once per process, so they stay off the cold-start path
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
 
-# Replace your current genai configuration with this:
-genai.configure(
-    api_key=os.getenv("GEMINI_API_KEY"),
-    transport='rest',
-    client_options={
-        "api_endpoint": "generativelanguage.googleapis.com/v1beta"
-    }
-)
+def build_gemini_model():
+    genai = startup_report.import_module("google.generativeai")
+    genai.configure(api_key=GEMINI_API_KEY)
+    gemini = genai.GenerativeModel(GEMINI_MODEL)
+    logger.info(f"Gemini model {GEMINI_MODEL} initialized")
+    return gemini
 
-aai.settings.api_key = AAI_API_KEY
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-pro')
+def configure_assemblyai():
+    aai = startup_report.import_module("assemblyai")
+    aai.settings.api_key = AAI_API_KEY
+    # Vendor base URLs can be pointed elsewhere (e.g. at fake_vendors for benchmarks)
+    aai.settings.base_url = os.getenv("AAI_BASE_URL", aai.settings.base_url)
+    return aai
 
-try:
-    model = genai.GenerativeModel('gemini-pro')
-    print("Gemini model initialized successfully")
-except Exception as e:
-    print(f"Failed to initialize Gemini model: {str(e)}")
+gemini_model = LazyClient("gemini", build_gemini_model)
+assemblyai_sdk = LazyClient("assemblyai", configure_assemblyai)
+startup_report.mark("config")
 # Configuration for file uploads
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'wav', 'mp3', 'ogg', 'webm'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB limit
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-chat_history_store = {}
+# Audio blobs (uploads, relayed TTS clips, fallback clips) are content-addressed
+# files in sharded directories under BLOB_DIR, trimmed by size and age in the
+# background and served from /blobs/<store>/<key><ext>
+BLOB_DIR = os.getenv("BLOB_DIR", "data/blobs")
+
+def build_blob_store(name, max_mb="0", max_age="0"):
+    prefix = f"{name.upper()}_STORE"
+    return BlobStore(
+        os.path.join(BLOB_DIR, name),
+        max_bytes=int(os.getenv(f"{prefix}_MAX_MB", max_mb)) * 1024 * 1024,
+        max_age=int(os.getenv(f"{prefix}_MAX_AGE", max_age)),
+        compact_interval=int(os.getenv("BLOB_COMPACT_INTERVAL", "600"))
+    )
+
+blob_stores = {
+    "uploads": build_blob_store("uploads", max_mb="512", max_age=str(7 * 24 * 3600)),
+    "tts": build_blob_store("tts", max_mb="1024", max_age=str(30 * 24 * 3600)),
+    "fallback": build_blob_store("fallback"),  # A fixed, small set of clips: never trimmed
+}
+# Conversation history: bounded (idle TTL, LRU, per-session cap); SESSION_BACKEND
+# selects memory, sqlite or redis so several workers can share conversations
+chat_history_store = build_session_store()
+
+def summarize_history(summary, messages):
+    """Fold older turns into the running conversation summary"""
+    transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+    prompt = (
+        "Update the running summary of a voice conversation with the new turns below. "
+        "Keep names, facts, preferences and open questions; drop small talk. "
+        "Answer with the updated summary only, in at most 150 words.\n\n"
+        f"Current summary: {summary or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    vendor_budget("gemini_requests")
+    with gemini_breaker.guard():
+        response = gemini_model.get().generate_content(prompt, request_options=gemini_options())
+    return response.text.strip()  # A blocked summary is not a Gemini outage
+
+# Prompt history: summary + latest turns within HISTORY_TOKEN_BUDGET
+history_window = HistoryWindow(
+    chat_history_store,
+    summarize_history,
+    token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+)
 # Murf API Configuration
-MURF_BASE_URL = "https://api.murf.ai/v1"
+MURF_BASE_URL = os.getenv("MURF_BASE_URL", "https://api.murf.ai/v1")
 GENERATE_ENDPOINT = f"{MURF_BASE_URL}/speech/generate"
 VOICES_ENDPOINT = f"{MURF_BASE_URL}/speech/voices"
 
@@ -93,38 +218,677 @@ def get_auth_headers():
         "Content-Type": "application/json"
     }
 
+# Shared keep-alive connection pool for every Murf call (avoids a new TCP+TLS
+# handshake per request). Timeouts are (connect, read) per endpoint.
+murf_http = PooledHTTPClient(
+    headers=get_auth_headers(),
+    pool_size=int(os.getenv("MURF_POOL_SIZE", "10")),
+    pool_timeout=float(os.getenv("MURF_POOL_TIMEOUT", "5")),
+    retries=int(os.getenv("MURF_RETRIES", "2")),
+    backoff_factor=float(os.getenv("MURF_RETRY_BACKOFF", "0.3")),
+    timeouts={
+        "generate": (3.05, 15),
+        "fallback": (3.05, 10),
+        "voices": (3.05, 5),
+    }
+)
+
+# Voice catalogue: loaded once, refreshed in the background, read from memory
+voice_catalog = VoiceCatalog(
+    murf_http,
+    VOICES_ENDPOINT,
+    DEFAULT_VOICES,
+    refresh_interval=int(os.getenv("VOICE_REFRESH_INTERVAL", "3600")),
+    shared_path=os.getenv("VOICE_CATALOG_PATH") or None
+)
+
 def get_valid_voices(force_refresh=False):
-    """Fetch and cache available voice IDs from Murf API"""
-    global DEFAULT_VOICES
-    
-    try:
-        response = requests.get(
-            VOICES_ENDPOINT,
-            headers=get_auth_headers(),
-            timeout=5
+    """Available voice IDs from the in-memory catalogue (DEFAULT_VOICES until loaded)"""
+    if force_refresh:
+        voice_catalog.refresh(force=True)
+    return voice_catalog.voice_ids()
+
+# Long LLM answers are synthesised in sentence-aligned chunks, several at once
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "3000"))
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))
+
+# POST /generate_audio/batch: many texts per request, synthesised concurrently
+TTS_BATCH_WORKERS = int(os.getenv("TTS_BATCH_WORKERS", "8"))
+TTS_BATCH_MAX_ITEMS = int(os.getenv("TTS_BATCH_MAX_ITEMS", "500"))
+
+# TTS results cache. Murf audio URLs expire, so keep the TTL below their lifetime.
+tts_cache = build_cache(
+    "tts",
+    max_entries=int(os.getenv("TTS_CACHE_SIZE", "1000")),
+    ttl=int(os.getenv("TTS_CACHE_TTL", str(24 * 3600))),
+    disk_path=os.getenv("TTS_CACHE_PATH")
+)
+
+# AUDIO_DELIVERY=relay: clients get /audio/<tts cache key> URLs and this server
+# streams the clip over the pooled Murf connection (no extra connection from the
+# client to Murf's CDN); finished clips are kept in memory for replays
+AUDIO_DELIVERY = os.getenv("AUDIO_DELIVERY", "url")
+RELAY_PREFIX = "/audio/"
+audio_relay = AudioRelay(
+    murf_http,
+    lambda key: tts_cache.backend.get(key),  # Murf URL of a clip, without counting a cache lookup
+    max_bytes=int(os.getenv("AUDIO_RELAY_CACHE_MB", "64")) * 1024 * 1024,
+    store=blob_stores["tts"]
+)
+
+# Concurrent identical Murf / Gemini requests are coalesced into one upstream call
+murf_flight = SingleFlight("murf")
+llm_flight = SingleFlight("gemini")
+coalescers = [murf_flight, llm_flight]  # asgi.py adds its async counterparts
+
+# Per-vendor circuit breakers: after CIRCUIT_FAILURES consecutive failures a vendor
+# is not called for CIRCUIT_RESET_SECONDS (requests fail fast to cached or
+# pre-rendered fallbacks), then one probe call decides whether it is back.
+# Read timeouts follow each vendor's recent p99 latency, capped by the static ones.
+ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "1") == "1"
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+
+def vendor_failure(e):
+    """True unless the vendor rejected our request itself (a 4xx other than 429)"""
+    status = getattr(e, "status", None)
+    if not isinstance(status, int):
+        status = getattr(e, "code", None)  # google-api-core errors carry the HTTP status as .code
+    if not isinstance(status, int):
+        # requests' and httpx's HTTP errors (raise_for_status) carry the response
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+def build_breaker(vendor):
+    return CircuitBreaker(
+        vendor,
+        failure_threshold=int(os.getenv("CIRCUIT_FAILURES", "5")),
+        reset_timeout=float(os.getenv("CIRCUIT_RESET_SECONDS", "30")),
+        is_failure=vendor_failure,
+        timeout=AdaptiveTimeout(
+            floor=float(os.getenv("ADAPTIVE_TIMEOUT_FLOOR", "5")),
+            multiplier=float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2"))
         )
-        
-        if response.status_code == 200:
-            voices_data = response.json()
-            
-            # Handle different API response formats
-            if isinstance(voices_data, list):
-                voice_ids = [v.get("voiceId") for v in voices_data if v.get("voiceId")]
-            elif isinstance(voices_data, dict):
-                voice_ids = [v.get("voiceId") for v in voices_data.get("voices", []) if v.get("voiceId")]
-            else:
-                voice_ids = DEFAULT_VOICES
-            
-            if voice_ids:  # Update defaults if we got valid voices
-                DEFAULT_VOICES = voice_ids
-            return voice_ids
-            
+    )
+
+stt_breaker = build_breaker("assemblyai")
+gemini_breaker = build_breaker("gemini")
+murf_breaker = build_breaker("murf")
+breakers = [stt_breaker, gemini_breaker, murf_breaker]
+
+def murf_timeout(endpoint):
+    """(connect, read) timeout for a Murf call; the endpoint's static read timeout is the ceiling"""
+    connect, read = murf_http.timeout_for(endpoint)
+    return (connect, murf_breaker.read_timeout(read)) if ADAPTIVE_TIMEOUTS else (connect, read)
+
+def gemini_options():
+    """request_options for a single-shot Gemini call"""
+    return {"timeout": gemini_breaker.read_timeout(GEMINI_TIMEOUT) if ADAPTIVE_TIMEOUTS else GEMINI_TIMEOUT}
+
+# Rate limits (token buckets): per client IP and per chat session on the routes
+# that call vendors, plus global per-vendor budgets so bursts stay under the
+# vendors' quotas. Values look like "120/min"; empty or 0 disables a limit.
+# RATE_LIMIT_BACKEND=sqlite|redis shares the buckets between worker processes.
+rate_limiter = build_rate_limiter({
+    "ip": Limit.parse("ip", os.getenv("RATE_LIMIT_IP", "120/min")),
+    "session": Limit.parse("session", os.getenv("RATE_LIMIT_SESSION", "30/min")),
+    "murf_chars": Limit.parse("murf_chars", os.getenv("MURF_CHARS_BUDGET", "")),
+    "gemini_requests": Limit.parse("gemini_requests", os.getenv("GEMINI_REQUESTS_BUDGET", "")),
+    "aai_requests": Limit.parse("aai_requests", os.getenv("AAI_REQUESTS_BUDGET", "")),
+    # Forced /get_voices?refresh=1 reloads, shared by all clients
+    "voice_refresh": Limit.parse("voice_refresh", os.getenv("VOICE_REFRESH_LIMIT", "6/min")),
+})
+VENDOR_BUDGET_MAX_WAIT = float(os.getenv("VENDOR_BUDGET_MAX_WAIT", "2"))
+RATE_LIMITED_ENDPOINTS = {
+    "chat_with_history", "generate_audio", "generate_audio_batch", "echo_tts", "query_llm",
+    "process_audio", "test_pipeline", "transcribe_file", "handle_recording_stop",
+    "live_transcribe",  # The handshake here, then every turn again (see live_transcribe)
+}
+
+def vendor_budget(name, cost=1):
+    """Spend `cost` from a global vendor budget, waiting up to VENDOR_BUDGET_MAX_WAIT; raises RateLimited"""
+    rate_limiter.acquire(name, cost=cost, max_wait=VENDOR_BUDGET_MAX_WAIT)
+
+def request_limit_error(endpoint, client_ip, session_id=None):
+    """(429 payload, Retry-After seconds) if the client is over its per-IP or per-session limit, else None"""
+    if endpoint not in RATE_LIMITED_ENDPOINTS:
+        return None
+    checks = [("ip", client_ip)] + ([("session", session_id)] if session_id else [])
+    for name, key in checks:
+        retry_after = rate_limiter.try_take(name, key)
+        if retry_after:
+            return rate_limited_payload(name, retry_after)
+    return None
+
+def rate_limited_payload(limit, retry_after):
+    retry_after = math.ceil(retry_after)
+    return {
+        "error": "rate_limited",
+        "limit": limit,
+        "message": "Too many requests, please slow down",
+        "retry_after": retry_after
+    }, retry_after
+
+def rate_limited_response(payload, retry_after):
+    response = jsonify(payload)
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.before_request
+def enforce_rate_limits():
+    session_id = (request.view_args or {}).get("session_id") or request.args.get("session_id")
+    limited = request_limit_error(request.endpoint, request.remote_addr, session_id)
+    if limited:
+        return rate_limited_response(*limited)
+
+def generate_text(prompt):
+    """Single-shot Gemini completion; identical prompts in flight share one call"""
+    def call_gemini():
+        vendor_budget("gemini_requests")
+        with gemini_breaker.guard():
+            response = gemini_model.get().generate_content(prompt, request_options=gemini_options())
+        return response.text  # Raises ValueError for a blocked reply: the prompt's fault, not Gemini's
+
+    return llm_flight.do(make_key("llm", prompt), call_gemini)
+
+def send_chat(history, text):
+    """One Gemini chat turn on top of `history`; returns the reply text"""
+    vendor_budget("gemini_requests")
+    with gemini_breaker.guard():
+        response = gemini_model.get().start_chat(history=history).send_message(text, request_options=gemini_options())
+    return response.text
+
+def gemini_stream(start_stream):
+    """Iterate a streamed Gemini reply under the Gemini budget and circuit breaker"""
+    vendor_budget("gemini_requests")
+    with gemini_breaker.guard(record_latency=False):  # A whole stream's duration isn't a latency sample
+        yield from start_stream()
+
+def error_status(e, default=500):
+    """503 when a vendor was skipped because its circuit is open, 429 when over a rate budget, else `default`"""
+    if isinstance(e, CircuitOpenError):
+        return 503
+    if isinstance(e, RateLimited):
+        return 429
+    return default
+
+def tts_payload(text, voice_id):
+    """Body of a Murf generate request"""
+    return {
+        "text": text,
+        "voiceId": voice_id,
+        "format": "mp3",
+        "sampleRate": 24000
+    }
+
+def tts_cache_key(payload):
+    """Content address of a Murf generate request"""
+    return make_key("tts", payload["text"], payload["voiceId"], payload["format"], payload["sampleRate"])
+
+class MurfAPIError(Exception):
+    """Raised when Murf returns an error status or no audio URL"""
+    def __init__(self, message, status=None, response=None, text=""):
+        super().__init__(message)
+        self.status = status
+        self.response = response
+        self.text = text
+
+def extract_audio_url(response_data):
+    """Pull the audio URL out of a Murf response (field name varies by API version)"""
+    return (response_data.get("audioFile") or
+            response_data.get("audioStreamUrl") or
+            response_data.get("url") or
+            response_data.get("audio_url"))
+
+def synthesize_speech(text, voice_id="en-US-Natalie", endpoint="generate", url=None, route=None, deliver="url"):
+    """Generate speech for one chunk of text and return the Murf audio URL
+
+    Results are cached on (text, voiceId, format, sampleRate), so a repeated
+    phrase costs no Murf call at all. `route` labels the latency metric when
+    called from a worker thread that has no request context. With
+    `deliver="relay"` the URL returned is this server's /audio/<key> instead.
+    """
+    payload = tts_payload(text, voice_id)
+    cache_key = tts_cache_key(payload)
+    if deliver == "relay" and blob_stores["tts"].contains(cache_key, ".mp3"):
+        return RELAY_PREFIX + cache_key  # Already on disk: no Murf call, even after its URL expired
+
+    def call_murf():
+        stage = "fallback" if endpoint == "fallback" else "tts_chunk"
+        vendor_budget("murf_chars", cost=len(text))
+        with murf_breaker.guard(), stage_timer(stage, route=route, voice=voice_id):
+            murf_response = murf_http.post(url or GENERATE_ENDPOINT, json=payload, timeout=murf_timeout(endpoint))
+
+            if murf_response.status_code != 200:
+                raise MurfAPIError(murf_response.text, status=murf_response.status_code, text=text)
+
+            response_data = murf_response.json()
+            audio_url = extract_audio_url(response_data)
+            if not audio_url:
+                raise MurfAPIError("No audio URL returned", response=response_data, text=text)
+
+        tts_cache.set(cache_key, audio_url)
+        return audio_url
+
+    # Identical requests already in flight share that call instead of sending another
+    audio_url = tts_cache.get(cache_key) or murf_flight.do(cache_key, call_murf)
+    return RELAY_PREFIX + cache_key if deliver == "relay" else audio_url
+
+def relay_key(audio_url):
+    """The TTS cache key in a relayed audio URL, or None for any other URL"""
+    if audio_url and audio_url.startswith(RELAY_PREFIX):
+        return audio_url[len(RELAY_PREFIX):]
+    return None
+
+def route_synthesizer():
+    """synthesize_speech bound to the current route, for TTS worker threads outside the pipeline"""
+    route = route_label()
+
+    def synthesize(text):
+        try:
+            return synthesize_speech(text, route=route, deliver=AUDIO_DELIVERY)
+        except Exception as e:
+            if counts_as_upstream_error(e):
+                record_upstream_error("tts_chunk", route)
+            raise
+
+    return synthesize
+
+# Optional: mono / 16 kHz / silence-trimmed / re-encoded audio before STT upload
+audio_preprocessor = AudioPreprocessor(enabled=os.getenv("AUDIO_PREPROCESS", "0") == "1")
+
+# Transcripts keyed by the audio's content hash: re-sent clips skip STT entirely
+stt_cache = build_cache(
+    "stt",
+    max_entries=int(os.getenv("STT_CACHE_SIZE", "500")),
+    ttl=int(os.getenv("STT_CACHE_TTL", str(7 * 24 * 3600))),
+    disk_path=os.getenv("STT_CACHE_PATH")
+)
+
+def transcript_cache_key(audio_hash):
+    return make_key("stt", audio_hash)
+
+def transcribe_upload(audio, route=None):
+    """Transcribe with AssemblyAI and return the SDK's Transcript
+
+    `audio` may be bytes or a file-like upload; file-likes are streamed to
+    AssemblyAI without being read into memory first (unless preprocessing
+    is enabled, which needs the whole clip). Caching, latency and error
+    metrics come from the pipeline's STT stage.
+    """
+    if audio_preprocessor.enabled:
+        with stage_timer("preprocess", route=route):
+            audio = audio_preprocessor.process(audio.read() if hasattr(audio, "read") else audio)
+    vendor_budget("aai_requests")
+    # Transcription time depends on the clip's length, so it isn't a latency sample
+    with stt_breaker.guard(record_latency=False):
+        return assemblyai_sdk.get().Transcriber().transcribe(audio)
+
+# Uploads: file parts stay in RAM up to UPLOAD_SPOOL_BYTES, then spill to a temp
+# file, and are handed to AssemblyAI as a stream rather than read() into bytes
+class UploadRequest(SpooledUploadRequest):
+    spool_max_size = int(os.getenv("UPLOAD_SPOOL_BYTES", str(512 * 1024)))
+
+    def _load_form_data(self):
+        with stage_timer("upload_read"):
+            super()._load_form_data()
+
+app.request_class = UploadRequest
+upload_stats = UploadStats()
+upload_memory_bytes = Histogram(
+    "voice_agent_upload_memory_bytes",
+    "Upload bytes a request held in memory (0 when spooled to disk)",
+    ["route"],
+    buckets=(16 * 1024, 64 * 1024, 256 * 1024, 512 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+)
+
+def open_audio_upload(audio_file):
+    """Rewound (reader, size) for an uploaded file; no copy of its contents is made"""
+    reader, size, in_memory = open_upload(audio_file)
+    upload_stats.opened(size, in_memory)
+    upload_memory_bytes.observe(in_memory, route=route_label())
+    g.upload_memory = g.get("upload_memory", 0) + in_memory
+    return reader, size
+
+@app.teardown_request
+def release_upload_memory(exc=None):
+    upload_stats.released(g.pop("upload_memory", 0))
+
+def timed_llm_stream(llm_stream, route):
+    """Pass an LLM stream through, recording time to first chunk and in total"""
+    started = time.perf_counter()
+    first = True
+    try:
+        for chunk in llm_stream:
+            if first:
+                stage_seconds.observe(time.perf_counter() - started, stage="llm_first_token", route=route, voice="")
+                first = False
+            yield chunk
+    except (CircuitOpenError, RateLimited):
+        raise
+    except Exception:
+        record_upstream_error("llm_total", route)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage="llm_total", route=route, voice="")
+
+def stream_chunk_audio(chunks, transcription_text, response_text):
+    """Yield NDJSON lines: a header, then each chunk's audio URL as it completes"""
+    yield json.dumps({
+        "transcription": transcription_text,
+        "llm_response": response_text,
+        "chunks": len(chunks)
+    }) + "\n"
+    try:
+        for index, audio_url in iter_synthesized(chunks, route_synthesizer(), TTS_MAX_WORKERS):
+            yield json.dumps({"index": index, "audio_url": audio_url}) + "\n"
     except Exception as e:
-        print(f"Voice fetch error, using defaults: {str(e)}")
-    
-    return DEFAULT_VOICES
+        logger.error(f"Chunk synthesis failed: {str(e)}")
+        yield json.dumps({"error": "Audio Generation Error", "message": str(e)}) + "\n"
+        return
+    yield json.dumps({"success": True, "done": True}) + "\n"
+
+def wants_stream():
+    """True when the client asked for a progressive (Server-Sent Events) reply"""
+    return bool(request.args.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+def sse_response(events):
+    """Wrap an SSE generator in an unbuffered streaming response"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def stream_voice_reply(start_llm_stream, header, on_complete=None):
+    """Stream the LLM reply sentence by sentence into Murf as SSE events
+
+    Emits `transcription`, then `text`/`audio` pairs in sentence order, then
+    `done`. `on_complete(response_text)` runs once the full reply is known.
+    """
+    yield sse_event("transcription", header)
+    try:
+        route = route_label()
+        llm_stream = timed_llm_stream(gemini_stream(start_llm_stream), route)
+        events = stream_speech(iter_text(llm_stream), route_synthesizer(), TTS_MAX_WORKERS)
+        for event, data in events:
+            if event == "done":
+                if on_complete:
+                    on_complete(data["llm_response"])
+                data = {"success": True, **header, **data}
+            yield sse_event(event, data)
+    except Exception as e:
+        logger.error(f"Streaming reply failed: {str(e)}")
+        yield sse_event("error", {
+            "error": "stream_failed",
+            "message": str(e),
+            "audio_url": generate_fallback_audio("I'm having trouble thinking right now")
+        })
+
+
+# ---------- Voice pipeline ----------
+# Every route runs (a subset of) these stages over a Turn; caching, metrics,
+# retries and progress events are middleware, so they apply to all of them.
+
+def transcribe_turn(turn):
+    accept_transcript(turn, transcribe_upload(turn.audio, route=turn.route))
+
+def accept_transcript(turn, transcript):
+    """Take an STT result into the turn, raising if it is an error or silence"""
+    if transcript.error:
+        raise TranscriptionError(str(transcript.error))
+    turn.transcription = transcript.text or ""
+    if not turn.transcription.strip():
+        raise NoSpeechError("No speech detected")
+
+def reply_to_turn(turn):
+    """Single-shot completion, or a chat turn when the Turn carries a history"""
+    if turn.history is None:
+        turn.response_text = generate_text(turn.transcription)
+    else:
+        turn.response_text = send_chat(turn.history, turn.transcription)
+
+def speak_turn(turn):
+    """Murf audio for the reply: sentence-aligned chunks in parallel, or one clip truncated to Murf's limit"""
+    text = turn.speech_text
+    turn.chunks = split_text(text, TTS_CHUNK_CHARS) if turn.chunked else [text[:MURF_MAX_CHARS]]
+    options = {"deliver": AUDIO_DELIVERY, **turn.tts_options}
+    synthesize = partial(synthesize_speech, voice_id=turn.voice_id, route=turn.route, **options)
+    turn.audio_urls = [None] * len(turn.chunks)
+    for index, audio_url in iter_synthesized(turn.chunks, synthesize, TTS_MAX_WORKERS):
+        turn.audio_urls[index] = audio_url
+        turn.progress("tts_chunk", index=index, audio_url=audio_url)
+
+def remember_turn(turn):
+    if turn.session_id is not None:
+        history_window.add_turn(turn.session_id, turn.transcription, turn.response_text)
+
+stt_stage = Stage("stt", transcribe_turn, produces=("transcription",), metric="stt")
+llm_stage = Stage("llm", reply_to_turn, produces=("response_text",), metric="llm_total")
+tts_stage = Stage("tts", speak_turn, produces=("audio_urls",), metric="tts_total")
+remember_stage = Stage("remember", remember_turn)
+
+class TranscriptCache(Middleware):
+    """Answer the STT stage from stt_cache, keyed by the content hash of the audio"""
+
+    def before(self, stage, turn):
+        if stage.name != "stt" or turn.audio is None:
+            return False
+        if turn.audio_hash is None:
+            turn.audio_hash = hash_content(turn.audio)
+        cached = stt_cache.get(transcript_cache_key(turn.audio_hash))
+        if not cached:
+            return False
+        turn.transcription = cached
+        return True
+
+    def after(self, stage, turn, seconds):
+        if stage.name == "stt" and turn.audio_hash and turn.transcription:
+            stt_cache.set(transcript_cache_key(turn.audio_hash), turn.transcription)
+
+class StageMetrics(Middleware):
+    """Stage latency histogram and upstream error counter, labelled by the Turn's route"""
+
+    def after(self, stage, turn, seconds):
+        if stage.metric:
+            voice = turn.voice_id if stage.name == "tts" else ""
+            stage_seconds.observe(seconds, stage=stage.metric, route=turn.route, voice=voice)
+
+    def failed(self, stage, turn, exc, seconds, attempt):
+        if stage.metric:
+            self.after(stage, turn, seconds)
+            if counts_as_upstream_error(exc):
+                record_upstream_error(stage.metric, turn.route)
+        return None
+
+def transient_failure(e):
+    """Worth retrying: a vendor-side failure that wasn't a fail-fast rejection
+
+    A blocked Gemini reply raises ValueError on `.text`; asking again gets
+    the same answer.
+    """
+    return vendor_failure(e) and not isinstance(e, (CircuitOpenError, RateLimited, ValueError))
+
+pipeline_middleware = [
+    ProgressEvents(),
+    TranscriptCache(),
+    StageMetrics(),
+    RetryStages(int(os.getenv("LLM_RETRIES", "1")), ["llm"], retry_on=transient_failure),
+]
+
+def build_pipeline(*stages):
+    return Pipeline(stages, pipeline_middleware)
+
+voice_pipeline = build_pipeline(stt_stage, llm_stage, tts_stage, remember_stage)  # audio in, reply audio out
+reply_pipeline = build_pipeline(llm_stage, tts_stage, remember_stage)  # text in (live transcription)
+echo_pipeline = build_pipeline(stt_stage, tts_stage)  # speak the transcription back
+transcribe_pipeline = build_pipeline(stt_stage)
+think_pipeline = build_pipeline(stt_stage, llm_stage)  # when the audio is streamed separately
+llm_pipeline = build_pipeline(llm_stage)
+speech_pipeline = build_pipeline(tts_stage)
+
+# Vendor transport errors the failure responses below recognise (asgi.py adds httpx's)
+TIMEOUT_ERRORS = (requests.exceptions.Timeout,)
+TRANSPORT_ERRORS = (requests.exceptions.RequestException,)
+
+def new_turn(**kwargs):
+    """A Turn labelled with the current route"""
+    return Turn(route=route_label(), **kwargs)
+
+
+# Async job mode (?async=1 or "Prefer: respond-async"): long pipeline requests
+# are answered with 202 + a job ID and run on a bounded worker pool; clients poll
+# GET /jobs/<id> or subscribe to GET /jobs/<id>/events. A full queue answers 429.
+job_queue = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_queued=int(os.getenv("JOB_QUEUE_SIZE", "32")),
+    ttl=int(os.getenv("JOB_TTL", "600")),
+    # JOB_DB_PATH shares job state between worker processes (see workers.py)
+    store=SQLiteJobStore(os.environ["JOB_DB_PATH"]) if os.getenv("JOB_DB_PATH") else None
+)
+
+def wants_job():
+    """True when the client asked for the request to run as a background job"""
+    return request.args.get('async') == '1' or 'respond-async' in request.headers.get('Prefer', '')
+
+def submit_job(run, audio_file):
+    """Queue `run(job, audio)` with a copy of the upload; 202 with the job's URLs, or 429"""
+    audio = copy_upload(audio_file, UploadRequest.spool_max_size)
+    try:
+        job = job_queue.submit(route_label(), run, audio)
+    except QueueFull as e:
+        audio.close()
+        response = jsonify({"error": "queue_full", "message": str(e), "retry_after": e.retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    status_url = url_for('job_status', job_id=job.id)
+    response = jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": status_url,
+        "events_url": url_for('job_events', job_id=job.id)
+    })
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
+# Job error payloads by failed stage: (error code, spoken fallback)
+JOB_STAGE_ERRORS = {
+    "stt": ("transcription_failed", None),
+    "llm": ("llm_error", "I'm having trouble thinking right now"),
+    "tts": ("tts_failed", "I can't speak right now"),
+}
 
+def run_voice_pipeline(job, audio, chunked):
+    """The voice pipeline for a queued request; every stage is reported as job progress"""
+    job_route.set(job.kind)
+    turn = Turn(audio=UploadReader(audio), route=job.kind, chunked=chunked, on_progress=job.progress)
+    with audio:
+        try:
+            return voice_pipeline.run(turn)
+        except StageFailed as e:
+            if isinstance(e.cause, NoSpeechError):
+                raise JobError({"error": "empty_transcription", "message": str(e.cause)})
+            error, fallback = JOB_STAGE_ERRORS.get(e.stage, ("pipeline_error", None))
+            payload = {"error": error, "message": str(e.cause)}
+            if fallback:
+                payload["audio_url"] = generate_fallback_audio(fallback)
+            raise JobError(payload)
+
+def query_llm_job(job, audio):
+    turn = run_voice_pipeline(job, audio, chunked=True)
+    result = {"success": True, "transcription": turn.transcription, "llm_response": turn.response_text}
+    if len(turn.audio_urls) > 1:
+        result["audio_urls"] = turn.audio_urls
+    else:
+        result["audio_url"] = turn.audio_url
+    return result
+
+def process_audio_job(job, audio):
+    turn = run_voice_pipeline(job, audio, chunked=False)
+    return {
+        "success": True,
+        "transcription": turn.transcription,
+        "response": turn.response_text,
+        "audio_url": turn.audio_url
+    }
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Current state of a background job, with its result once finished"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "job_not_found", "message": "Unknown or expired job"}), 404
+    return jsonify(job.to_dict())
 
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-Sent Events for a job: past events replayed, then live ones until it finishes"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "job_not_found", "message": "Unknown or expired job"}), 404
+
+    def events():
+        sent = 0
+        while True:
+            new = job.wait_events(sent)
+            if not new:
+                yield ": keep-alive\n\n"
+            for event, data in new:
+                yield sse_event(event, data)
+            sent += len(new)
+            if job.finished and sent >= len(job.events):
+                return
+
+    return sse_response(events())
+
+
+def query_llm_failure(e):
+    """(payload, status) /llm/query answers with when a pipeline stage fails"""
+    cause = e.cause
+    if e.stage == "stt":
+        if isinstance(cause, NoSpeechError):
+            return {"error": "Empty transcription", "message": str(cause)}, 400
+        if isinstance(cause, TranscriptionError):
+            return {"error": "Transcription failed", "message": str(cause)}, 500
+        return {
+            "error": "Internal Server Error",
+            "message": str(cause),
+            "type": type(cause).__name__,
+            "details": "Unexpected error in processing pipeline"
+        }, error_status(cause)
+    if e.stage == "llm":
+        return {
+            "error": "LLM API Error",
+            "message": str(cause),
+            "type": type(cause).__name__,
+            "details": "Failed to generate response from Gemini"
+        }, error_status(cause)
+    if isinstance(cause, MurfAPIError):
+        if cause.status is not None:
+            return {
+                "error": "Murf API error",
+                "message": str(cause),
+                "status": cause.status,
+                "chunk": f"{len(cause.text)} chars"
+            }, 500
+        return {
+            "error": "Invalid Murf response",
+            "message": str(cause),
+            "response": cause.response
+        }, 500
+    if isinstance(cause, TRANSPORT_ERRORS):
+        return {
+            "error": "Murf API Connection Error",
+            "message": str(cause),
+            "type": type(cause).__name__
+        }, 503  # Service Unavailable
+    return {
+        "error": "Audio Generation Error",
+        "message": str(cause),
+        "type": type(cause).__name__
+    }, error_status(cause)
 
 @app.route('/llm/query', methods=['POST'])
 def query_llm():
@@ -143,135 +907,43 @@ def query_llm():
         if not allowed_file(audio_file.filename):
             return jsonify({"error": "Invalid file type"}), 400
 
-        # Step 1: Transcribe the audio
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(audio_file.read())
-        
-        if transcript.error:
-            return jsonify({"error": "Transcription failed", "message": transcript.error}), 500
-        
-        transcription_text = transcript.text
-        if not transcription_text.strip():
-            return jsonify({"error": "Empty transcription", "message": "No speech detected"}), 400
+        if wants_job():
+            return submit_job(query_llm_job, audio_file)
 
-        # Step 2: Generate LLM response (single attempt with proper error handling)
+        turn = new_turn(audio=open_audio_upload(audio_file)[0], chunked=True)
         try:
-            llm_response = model.generate_content(transcription_text)
-            response_text = llm_response.text
-        except Exception as e:
-            return jsonify({
-                "error": "LLM API Error",
-                "message": str(e),
-                "type": type(e).__name__,
-                "details": "Failed to generate response from Gemini"
-            }), 500
+            # Steps 1-2: transcribe, then generate the LLM response
+            think_pipeline.run(turn)
 
-        # Step 3: Generate speech from response (handle 3000 char limit)
-        try:
-            if len(response_text) > 3000:
-                # Split into chunks of 3000 characters
-                chunks = [response_text[i:i+3000] for i in range(0, len(response_text), 3000)]
-                audio_urls = []
-                
-                for chunk in chunks:
-                    murf_response = requests.post(
-                        GENERATE_ENDPOINT,
-                        json={
-                            "text": chunk,
-                            "voiceId": "en-US-Natalie",  # Default voice
-                            "format": "mp3",
-                            "sampleRate": 24000
-                        },
-                        headers=get_auth_headers(),
-                        timeout=10  # Added timeout
-                    )
-                    
-                    if murf_response.status_code != 200:
-                        return jsonify({
-                            "error": "Murf API error",
-                            "message": murf_response.text,
-                            "status": murf_response.status_code,
-                            "chunk": f"{len(chunk)} chars"
-                        }), 500
-                    
-                    audio_url = murf_response.json().get("audioFile")
-                    if not audio_url:
-                        return jsonify({
-                            "error": "Invalid Murf response",
-                            "message": "No audio URL returned",
-                            "response": murf_response.json()
-                        }), 500
-                    
-                    audio_urls.append(audio_url)
-                
-                # Return all audio URLs if multiple chunks
-                if len(audio_urls) > 1:
-                    return jsonify({
-                        "success": True,
-                        "audio_urls": audio_urls,  # Client should handle multiple files
-                        "transcription": transcription_text,
-                        "llm_response": response_text,
-                        "warning": "Response exceeded 3000 characters - multiple audio files returned"
-                    })
-                audio_url = audio_urls[0]
-            else:
-                # Single request for shorter responses
-                murf_response = requests.post(
-                    GENERATE_ENDPOINT,
-                    json={
-                        "text": response_text,
-                        "voiceId": "en-US-Natalie",
-                        "format": "mp3",
-                        "sampleRate": 24000
-                    },
-                    headers=get_auth_headers(),
-                    timeout=10  # Added timeout
+            # Split on sentence boundaries so no chunk exceeds Murf's limit
+            chunks = split_text(turn.response_text, TTS_CHUNK_CHARS)
+            if request.args.get('stream') and len(chunks) > 1:
+                # Stream each chunk's URL as soon as Murf returns it
+                return Response(
+                    stream_with_context(stream_chunk_audio(chunks, turn.transcription, turn.response_text)),
+                    mimetype='application/x-ndjson'
                 )
-                
-                if murf_response.status_code != 200:
-                    return jsonify({
-                        "error": "Murf API error",
-                        "message": murf_response.text,
-                        "status": murf_response.status_code
-                    }), 500
-                
-                audio_url = murf_response.json().get("audioFile")
-                if not audio_url:
-                    return jsonify({
-                        "error": "Invalid Murf response",
-                        "message": "No audio URL returned",
-                        "response": murf_response.json()
-                    }), 500
-                if request.is_json:
-                    data = request.get_json()
-                    input_text = data.get('text', '')
-                else:
-                    pass
-                if 'audio' in request.files:
-                    audio_file = request.files['audio']
-        # Process audio
-                else:
-        # Handle JSON case
-                    pass
+
+            # Step 3: Generate speech from response (handle 3000 char limit)
+            speech_pipeline.run(turn)
+        except StageFailed as e:
+            return query_llm_failure(e)
+
+        # Return all audio URLs if multiple chunks
+        if len(turn.audio_urls) > 1:
             return jsonify({
                 "success": True,
-                "audio_url": audio_url,
-                "transcription": transcription_text,
-                "llm_response": response_text
+                "audio_urls": turn.audio_urls,  # Client should handle multiple files
+                "transcription": turn.transcription,
+                "llm_response": turn.response_text,
+                "warning": "Response exceeded 3000 characters - multiple audio files returned"
             })
-
-        except requests.exceptions.RequestException as e:
-            return jsonify({
-                "error": "Murf API Connection Error",
-                "message": str(e),
-                "type": type(e).__name__
-            }), 503  # Service Unavailable
-        except Exception as e:
-            return jsonify({
-                "error": "Audio Generation Error",
-                "message": str(e),
-                "type": type(e).__name__
-            }), 500
+        return jsonify({
+            "success": True,
+            "audio_url": turn.audio_url,
+            "transcription": turn.transcription,
+            "llm_response": turn.response_text
+        })
 
     except Exception as e:
         return jsonify({
@@ -284,40 +956,45 @@ def query_llm():
 def test_pipeline():
     """Test endpoint for the full pipeline"""
     try:
-        # Simulate the pipeline steps
+        # Simulate the pipeline steps: LLM response, then speech
         test_text = "Hello, how are you today?"
-        
-        # Step 1: LLM response
-        llm_response = model.generate_content(test_text)
-        response_text = llm_response.text
-        
-        # Step 2: Generate speech
-        murf_response = requests.post(
-            GENERATE_ENDPOINT,
-            json={
-                "text": response_text[:3000],  # Ensure we don't exceed limit
-                "voiceId": "en-US-Natalie",
-                "format": "mp3",
-                "sampleRate": 24000
-            },
-            headers=get_auth_headers()
-        )
-        
-        if murf_response.status_code != 200:
-            return jsonify({
-                "error": "Murf API error",
-                "message": murf_response.text
-            }), 500
+        try:
+            turn = reply_pipeline.run(new_turn(transcription=test_text))
+        except StageFailed as e:
+            if isinstance(e.cause, MurfAPIError):
+                return jsonify({
+                    "error": "Murf API error",
+                    "message": str(e.cause)
+                }), 500
+            return jsonify({"error": str(e.cause)}), error_status(e.cause)
         
         return jsonify({
             "success": True,
             "input_text": test_text,
-            "llm_response": response_text,
-            "audio_url": murf_response.json().get("audioFile")
+            "llm_response": turn.response_text,
+            "audio_url": turn.audio_url
         })
     
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": str(e)}), error_status(e)
+def generate_audio_failure(e):
+    """(payload, status) /generate_audio answers with when synthesis fails"""
+    cause = e.cause
+    if not isinstance(cause, MurfAPIError):
+        return {"error": "Internal server error", "message": str(cause)}, error_status(cause)
+    if cause.status is None:
+        logger.error(f"No audio URL found. Full response: {cause.response}")
+        return {
+            "error": "No audio URL in response",
+            "debug": cause.response
+        }, 500
+    logger.error(f"Murf API response: {cause.status}, {str(cause)[:200]}...")
+    return {
+        "error": "Murf API Error",
+        "status": cause.status,
+        "response": str(cause)
+    }, cause.status
+
 # Text-to-Speech Endpoint (Day 2 Task)
 @app.route('/generate_audio', methods=['POST'])
 def generate_audio():
@@ -329,57 +1006,106 @@ def generate_audio():
         if not text:
             return jsonify({"error": "Text is required"}), 400
 
-        print(f"Generating audio for: {text[:50]}...")
+        logger.info(f"Generating audio for: {text[:50]}...")
         
-        payload = {
-            "text": text,
-            "voiceId": requested_voice,
-            "format": "mp3",
-            "sampleRate": 24000
-        }
-
-        response = requests.post(
-            "https://api.murf.ai/v1/speech/generate-with-key",
-            json=payload,
-            headers={
-                "api-key": MURF_API_KEY,
-                "Content-Type": "application/json"
-            },
-            timeout=10
-        )
-
-        print(f"Murf API response: {response.status_code}, {response.text[:200]}...")
+        turn = new_turn(transcription=text, voice_id=requested_voice,
+                        tts_options={"url": f"{MURF_BASE_URL}/speech/generate-with-key"})
+        try:
+            speech_pipeline.run(turn)
+        except StageFailed as e:
+            return generate_audio_failure(e)
 
-        if response.status_code == 200:
-            response_data = response.json()
-            
-            # Updated URL extraction for current Murf API response
-            audio_url = response_data.get("audioFile")  # Changed from audioStreamUrl
-            
-            if not audio_url:
-                print("No audio URL found. Full response:", response_data)
-                return jsonify({
-                    "error": "No audio URL in response",
-                    "debug": response_data
-                }), 500
-                
-            return jsonify({
-                "success": True,
-                "audio_url": audio_url,  # Keep this field name consistent
-                "voice_used": requested_voice
-            })
-        else:
-            return jsonify({
-                "error": "Murf API Error",
-                "status": response.status_code,
-                "response": response.text
-            }), response.status_code
+        return jsonify({
+            "success": True,
+            "audio_url": turn.audio_url,  # Keep this field name consistent
+            "voice_used": requested_voice
+        })
 
     except Exception as e:
         return jsonify({
             "error": "Internal server error",
             "message": str(e)
-        }), 500
+        }), error_status(e)
+def batch_items(items, default_voice):
+    """Group batch items by what they would send to Murf
+
+    Returns ({cache key: (text, voice, [item indices])}, [(index, error)]).
+    Texts are truncated to Murf's limit exactly as /generate_audio does, so
+    items that only differ beyond it are synthesised once.
+    """
+    unique, invalid = {}, []
+    for index, item in enumerate(items):
+        text = item.get('text') if isinstance(item, dict) else None
+        if not text or not isinstance(text, str):
+            invalid.append((index, "Text is required"))
+            continue
+        text = text[:MURF_MAX_CHARS]
+        voice = item.get('voice') or default_voice
+        key = tts_cache_key(tts_payload(text, voice))
+        unique.setdefault(key, (text, voice, []))[2].append(index)
+    return unique, invalid
+
+def stream_batch_audio(unique, invalid, workers, route):
+    """Yield NDJSON lines: a header, then one result per distinct text in completion order
+
+    Each result lists every item `indices` it answers. Texts already in the
+    TTS cache are sent first; the rest run on `workers` threads, each Murf
+    call still subject to the circuit breaker and the global Murf budget.
+    """
+    # Peek without counting a lookup: synthesize_speech does the counted one
+    cached = {key for key in unique if tts_cache.backend.get(key) is not None or
+              (AUDIO_DELIVERY == "relay" and blob_stores["tts"].contains(key, ".mp3"))}
+    yield json.dumps({"items": sum(len(i) for _, _, i in unique.values()) + len(invalid),
+                      "unique": len(unique), "cached": len(cached), "invalid": len(invalid)}) + "\n"
+    for index, message in invalid:
+        yield json.dumps({"indices": [index], "success": False, "status": 400, "error": message}) + "\n"
+
+    def synthesize(key):
+        text, voice, _ = unique[key]
+        turn = Turn(transcription=text, voice_id=voice, route=route,
+                    tts_options={"url": f"{MURF_BASE_URL}/speech/generate-with-key"})
+        try:
+            speech_pipeline.run(turn)
+        except StageFailed as e:
+            payload, status = generate_audio_failure(e)
+            return {"success": False, "status": status, **payload}
+        return {"success": True, "audio_url": turn.audio_url}
+
+    keys = sorted(unique, key=lambda key: key not in cached)  # Cache hits don't wait behind Murf calls
+    succeeded = 0
+    for position, result in iter_synthesized(keys, synthesize, workers):
+        key = keys[position]
+        _, voice, indices = unique[key]
+        succeeded += result["success"]
+        yield json.dumps({"indices": indices, "voice_used": voice, "cached": key in cached, **result}) + "\n"
+    yield json.dumps({"done": True, "succeeded": succeeded, "failed": len(unique) - succeeded + len(invalid)}) + "\n"
+
+@app.route('/generate_audio/batch', methods=['POST'])
+def generate_audio_batch():
+    """Synthesise many texts in one request, streamed back as NDJSON
+
+    Body: {"items": [{"text", "voice"}, ...], "voice": default, "concurrency": n}.
+    Duplicates are synthesised once and errors are reported per item.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list of {text, voice}"}), 400
+    if len(items) > TTS_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {TTS_BATCH_MAX_ITEMS} items per batch"}), 400
+    try:
+        workers = min(int(data.get('concurrency') or TTS_BATCH_WORKERS), TTS_BATCH_WORKERS)
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency must be an integer"}), 400
+
+    unique, invalid = batch_items(items, data.get('voice') or 'en-US-Natalie')
+    logger.info(f"Generating audio batch: {len(items)} items, {len(unique)} distinct")
+    return Response(
+        stream_with_context(stream_batch_audio(unique, invalid, max(1, workers), route_label())),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
 # Day 5: Audio Upload Endpoint
 @app.route('/upload_audio', methods=['POST'])
 def upload_audio():
@@ -392,20 +1118,16 @@ def upload_audio():
         return jsonify({'error': 'No selected file'}), 400
     
     if audio_file and allowed_file(audio_file.filename):
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"recording_{timestamp}_{secure_filename(audio_file.filename)}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        # Save the file
-        audio_file.save(filepath)
-        
-        # Get file info
-        file_size = os.path.getsize(filepath)
+        # Stream the spooled upload into the blob store; its size is already known.
+        # The name is the content hash, so a re-sent recording is stored once
+        _, file_size = open_audio_upload(audio_file)
+        ext = '.' + audio_file.filename.rsplit('.', 1)[1].lower()
+        filename = blob_stores["uploads"].put_stream(audio_file.stream, ext) + ext
         
         return jsonify({
             'status': 'success',
             'filename': filename,
+            'url': url_for('serve_blob', store='uploads', name=filename),
             'content_type': audio_file.content_type,
             'size': file_size,
             'message': 'Audio uploaded successfully'
@@ -425,55 +1147,156 @@ def transcribe_file():
     
     audio_file = request.files['file']
     
-    # Create a transcriber object
-    transcriber = aai.Transcriber()
-    
+    # Transcribe the audio file directly from the spooled upload
+    turn = new_turn(audio=open_audio_upload(audio_file)[0])
     try:
-        # Transcribe the audio file directly from binary data
-        transcript = transcriber.transcribe(audio_file.read())
-        
-        if transcript.error:
-            return jsonify({"error": transcript.error}), 500
-            
-        return jsonify({
-            "transcription": transcript.text,
-            "status": "success",
-            "message": "Audio transcribed successfully"
-        })
-    
+        transcribe_pipeline.run(turn)
+    except StageFailed as e:
+        # Silence is a successful (empty) transcription here
+        if not isinstance(e.cause, NoSpeechError):
+            return jsonify({"error": str(e.cause)}), error_status(e.cause)
+
+    return jsonify({
+        "transcription": turn.transcription,
+        "status": "success",
+        "message": "Audio transcribed successfully"
+    })
+
+def download_audio(audio_url, endpoint="generate"):
+    """Fetch a synthesised clip's bytes over the shared pool"""
+    # Murf audio lives on a CDN: don't forward our API key there
+    response = murf_http.get(audio_url, endpoint=endpoint, headers={"api-key": None})
+    response.raise_for_status()
+    return response.content
+
+def relayed_audio_response(audio, key):
+    """A whole clip as audio/mpeg, answering Range / If-Range requests with 206"""
+    response = Response(audio, mimetype='audio/mpeg')
+    response.set_etag(key)  # Same text and voice, same key
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(audio))
+
+@app.route('/blobs/<store>/<name>', methods=['GET'])
+def serve_blob(store, name):
+    """Serve a stored audio blob straight from disk (sendfile where the server supports it)"""
+    key, ext = os.path.splitext(name)
+    path = blob_stores[store].locate(key, ext) if store in blob_stores and valid_key(key) else None
+    if path is None:
+        return jsonify({"error": "Audio not found"}), 404
+    return send_file(path, conditional=True, max_age=86400)
+
+@app.route('/audio/<key>', methods=['GET'])
+def relay_audio(key):
+    """Serve a synthesised clip from this server (AUDIO_DELIVERY=relay)
+
+    Replays come from the relay's memory or the TTS blob store; a first
+    request is streamed to the client chunk by chunk while it is still
+    arriving from Murf. Range requests for a clip that isn't held yet fetch
+    it whole first.
+    """
+    audio = audio_relay.cached(key)
+    if audio is not None:
+        return relayed_audio_response(audio, key)
+    path = audio_relay.stored(key)
+    if path is not None:
+        return send_file(path, mimetype='audio/mpeg', conditional=True, etag=key, max_age=86400)
+    audio_url = audio_relay.source(key)
+    if audio_url is None:
+        return jsonify({"error": "Unknown or expired audio clip"}), 404
+    try:
+        if request.range is not None:
+            return relayed_audio_response(b"".join(audio_relay.stream(key, audio_url)), key)
+        chunks = audio_relay.stream(key, audio_url)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        logger.error(f"Audio relay failed: {str(e)}")
+        return jsonify({"error": "Audio relay failed", "message": str(e)}), 502
+    return Response(
+        stream_with_context(chunks),
+        mimetype='audio/mpeg',
+        headers={'Accept-Ranges': 'bytes', 'X-Accel-Buffering': 'no'}
+    )
+
+# Every fixed message the error paths speak. They are rendered once into the
+# "fallback" blob store (under BLOB_DIR) and served locally from /blobs/fallback/,
+# so an error response never waits on (or adds load to) a degraded Murf.
+FALLBACK_MESSAGES = [
+    "System maintenance in progress",
+    "Please send an audio message",
+    "Unsupported file format",
+    "The audio contains no data",
+    "I couldn't understand that audio",
+    "I'm having trouble thinking right now",
+    "I can't speak right now",
+    "Something went wrong",
+    "No audio file was provided.",
+    "The selected file has no name.",
+    "Invalid file type was uploaded.",
+    "The audio file was empty.",
+    "I couldn't understand the audio.",
+    "No speech was detected in the audio.",
+    "I'm having trouble understanding the audio.",
+    "Voice options are currently unavailable.",
+    "I'm having trouble generating a response.",
+    "Response generation failed.",
+    "The voice service is taking too long to respond.",
+    "Voice service is currently unavailable.",
+    "An unexpected error occurred.",
+]
 
-# Utility function for fallback audio (returns None or a placeholder URL)
-def generate_fallback_audio(message: str, voice_id="en-US-Natalie"):
-    """More robust fallback audio generation"""
+def render_fallback_clip(message, voice_id):
+    """Synthesise a fallback message with Murf and return the audio bytes"""
     try:
-        if not MURF_API_KEY:
-            return None
-            
-        response = requests.post(
-            GENERATE_ENDPOINT,
-            json={
-                "text": message[:1000],  # Safe truncation
-                "voiceId": voice_id,
-                "format": "mp3",
-                "sampleRate": 24000
-            },
-            headers=get_auth_headers(),
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return response.json().get("audioFile")
-        
-        logger.warning(f"Fallback audio failed: {response.status_code} {response.text}")
-        return None
-        
+        audio_url = synthesize_speech(message[:1000], voice_id, endpoint="fallback", route="fallback")  # Safe truncation
+        with stage_timer("fallback_download", route="fallback", voice=voice_id):
+            return download_audio(audio_url, endpoint="fallback")
     except Exception as e:
-        logger.error(f"Critical fallback failure: {str(e)}")
+        if counts_as_upstream_error(e):
+            record_upstream_error("fallback", "fallback")
+        raise
+
+fallback_audio = FallbackAudio(blob_stores["fallback"], "/blobs/fallback", render_fallback_clip)
+
+# Utility function for fallback audio (returns None or a local URL)
+def generate_fallback_audio(message: str, voice_id="en-US-Natalie", route=None):
+    """Pre-rendered fallback audio; never makes an outbound call on the request path"""
+    if not MURF_API_KEY:
         return None
+    audio_url = fallback_audio.get(message, voice_id)
+    fallback_responses.inc(route=route or route_label(), ready="true" if audio_url else "false")
+    return audio_url
 
 
+def chat_failure(e):
+    """(payload, status) /agent/chat answers with, spoken fallback included, when a stage fails"""
+    cause = e.cause
+    if isinstance(cause, NoSpeechError):
+        return {
+            "error": "empty_transcription",
+            "message": str(cause),
+            "audio_url": generate_fallback_audio("No speech was detected in the audio.")
+        }, 400
+    if e.stage == "stt":
+        logger.error(f"Transcription failed: {str(cause)}")
+        return {
+            "error": "transcription_failed",
+            "message": str(cause),
+            "audio_url": generate_fallback_audio("I couldn't understand that audio")
+        }, error_status(cause)
+    if e.stage == "llm":
+        logger.error(f"LLM error: {str(cause)}")
+        return {
+            "error": "llm_error",
+            "message": str(cause),
+            "audio_url": generate_fallback_audio("I'm having trouble thinking right now")
+        }, error_status(cause)
+    logger.error(f"TTS generation failed: {str(cause)}")
+    return {
+        "error": "tts_failed",
+        "message": str(cause),
+        "audio_url": generate_fallback_audio("I can't speak right now")
+    }, error_status(cause)
+
 @app.route('/agent/chat/<session_id>', methods=['POST'])
 def chat_with_history(session_id):
     # Service availability check
@@ -501,85 +1324,44 @@ def chat_with_history(session_id):
                 "audio_url": generate_fallback_audio("Unsupported file format")
             }), 400
 
-        # Initialize chat history
-        if session_id not in chat_history_store:
-            chat_history_store[session_id] = []
-        chat_history = chat_history_store[session_id]
+        # Load the prompt history (empty for new or expired sessions)
+        history = history_window.contents(session_id)
 
         # Transcribe audio
-        audio_data = audio_file.read()
-        if not audio_data:
+        audio, audio_size = open_audio_upload(audio_file)
+        if not audio_size:
             return jsonify({
                 "error": "empty_audio",
                 "message": "Empty audio file",
                 "audio_url": generate_fallback_audio("The audio contains no data")
             }), 400
 
-        transcript = aai.Transcriber().transcribe(io.BytesIO(audio_data))
-        if transcript.error:
-            logger.error(f"Transcription failed: {transcript.error}")
-            return jsonify({
-                "error": "transcription_failed",
-                "message": str(transcript.error),
-                "audio_url": generate_fallback_audio("I couldn't understand that audio")
-            }), 500
-
-        # Generate LLM response
+        turn = new_turn(audio=audio, history=history, session_id=session_id)
         try:
-            chat = model.start_chat(history=[
-                {"role": msg["role"], "parts": [msg["content"]]} 
-                for msg in chat_history
-            ])
-            response = chat.send_message(transcript.text)
-            response_text = response.text
-        except Exception as e:
-            logger.error(f"LLM error: {str(e)}")
-            return jsonify({
-                "error": "llm_error",
-                "message": str(e),
-                "audio_url": generate_fallback_audio("I'm having trouble thinking right now")
-            }), 500
+            if wants_stream():
+                transcribe_pipeline.run(turn)
 
-        # Generate TTS audio
-        try:
-            tts_response = requests.post(
-                GENERATE_ENDPOINT,
-                json={
-                    "text": response_text[:3000],  # Safe truncation
-                    "voiceId": "en-US-Natalie",
-                    "format": "mp3",
-                    "sampleRate": 24000
-                },
-                headers=get_auth_headers(),
-                timeout=15
-            )
-            
-            if tts_response.status_code != 200:
-                raise Exception(tts_response.text)
-                
-            audio_url = tts_response.json().get("audioFile")
-            if not audio_url:
-                raise Exception("No audio URL in response")
-                
-        except Exception as e:
-            logger.error(f"TTS generation failed: {str(e)}")
-            return jsonify({
-                "error": "tts_failed",
-                "message": str(e),
-                "audio_url": generate_fallback_audio("I can't speak right now")
-            }), 500
+                def save_turn(response_text):
+                    history_window.add_turn(session_id, turn.transcription, response_text)
+
+                return sse_response(stream_voice_reply(
+                    lambda: gemini_model.get().start_chat(history=history).send_message(
+                        turn.transcription, stream=True, request_options={"timeout": GEMINI_TIMEOUT}
+                    ),
+                    {"transcription": turn.transcription, "session_id": session_id},
+                    on_complete=save_turn
+                ))
 
-        # Update conversation history
-        chat_history.extend([
-            {"role": "user", "content": transcript.text},
-            {"role": "model", "content": response_text}
-        ])
+            # Transcribe, reply, speak, then update the conversation history
+            voice_pipeline.run(turn)
+        except StageFailed as e:
+            return chat_failure(e)
 
         return jsonify({
             "success": True,
-            "audio_url": audio_url,
-            "transcription": transcript.text,
-            "llm_response": response_text,
+            "audio_url": turn.audio_url,
+            "transcription": turn.transcription,
+            "llm_response": turn.response_text,
             "session_id": session_id
         })
 
@@ -610,14 +1392,92 @@ def handle_recording_stop():
             "message": "No audio file received"
         }), 400
         
-    audio_file = request.files['audio']
-    
-    # Process the recording through our existing pipeline
-    session_id = generate_session_id()
+    # Continue the caller's conversation when they send one; otherwise start a
+    # new (bounded, expiring) session
+    session_id = request.form.get('session_id') or request.args.get('session_id') or generate_session_id()
     response = chat_with_history(session_id)
     
     # Return the response from chat_with_history
     return response
+def echo_failure(e, voice_id):
+    """(payload, status) /tts/echo answers with, spoken fallback included, when a stage fails"""
+    cause = e.cause
+    if e.stage == "stt":
+        if isinstance(cause, TranscriptionError):
+            fallback_url = generate_fallback_audio("I couldn't understand the audio.")
+            return {
+                "error": "Transcription failed",
+                "message": str(cause),
+                "audio_url": fallback_url or ""
+            }, 500
+        if isinstance(cause, NoSpeechError):
+            fallback_url = generate_fallback_audio("No speech was detected in the audio.")
+            return {
+                "error": "Empty transcription result",
+                "message": "The audio file didn't contain any recognizable speech",
+                "audio_url": fallback_url or ""
+            }, 400
+        logger.error(f"Transcription error: {str(cause)}")
+        fallback_url = generate_fallback_audio("I'm having trouble understanding the audio.")
+        return {
+            "error": "Transcription service error",
+            "message": str(cause),
+            "audio_url": fallback_url or ""
+        }, error_status(cause)
+
+    if isinstance(cause, MurfAPIError):
+        if cause.status is not None:
+            fallback_url = generate_fallback_audio("I'm having trouble generating a response.")
+            return {
+                "error": "Murf API error",
+                "message": str(cause),
+                "status_code": cause.status,
+                "audio_url": fallback_url or ""
+            }, 502
+
+        fallback_url = generate_fallback_audio("Response generation failed.")
+        return {
+            "error": "No audio URL in response",
+            "message": "TTS service returned no audio URL",
+            "audio_url": fallback_url or "",
+            "debug": {
+                "response_keys": list((cause.response or {}).keys()),
+                "suggested_fields": ["audioFile", "audioStreamUrl", "url", "audio_url"]
+            }
+        }, 500
+
+    if isinstance(cause, (CircuitOpenError, RateLimited)):
+        fallback_url = generate_fallback_audio("Voice service is currently unavailable.")
+        return {
+            "error": "Murf API unavailable",
+            "message": str(cause),
+            "retry_after": round(cause.retry_after),
+            "audio_url": fallback_url or ""
+        }, error_status(cause)
+
+    if isinstance(cause, TIMEOUT_ERRORS):
+        fallback_url = generate_fallback_audio("The voice service is taking too long to respond.")
+        return {
+            "error": "Murf API timeout",
+            "message": "The TTS service didn't respond in time",
+            "audio_url": fallback_url or ""
+        }, 504
+
+    if isinstance(cause, TRANSPORT_ERRORS):
+        fallback_url = generate_fallback_audio("Voice service is currently unavailable.")
+        return {
+            "error": "Murf API request failed",
+            "message": str(cause),
+            "audio_url": fallback_url or "",
+            "details": {
+                "endpoint": GENERATE_ENDPOINT,
+                "timeout": murf_timeout("generate")[1],
+                "voice_used": voice_id
+            }
+        }, 502
+
+    raise cause
+
 # Day 7: Echo Bot v2 Endpoint
 @app.route('/tts/echo', methods=['POST'])
 def echo_tts():
@@ -651,9 +1511,9 @@ def echo_tts():
         }), 400
     
     try:
-        # Read audio file content
-        audio_data = audio_file.read()
-        if not audio_data:
+        # Size the upload without reading it into memory
+        audio, audio_size = open_audio_upload(audio_file)
+        if not audio_size:
             fallback_url = generate_fallback_audio("The audio file was empty.")
             return jsonify({
                 'error': 'Empty audio file',
@@ -661,122 +1521,30 @@ def echo_tts():
                 'audio_url': fallback_url or ""
             }), 400
 
-        # Reset file pointer after reading
-        audio_file.seek(0)
-
-        # Step 1: Transcribe the audio
-        try:
-            transcriber = aai.Transcriber()
-            transcript = transcriber.transcribe(audio_data)
-            
-            if transcript.error:
-                fallback_url = generate_fallback_audio("I couldn't understand the audio.")
-                return jsonify({
-                    "error": "Transcription failed",
-                    "message": transcript.error,
-                    "audio_url": fallback_url or ""
-                }), 500
-            
-            transcription_text = transcript.text
-            if not transcription_text.strip():
-                fallback_url = generate_fallback_audio("No speech was detected in the audio.")
-                return jsonify({
-                    "error": "Empty transcription result",
-                    "message": "The audio file didn't contain any recognizable speech",
-                    "audio_url": fallback_url or ""
-                }), 400
-
-        except Exception as e:
-            logger.error(f"Transcription error: {str(e)}")
-            fallback_url = generate_fallback_audio("I'm having trouble understanding the audio.")
+        valid_voices = get_valid_voices()  # In-memory, no network call
+        if not valid_voices:
+            fallback_url = generate_fallback_audio("Voice options are currently unavailable.")
             return jsonify({
-                "error": "Transcription service error",
-                "message": str(e),
+                "error": "No available voices",
+                "message": "Could not retrieve valid voices from Murf API",
                 "audio_url": fallback_url or ""
             }), 500
+        default_voice = "en-US-Natalie" if "en-US-Natalie" in valid_voices else valid_voices[0]
 
-        # Step 2: Generate TTS
+        # Transcribe the audio, then speak the transcription back
+        turn = new_turn(audio=audio, voice_id=default_voice)
         try:
-            valid_voices = get_valid_voices()
-            if not valid_voices:
-                fallback_url = generate_fallback_audio("Voice options are currently unavailable.")
-                return jsonify({
-                    "error": "No available voices",
-                    "message": "Could not retrieve valid voices from Murf API",
-                    "audio_url": fallback_url or ""
-                }), 500
-                
-            default_voice = "en-US-Natalie" if "en-US-Natalie" in valid_voices else valid_voices[0]
-            
-            payload = {
-                "text": transcription_text[:3000],  # Ensure we don't exceed API limits
-                "voiceId": default_voice,
-                "format": "mp3",
-                "sampleRate": 24000
-            }
+            echo_pipeline.run(turn)
+        except StageFailed as e:
+            return echo_failure(e, default_voice)
 
-            response = requests.post(
-                GENERATE_ENDPOINT,
-                json=payload,
-                headers=get_auth_headers(),
-                timeout=15
-            )
-            
-            if response.status_code != 200:
-                fallback_url = generate_fallback_audio("I'm having trouble generating a response.")
-                return jsonify({
-                    "error": "Murf API error",
-                    "message": response.text,
-                    "status_code": response.status_code,
-                    "audio_url": fallback_url or ""
-                }), 502
-            
-            response_data = response.json()
-            audio_url = (response_data.get("audioFile") or 
-                       response_data.get("audioStreamUrl") or 
-                       response_data.get("url") or 
-                       response_data.get("audio_url"))
-            
-            if not audio_url:
-                fallback_url = generate_fallback_audio("Response generation failed.")
-                return jsonify({
-                    "error": "No audio URL in response",
-                    "message": "TTS service returned no audio URL",
-                    "audio_url": fallback_url or "",
-                    "debug": {
-                        "response_keys": list(response_data.keys()),
-                        "suggested_fields": ["audioFile", "audioStreamUrl", "url", "audio_url"]
-                    }
-                }), 500
-                
-            return jsonify({
-                "success": True,
-                "audio_url": audio_url,
-                "transcription": transcription_text,
-                "voice_used": default_voice,
-                "text_length": len(transcription_text)
-            })
-
-        except requests.exceptions.Timeout:
-            fallback_url = generate_fallback_audio("The voice service is taking too long to respond.")
-            return jsonify({
-                "error": "Murf API timeout",
-                "message": "The TTS service didn't respond in time",
-                "audio_url": fallback_url or ""
-            }), 504
-            
-        except requests.exceptions.RequestException as e:
-            fallback_url = generate_fallback_audio("Voice service is currently unavailable.")
-            return jsonify({
-                "error": "Murf API request failed",
-                "message": str(e),
-                "audio_url": fallback_url or "",
-                "details": {
-                    "endpoint": GENERATE_ENDPOINT,
-                    "timeout": 15,
-                    "voice_used": default_voice
-                }
-            }), 502
+        return jsonify({
+            "success": True,
+            "audio_url": turn.audio_url,
+            "transcription": turn.transcription,
+            "voice_used": default_voice,
+            "text_length": len(turn.transcription)
+        })
 
     except Exception as e:
         logger.error(f"Unexpected error in echo_tts: {str(e)}")
@@ -791,93 +1559,61 @@ def echo_tts():
 def transcribe_audio(audio_file):
     """Transcribe audio using AssemblyAI"""
     try:
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(audio_file.read())
-        
-        if transcript.error:
-            raise Exception(f"Transcription failed: {transcript.error}")
-            
-        return transcript.text
-    except Exception as e:
-        logger.error(f"Transcription error: {str(e)}")
+        return transcribe_pipeline.run(new_turn(audio=open_audio_upload(audio_file)[0])).transcription
+    except StageFailed as e:
+        logger.error(f"Transcription error: {str(e.cause)}")
         raise Exception("Could not transcribe audio")
 
 def get_ai_response(text):
     """Get response from Gemini AI"""
     try:
-        response = model.generate_content(text)
-        return response.text
-    except Exception as e:
-        logger.error(f"AI response error: {str(e)}")
+        return llm_pipeline.run(new_turn(transcription=text)).response_text
+    except StageFailed as e:
+        logger.error(f"AI response error: {str(e.cause)}")
         raise Exception("Could not generate AI response")
 
 def text_to_speech(text):
     """Convert text to speech using Murf.ai"""
     try:
-        response = requests.post(
-            GENERATE_ENDPOINT,
-            json={
-                "text": text[:3000],  # Limit to 3000 chars
-                "voiceId": "en-US-Natalie",
-                "format": "mp3",
-                "sampleRate": 24000
-            },
-            headers=get_auth_headers(),
-            timeout=15
-        )
-        
-        if response.status_code != 200:
-            raise Exception(f"TTS API error: {response.text}")
-            
-        return response.json().get("audioFile")
-    except Exception as e:
-        logger.error(f"TTS error: {str(e)}")
+        return speech_pipeline.run(new_turn(transcription=text)).audio_url  # Limited to 3000 chars
+    except StageFailed as e:
+        logger.error(f"TTS error: {str(e.cause)}")
         raise Exception("Could not generate speech")
+def process_audio_failure(e):
+    """(payload, status) /api/process-audio answers with when a pipeline stage fails"""
+    if isinstance(e.cause, NoSpeechError):
+        return {"error": "empty_transcription", "message": str(e.cause)}, 400
+    error = {"stt": "transcription_failed", "tts": "tts_failed"}.get(e.stage, "processing_error")
+    return {"error": error, "message": str(e.cause)}, error_status(e.cause)
+
 @app.route('/api/process-audio', methods=['POST'])
 def process_audio():
     if 'audio' not in request.files:
         return jsonify({"error": "No audio file provided"}), 400
         
     audio_file = request.files['audio']
+    if wants_job():
+        return submit_job(process_audio_job, audio_file)
     
     try:
-        # 1. Transcribe audio
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(audio_file.read())
-        
-        if transcript.error:
-            return jsonify({
-                "error": "transcription_failed",
-                "message": transcript.error
-            }), 500
-            
-        # 2. Get AI response
-        response = model.generate_content(transcript.text)
-        
-        # 3. Generate speech
-        tts_response = requests.post(
-            GENERATE_ENDPOINT,
-            json={
-                "text": response.text[:3000],
-                "voiceId": "en-US-Natalie",
-                "format": "mp3",
-                "sampleRate": 24000
-            },
-            headers=get_auth_headers(),
-            timeout=15
-        )
-        
-        if tts_response.status_code != 200:
-            return jsonify({
-                "error": "tts_failed",
-                "message": tts_response.text
-            }), 500
+        # 1. Transcribe audio, 2. get the AI response, 3. generate speech
+        turn = new_turn(audio=open_audio_upload(audio_file)[0])
+        try:
+            if wants_stream():
+                transcribe_pipeline.run(turn)
+                return sse_response(stream_voice_reply(
+                    lambda: gemini_model.get().generate_content(turn.transcription, stream=True, request_options={"timeout": GEMINI_TIMEOUT}),
+                    {"transcription": turn.transcription}
+                ))
+            voice_pipeline.run(turn)
+        except StageFailed as e:
+            return process_audio_failure(e)
             
         return jsonify({
             "success": True,
-            "transcription": transcript.text,
-            "response": response.text,
-            "audio_url": tts_response.json().get("audioFile")
+            "transcription": turn.transcription,
+            "response": turn.response_text,
+            "audio_url": turn.audio_url
         })
         
     except Exception as e:
@@ -886,6 +1622,102 @@ def process_audio():
             "message": str(e)
         }), 500
  
+def chat_reply(session_id, user_text, deliver=None):
+    """Run one text turn of a session through Gemini and Murf"""
+    turn = Turn(transcription=user_text, history=history_window.contents(session_id),
+                session_id=session_id, route="live_transcribe",
+                tts_options={"deliver": deliver or AUDIO_DELIVERY})
+    reply_pipeline.run(turn)
+    return turn.response_text, turn.audio_url
+
+# Real-time transcription over WebSocket (requires flask-sock)
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route('/ws/transcribe/<session_id>')
+    def live_transcribe(ws, session_id):
+        """Stream 16 kHz PCM16 audio in; send partial/final transcripts and chat replies out
+
+        Binary frames are raw audio, a text frame {"type": "stop"} ends the
+        utterance. Every final transcript is fed straight into the chat
+        pipeline without waiting for an upload. With `?audio=binary` each
+        reply (carrying `audio_bytes`) is followed by one binary frame with
+        its MP3, so the client never has to fetch the clip itself.
+        """
+        inline_audio = request.args.get('audio') == 'binary'
+        try:
+            stt = StreamingTranscription(AAI_API_KEY)
+            stt.start()
+        except Exception as e:
+            logger.error(f"Could not start streaming transcription: {str(e)}")
+            ws.send(json.dumps({"type": "error", "message": str(e)}))
+            return
+        ws.send(json.dumps({"type": "ready"}))  # Clients fall back to uploads without it
+        client_ip = request.remote_addr
+
+        pending_replies = []
+
+        def reply(text):
+            try:
+                response_text, audio_url = chat_reply(session_id, text,
+                                                      deliver="relay" if inline_audio else None)
+                payload = {
+                    "transcription": text,
+                    "llm_response": response_text,
+                    "audio_url": audio_url,
+                    "session_id": session_id
+                }
+                if inline_audio:
+                    payload["audio"] = audio_relay.fetch(relay_key(audio_url))
+                    payload["audio_bytes"] = len(payload["audio"])
+                stt.events.put(("reply", payload))
+            except Exception as e:
+                logger.error(f"Live chat reply failed: {str(e)}")
+                stt.events.put(("error", str(e)))
+
+        def drain():
+            while True:
+                try:
+                    kind, payload = stt.events.get_nowait()
+                except queue.Empty:
+                    return
+                if kind == "reply":
+                    audio = payload.pop("audio", None)
+                    ws.send(json.dumps({"type": "reply", **payload}))
+                    if audio is not None:
+                        ws.send(audio)
+                    continue
+                ws.send(json.dumps({"type": kind, "text": payload}))
+                if kind == "final":
+                    # Each turn costs an LLM and a TTS call: limit it like an HTTP request
+                    limited = request_limit_error("live_transcribe", client_ip, session_id)
+                    if limited:
+                        ws.send(json.dumps({"type": "error", **limited[0]}))
+                        continue
+                    worker = threading.Thread(target=reply, args=(payload,), daemon=True)
+                    worker.start()
+                    pending_replies.append(worker)
+
+        stopped = False
+        try:
+            while not stopped:
+                message = ws.receive(timeout=0.05)
+                if isinstance(message, (bytes, bytearray)):
+                    stt.send(message)
+                elif message and json.loads(message).get("type") == "stop":
+                    stopped = True
+                drain()
+
+            # Terminating the session flushes the last turn; deliver its reply too
+            stt.close()
+            drain()
+            for worker in pending_replies:
+                worker.join(timeout=30)
+                drain()
+            ws.send(json.dumps({"type": "closed"}))
+        finally:
+            stt.close()
+
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory('static', 'favicon.ico')
@@ -893,13 +1725,167 @@ def favicon():
 # Voice List Endpoint
 @app.route('/get_voices', methods=['GET'])
 def list_voices():
-    """Endpoint to get available voices"""
-    voices = get_valid_voices()
+    """Endpoint to get available voices
+
+    Optional query params: `locale` (e.g. en-US) filters the list,
+    `details=1` returns full metadata, `refresh=1` forces a reload from Murf.
+    """
+    refresh = bool(request.args.get('refresh'))
+    if refresh:
+        retry_after = rate_limiter.try_take("voice_refresh")
+        if retry_after:
+            return rate_limited_response(*rate_limited_payload("voice_refresh", retry_after))
+    voices = get_valid_voices(force_refresh=refresh)
+    locale = request.args.get('locale')
+    if request.args.get('details'):
+        details = voice_catalog.by_locale(locale) if locale else voice_catalog.all()
+        return jsonify({"voices": details})
+    if locale:
+        voices = [v["voiceId"] for v in voice_catalog.by_locale(locale)]
     return jsonify({"voices": voices})
 
+# Connection pool stats for sizing the Murf client under load
+@app.route('/debug/pool', methods=['GET'])
+def pool_stats():
+    """Endpoint to inspect the shared Murf connection pool"""
+    return jsonify({"murf": murf_http.pool_stats()})
+
+@app.route('/debug/circuits', methods=['GET'])
+def circuit_stats():
+    """Endpoint to inspect vendor circuit breakers and the read timeouts in use"""
+    timeouts = {"murf": murf_timeout("generate")[1], "gemini": gemini_options()["timeout"]}
+    return jsonify({
+        breaker.name: {**breaker.stats(), "read_timeout": timeouts.get(breaker.name)}
+        for breaker in breakers
+    })
+
+@app.route('/debug/cache', methods=['GET'])
+def cache_stats():
+    """Endpoint to inspect cache hit/miss counters"""
+    return jsonify({
+        "tts": tts_cache.stats(),
+        "stt": stt_cache.stats(),
+        "fallback_audio": fallback_audio.stats(),
+        "audio_relay": audio_relay.stats(),
+        "blobs": {name: store.stats() for name, store in blob_stores.items()},
+        "coalesced": {f"{type(c).__name__}:{c.name}": c.stats() for c in coalescers},
+        "voices": voice_catalog.stats()
+    })
+
+def collect_component_metrics():
+    """Export the existing cache / pool counters alongside the stage metrics"""
+    tts = tts_cache.stats()
+    stt = stt_cache.stats()
+    relay = audio_relay.stats()
+    blobs = {name: store.stats() for name, store in blob_stores.items()}
+    pool = murf_http.pool_stats()
+    uploads = upload_stats.snapshot()
+    jobs = job_queue.stats()
+    limits = rate_limiter.stats()["limits"]
+    startup = startup_report.stats()
+    return [
+        ("voice_agent_cache_lookups_total", "counter", "Cache lookups by result", [
+            ({"cache": "tts", "result": "hit"}, tts["hits"]),
+            ({"cache": "tts", "result": "miss"}, tts["misses"]),
+            ({"cache": "stt", "result": "hit"}, stt["hits"]),
+            ({"cache": "stt", "result": "miss"}, stt["misses"]),
+            ({"cache": "history", "result": "hit"}, history_window.cache_hits),
+            ({"cache": "history", "result": "miss"}, history_window.cache_misses),
+            ({"cache": "audio_relay", "result": "hit"}, relay["hits"]),
+            ({"cache": "audio_relay", "result": "miss"}, relay["misses"]),
+        ]),
+        ("voice_agent_blob_store_bytes", "gauge", "Bytes held by each audio blob store",
+         [({"store": name}, stats["bytes"]) for name, stats in blobs.items()]),
+        ("voice_agent_blob_store_evictions_total", "counter", "Blobs deleted by size/age retention",
+         [({"store": name}, stats["evictions"]) for name, stats in blobs.items()]),
+        ("voice_agent_audio_relayed_bytes_total", "counter", "Audio bytes streamed from Murf to clients by this server",
+         [({}, relay["relayed_bytes"])]),
+        ("voice_agent_coalesced_requests_total", "counter", "Requests that shared an identical in-flight upstream call", [
+            ({"vendor": vendor}, sum(c.coalesced for c in coalescers if c.name == vendor))
+            for vendor in ("murf", "gemini")
+        ]),
+        ("voice_agent_circuit_open", "gauge", "1 while a vendor's circuit breaker is open or half-open", [
+            ({"vendor": b.name}, 0 if b.stats()["state"] == "closed" else 1) for b in breakers
+        ]),
+        ("voice_agent_circuit_rejections_total", "counter", "Calls failed fast because the vendor's circuit was open",
+         [({"vendor": b.name}, b.rejected) for b in breakers]),
+        ("voice_agent_upstream_read_timeout_seconds", "gauge", "Read timeout currently applied to vendor calls", [
+            ({"vendor": "murf"}, murf_timeout("generate")[1]),
+            ({"vendor": "gemini"}, gemini_options()["timeout"]),
+        ]),
+        ("voice_agent_upstream_requests_total", "counter", "HTTP requests sent to an upstream vendor",
+         [({"vendor": "murf"}, pool["requests"])]),
+        ("voice_agent_upstream_retries_total", "counter", "Retries made by the vendor HTTP client",
+         [({"vendor": "murf"}, pool["retries"])]),
+        ("voice_agent_pool_connections_opened_total", "counter", "Connections opened by the vendor HTTP client",
+         [({"vendor": "murf"}, pool["connections_opened"])]),
+        ("voice_agent_jobs", "gauge", "Background jobs waiting or running", [
+            ({"state": "queued"}, jobs["queued"]),
+            ({"state": "running"}, jobs["running"]),
+        ]),
+        ("voice_agent_jobs_total", "counter", "Background jobs by outcome (rejected = queue full, answered 429)", [
+            ({"outcome": "completed"}, jobs["completed"]),
+            ({"outcome": "failed"}, jobs["failed"]),
+            ({"outcome": "rejected"}, jobs["rejected"]),
+        ]),
+        ("voice_agent_rate_limit_decisions_total", "counter", "Rate limit checks by limit and result", [
+            ({"limit": name, "result": result}, stats[result])
+            for name, stats in limits.items() for result in ("allowed", "limited")
+        ]),
+        ("voice_agent_startup_seconds", "gauge", "Time spent in each startup phase (ready = until the app could serve)", [
+            ({"phase": phase}, ms / 1000) for phase, ms in startup["phases_ms"].items()
+        ] + ([({"phase": "ready"}, startup["ready_ms"] / 1000)] if startup["ready_ms"] is not None else [])),
+        ("voice_agent_sessions", "gauge", "Conversation sessions held by the session store",
+         [({}, len(chat_history_store))]),
+        ("voice_agent_upload_memory_in_use_bytes", "gauge", "Upload bytes currently held in memory",
+         [({}, uploads["in_memory_bytes"])]),
+        ("voice_agent_upload_memory_peak_bytes", "gauge", "Most upload bytes held in memory at once",
+         [({}, uploads["peak_in_memory_bytes"])]),
+    ]
+
+REGISTRY.add_collector(collect_component_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/limits', methods=['GET'])
+def rate_limit_stats():
+    """Endpoint to inspect rate limits and how often they were hit"""
+    return jsonify(rate_limiter.stats())
+
+@app.route('/debug/startup', methods=['GET'])
+def startup_stats():
+    """Endpoint to inspect where startup time went and which vendor clients are built"""
+    return jsonify({
+        **startup_report.stats(),
+        "clients": {client.name: client.stats() for client in (gemini_model, assemblyai_sdk)}
+    })
+
+@app.route('/debug/jobs', methods=['GET'])
+def job_queue_stats():
+    """Endpoint to inspect the background job queue"""
+    return jsonify(job_queue.stats())
+
+@app.route('/debug/uploads', methods=['GET'])
+def upload_memory_stats():
+    """Endpoint to inspect how much upload data is held in memory"""
+    return jsonify({
+        **upload_stats.snapshot(),
+        "spool_max_size": UploadRequest.spool_max_size,
+        "preprocessing": audio_preprocessor.stats()
+    })
+
+@app.route('/debug/sessions', methods=['GET'])
+def session_stats():
+    """Endpoint to inspect the conversation session store"""
+    return jsonify({**chat_history_store.stats(), "history": history_window.stats()})
+
 # Flet Application
-def flet_app(page: ft.Page):
+def flet_app(page):
     """Updated Flet UI with full pipeline integration"""
+    ft = startup_report.import_module("flet")
     page.title = "AI Voice Agent (Day 9)"
     page.vertical_alignment = ft.MainAxisAlignment.CENTER
     page.horizontal_alignment = ft.CrossAxisAlignment.CENTER
@@ -933,19 +1919,19 @@ def flet_app(page: ft.Page):
                 voice_dropdown.options = [ft.dropdown.Option(voice) for voice in voices]
                 page.update()
         except Exception as e:
-            print(f"Error getting voices: {e}")
+            logger.error(f"Error getting voices: {e}")
     
     # Initialize voices
     get_voices()
     
     # Recording functionality
-    def start_recording(e):
+    def start_recording(_):
         recording_status.value = "Recording... (Note: Actual recording requires browser implementation)"
         start_recording_btn.disabled = True
         stop_recording_btn.disabled = False
         page.update()
     
-    def stop_recording(e):
+    def stop_recording(_):
         recording_status.value = "Processing recording..."
         start_recording_btn.disabled = False
         stop_recording_btn.disabled = True
@@ -967,7 +1953,8 @@ def flet_app(page: ft.Page):
                     data = response.json()
                     transcription_display.value = f"Transcription: {data.get('transcription', '')}"
                     llm_response_display.value = f"LLM Response: {data.get('llm_response', '')}"
-                    response_player.src = data.get('audio_url')
+                    # Relayed clips have a path on this server, not a full URL
+                    response_player.src = urljoin(f"http://{request.host}/", data.get('audio_url') or "")
                     recording_status.value = "Processing complete!"
                 else:
                     recording_status.value = f"Error: {response.text}"
@@ -1002,7 +1989,7 @@ def flet_app(page: ft.Page):
 # Route to serve Flet app
 @app.route('/flet')
 def flet_route():
-    ft.app(target=flet_app)
+    startup_report.import_module("flet").app(target=flet_app)
     return "Flet app should have launched"
 
 # Web Interface (Day 3 Task)
@@ -1011,7 +1998,31 @@ def index():
     """Render the web interface with TTS and Echo Bot"""
     return render_template('index.html')
 
+startup_report.mark("app")
+
+def start_background_tasks():
+    """Start this process's background threads: catalogue refresh, blob retention, fallback clips, SDK warm-up
+
+    Network and SDK warm-up happens after startup, off the request path. With
+    PREFORK=1 the app is imported once in a parent process that then forks
+    workers (workers.py, or gunicorn --preload); threads do not survive a
+    fork, so each worker calls this itself once it is running.
+    """
+    voice_catalog.start()
+    for store in blob_stores.values():
+        store.start()
+    if os.getenv("FALLBACK_WARMUP", "1") != "0":
+        fallback_audio.warm_in_background(FALLBACK_MESSAGES)
+    if os.getenv("STARTUP_WARMUP", "1") != "0":
+        warm_in_background(startup_report, {
+            "assemblyai": assemblyai_sdk.get,
+            "gemini": gemini_model.get,
+        })
+
+if os.getenv("PREFORK") != "1":
+    start_background_tasks()
+startup_report.ready()
+
 if __name__ == '__main__':
    
-    get_valid_voices()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,610 @@
+"""ASGI serving mode: the voice pipeline on an event loop
+
+The Flask app holds a worker thread for the whole AssemblyAI + Gemini + Murf
+round trip of every turn. Here the same routes await those calls instead, so
+one process can keep hundreds of conversations in flight:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Routes run the same pipeline stages and middleware as app.py (cache,
+metrics, retries) with awaitable vendor calls, and answer with the same JSON
+shapes. HTTP routes without an async version (static files, uploads,
+streaming replies) fall through to the Flask app unchanged. WebSockets do
+not: WsgiToAsgi only speaks HTTP, and flask-sock needs the Flask server, so
+`/ws/transcribe` handshakes are refused here and clients fall back to
+uploads. Requires starlette, python-multipart, httpx and asgiref.
+"""
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.websockets import WebSocketClose
+
+import app as flask_app
+from cache import hash_content, make_key
+from single_flight import AsyncSingleFlight
+from pipeline import NoSpeechError, Pipeline, Stage, StageFailed, Turn
+from tts_chunks import MURF_MAX_CHARS, split_text
+from uploads import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+AAI_BASE_URL = os.getenv("AAI_BASE_URL", "https://api.assemblyai.com") + "/v2"
+AAI_POLL_INTERVAL = float(os.getenv("AAI_POLL_INTERVAL", "0.5"))
+AAI_TRANSCRIBE_TIMEOUT = float(os.getenv("AAI_TRANSCRIBE_TIMEOUT", "120"))
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "100"))
+
+_limits = httpx.Limits(
+    max_connections=ASYNC_MAX_CONNECTIONS,
+    max_keepalive_connections=ASYNC_MAX_CONNECTIONS // 2,
+)
+murf_async = httpx.AsyncClient(
+    headers=flask_app.get_auth_headers(),
+    timeout=httpx.Timeout(15, connect=3.05),
+    # Transport-level retries cover connection failures only
+    transport=httpx.AsyncHTTPTransport(retries=int(os.getenv("MURF_RETRIES", "2")), limits=_limits),
+)
+aai_async = httpx.AsyncClient(
+    base_url=AAI_BASE_URL,
+    headers={"authorization": flask_app.AAI_API_KEY or ""},
+    limits=_limits,
+    timeout=httpx.Timeout(60, connect=3.05),
+)
+
+
+# Route label for stage metrics (same names as the Flask endpoints)
+current_route = contextvars.ContextVar("current_route", default="background")
+# Upload bytes the current request holds in memory (released when it finishes)
+upload_memory = contextvars.ContextVar("upload_memory", default=0)
+
+
+async def request_limit_error(endpoint, client_ip, session_id=None):
+    """app.request_limit_error; SQLite and Redis buckets are checked in a worker thread"""
+    if flask_app.rate_limiter.backend.blocking:
+        return await asyncio.to_thread(flask_app.request_limit_error, endpoint, client_ip, session_id)
+    return flask_app.request_limit_error(endpoint, client_ip, session_id)
+
+
+def instrumented(endpoint):
+    """Tag every stage timed while `endpoint` runs with its name and apply per-client limits"""
+    async def handler(request):
+        current_route.set(endpoint.__name__)
+        flask_app.job_route.set(endpoint.__name__)  # route_label() for code shared with app.py
+        limited = await request_limit_error(
+            endpoint.__name__,
+            request.client.host if request.client else None,
+            request.path_params.get("session_id")
+        )
+        if limited:
+            payload, retry_after = limited
+            return JSONResponse(payload, 429, headers={"Retry-After": str(retry_after)})
+        try:
+            return await endpoint(request)
+        finally:
+            flask_app.upload_stats.released(upload_memory.get())
+    return handler
+
+
+# Identical requests in flight on the event loop share one upstream call
+murf_flight = AsyncSingleFlight("murf")
+llm_flight = AsyncSingleFlight("gemini")
+flask_app.coalescers.extend([murf_flight, llm_flight])
+
+
+# ---------- Awaitable vendor calls ----------
+
+async def vendor_budget(name, cost=1):
+    """app.vendor_budget without blocking the event loop while waiting for tokens"""
+    await flask_app.rate_limiter.acquire_async(name, cost=cost, max_wait=flask_app.VENDOR_BUDGET_MAX_WAIT)
+
+
+async def gemini_model():
+    """app.gemini_model; the first call builds it (SDK import included) in a worker thread"""
+    if flask_app.gemini_model.ready:
+        return flask_app.gemini_model.get()
+    return await asyncio.to_thread(flask_app.gemini_model.get)
+
+
+async def transcribe(audio):
+    """Upload audio to AssemblyAI and poll the transcript without blocking the loop
+
+    `audio` is bytes or an UploadFile; uploads are streamed in chunks rather
+    than read into memory. Returns an object with `.text` and `.error`, like
+    the SDK's Transcript. Caching and metrics come from the pipeline's STT stage.
+    """
+    if flask_app.audio_preprocessor.enabled:
+        with flask_app.stage_timer("preprocess", route=current_route.get()):
+            if not isinstance(audio, (bytes, bytearray)):
+                await audio.seek(0)
+                audio = await audio.read()
+            audio = await asyncio.to_thread(flask_app.audio_preprocessor.process, audio)
+    await vendor_budget("aai_requests")
+    with flask_app.stt_breaker.guard(record_latency=False):
+        return await _transcribe(audio)
+
+
+async def _hash_audio(audio):
+    """Content hash of bytes or an UploadFile, read in chunks"""
+    if isinstance(audio, (bytes, bytearray)):
+        return hash_content(audio)
+    digest = hashlib.blake2b(digest_size=20)
+    await audio.seek(0)
+    while chunk := await audio.read(CHUNK_SIZE):
+        digest.update(chunk)
+    await audio.seek(0)
+    return digest.hexdigest()
+
+
+async def _iter_upload(upload):
+    await upload.seek(0)
+    while chunk := await upload.read(CHUNK_SIZE):
+        yield chunk
+
+
+async def _transcribe(audio):
+    if isinstance(audio, (bytes, bytearray)):
+        upload = await aai_async.post("/upload", content=audio)
+    else:
+        upload = await aai_async.post(
+            "/upload",
+            content=_iter_upload(audio),
+            headers={"Content-Length": str(audio.size)}
+        )
+    upload.raise_for_status()
+    job = await aai_async.post("/transcript", json={"audio_url": upload.json()["upload_url"]})
+    job.raise_for_status()
+    transcript_id = job.json()["id"]
+
+    deadline = time.monotonic() + AAI_TRANSCRIBE_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(AAI_POLL_INTERVAL)
+        result = await aai_async.get(f"/transcript/{transcript_id}")
+        result.raise_for_status()
+        data = result.json()
+        if data["status"] == "completed":
+            return SimpleNamespace(text=data.get("text") or "", error=None)
+        if data["status"] == "error":
+            return SimpleNamespace(text="", error=data.get("error") or "Transcription failed")
+    return SimpleNamespace(text="", error="Transcription timed out")
+
+
+async def generate_reply(text):
+    """Single-shot Gemini completion; identical prompts in flight share one call"""
+    async def call_gemini():
+        model = await gemini_model()
+        await vendor_budget("gemini_requests")
+        with flask_app.gemini_breaker.guard():
+            response = await model.generate_content_async(text, request_options=flask_app.gemini_options())
+        return response.text
+
+    return await llm_flight.do(make_key("llm", text), call_gemini)
+
+
+async def chat_reply(history, text):
+    """Gemini chat turn with the session's windowed history"""
+    chat = (await gemini_model()).start_chat(history=history)
+    await vendor_budget("gemini_requests")
+    with flask_app.gemini_breaker.guard():
+        response = await chat.send_message_async(text, request_options=flask_app.gemini_options())
+    return response.text
+
+
+async def synthesize(text, voice_id="en-US-Natalie", url=None, timeout=None, deliver=None):
+    """Generate speech with Murf and return the audio URL (shares app.tts_cache)
+
+    With AUDIO_DELIVERY=relay (or `deliver="relay"`) the URL is this server's
+    /audio/<key>, which the Flask app behind it streams.
+    """
+    payload = flask_app.tts_payload(text, voice_id)
+    cache_key = flask_app.tts_cache_key(payload)
+    relayed = (deliver or flask_app.AUDIO_DELIVERY) == "relay"
+    if relayed and flask_app.blob_stores["tts"].contains(cache_key, ".mp3"):
+        return flask_app.RELAY_PREFIX + cache_key
+    audio_url = flask_app.tts_cache.get(cache_key)
+    if audio_url:
+        return flask_app.RELAY_PREFIX + cache_key if relayed else audio_url
+
+    async def call_murf():
+        if timeout is None:
+            connect, read = flask_app.murf_timeout("generate")
+            request_timeout = httpx.Timeout(read, connect=connect)
+        else:
+            request_timeout = timeout
+        await vendor_budget("murf_chars", cost=len(text))
+        with flask_app.murf_breaker.guard(), flask_app.stage_timer("tts_chunk", route=current_route.get(), voice=voice_id):
+            response = await murf_async.post(
+                url or flask_app.GENERATE_ENDPOINT,
+                json=payload,
+                timeout=request_timeout
+            )
+            if response.status_code != 200:
+                raise flask_app.MurfAPIError(response.text, status=response.status_code, text=text)
+            audio_url = flask_app.extract_audio_url(response.json())
+            if not audio_url:
+                raise flask_app.MurfAPIError("No audio URL returned", response=response.json(), text=text)
+
+        flask_app.tts_cache.set(cache_key, audio_url)
+        return audio_url
+
+    audio_url = await murf_flight.do(cache_key, call_murf)
+    return flask_app.RELAY_PREFIX + cache_key if relayed else audio_url
+
+
+async def fallback_audio(message, voice_id="en-US-Natalie"):
+    """Pre-rendered local clip (app.generate_fallback_audio never blocks)"""
+    return flask_app.generate_fallback_audio(message, voice_id, route=current_route.get())
+
+
+async def synthesize_all(chunks, voice_id="en-US-Natalie", **options):
+    """Synthesise chunks concurrently (bounded) and return URLs in order"""
+    limit = asyncio.Semaphore(flask_app.TTS_MAX_WORKERS)
+
+    async def one(chunk):
+        async with limit:
+            return await synthesize(chunk, voice_id, **options)
+
+    return await asyncio.gather(*(one(chunk) for chunk in chunks))
+
+
+async def read_upload(request, field):
+    """Return (filename, UploadFile) for an uploaded file field, or (None, None)
+
+    The file stays in Starlette's spooled buffer (spilled to disk when large);
+    its contents are never copied into a `bytes` object.
+    """
+    with flask_app.stage_timer("upload_read", route=current_route.get()):
+        form = await request.form()
+        upload = form.get(field)
+        if upload is None or not hasattr(upload, "read"):
+            return None, None
+    if upload.size is None:
+        upload.size = upload.file.seek(0, os.SEEK_END)
+        upload.file.seek(0)
+    in_memory = 0 if getattr(upload.file, "_rolled", False) else upload.size
+    flask_app.upload_stats.opened(upload.size, in_memory)
+    flask_app.upload_memory_bytes.observe(in_memory, route=current_route.get())
+    upload_memory.set(upload_memory.get() + in_memory)
+    return upload.filename or "", upload
+
+
+# ---------- Pipeline ----------
+# app.py's stages with awaitable vendor calls, run through app.py's middleware
+
+async def transcribe_turn(turn):
+    flask_app.accept_transcript(turn, await transcribe(turn.audio))
+
+
+async def reply_to_turn(turn):
+    if turn.history is None:
+        turn.response_text = await generate_reply(turn.transcription)
+    else:
+        turn.response_text = await chat_reply(turn.history, turn.transcription)
+
+
+async def speak_turn(turn):
+    text = turn.speech_text
+    turn.chunks = split_text(text, flask_app.TTS_CHUNK_CHARS) if turn.chunked else [text[:MURF_MAX_CHARS]]
+    turn.audio_urls = await synthesize_all(turn.chunks, turn.voice_id, **turn.tts_options)
+
+
+async def remember_turn(turn):
+    # Session store writes (SQLite, Redis) and summary folding block
+    await asyncio.to_thread(flask_app.remember_turn, turn)
+
+
+def async_stage(stage, fn):
+    return Stage(stage.name, fn, stage.produces, stage.metric)
+
+
+stt_stage = async_stage(flask_app.stt_stage, transcribe_turn)
+llm_stage = async_stage(flask_app.llm_stage, reply_to_turn)
+tts_stage = async_stage(flask_app.tts_stage, speak_turn)
+remember_stage = async_stage(flask_app.remember_stage, remember_turn)
+
+
+def build_pipeline(*stages):
+    return Pipeline(stages, flask_app.pipeline_middleware)
+
+
+voice_pipeline = build_pipeline(stt_stage, llm_stage, tts_stage, remember_stage)
+echo_pipeline = build_pipeline(stt_stage, tts_stage)
+transcribe_pipeline = build_pipeline(stt_stage)
+speech_pipeline = build_pipeline(tts_stage)
+
+# The shared failure responses should also recognise httpx's transport errors
+flask_app.TIMEOUT_ERRORS += (httpx.TimeoutException,)
+flask_app.TRANSPORT_ERRORS += (httpx.HTTPError,)
+
+
+async def audio_turn(audio, **kwargs):
+    """A Turn for an upload, its content hash taken up front (for the transcript cache)"""
+    turn = Turn(audio=audio, route=current_route.get(), **kwargs)
+    turn.audio_hash = await _hash_audio(audio)
+    return turn
+
+
+# ---------- Routes ----------
+
+async def query_llm(request: Request):
+    try:
+        filename, audio_upload = await read_upload(request, "audio")
+        if filename is None:
+            return JSONResponse({"error": "No audio file provided"}, 400)
+        if filename == "":
+            return JSONResponse({"error": "No selected file"}, 400)
+        if not flask_app.allowed_file(filename):
+            return JSONResponse({"error": "Invalid file type"}, 400)
+
+        turn = await audio_turn(audio_upload, chunked=True)
+        try:
+            await voice_pipeline.run_async(turn)
+        except StageFailed as e:
+            return JSONResponse(*flask_app.query_llm_failure(e))
+
+        if len(turn.audio_urls) > 1:
+            return JSONResponse({
+                "success": True,
+                "audio_urls": turn.audio_urls,
+                "transcription": turn.transcription,
+                "llm_response": turn.response_text,
+                "warning": "Response exceeded 3000 characters - multiple audio files returned"
+            })
+        return JSONResponse({
+            "success": True,
+            "audio_url": turn.audio_url,
+            "transcription": turn.transcription,
+            "llm_response": turn.response_text
+        })
+
+    except Exception as e:
+        return JSONResponse({
+            "error": "Internal Server Error",
+            "message": str(e),
+            "type": type(e).__name__,
+            "details": "Unexpected error in processing pipeline"
+        }, 500)
+
+
+async def chat_with_history(request: Request):
+    session_id = request.path_params["session_id"]
+    try:
+        filename, audio_upload = await read_upload(request, "audio")
+        if filename is None:
+            return JSONResponse({
+                "error": "invalid_input",
+                "message": "No audio file provided",
+                "audio_url": await fallback_audio("Please send an audio message")
+            }, 400)
+        if not flask_app.allowed_file(filename):
+            return JSONResponse({
+                "error": "invalid_file_type",
+                "message": f"Allowed formats: {flask_app.ALLOWED_EXTENSIONS}",
+                "audio_url": await fallback_audio("Unsupported file format")
+            }, 400)
+
+        history = await asyncio.to_thread(flask_app.history_window.contents, session_id)
+
+        if not audio_upload.size:
+            return JSONResponse({
+                "error": "empty_audio",
+                "message": "Empty audio file",
+                "audio_url": await fallback_audio("The audio contains no data")
+            }, 400)
+
+        turn = await audio_turn(audio_upload, history=history, session_id=session_id)
+        try:
+            await voice_pipeline.run_async(turn)
+        except StageFailed as e:
+            return JSONResponse(*flask_app.chat_failure(e))
+
+        return JSONResponse({
+            "success": True,
+            "audio_url": turn.audio_url,
+            "transcription": turn.transcription,
+            "llm_response": turn.response_text,
+            "session_id": session_id
+        })
+
+    except Exception as e:
+        logger.critical(f"Unexpected error in chat: {str(e)}")
+        return JSONResponse({
+            "error": "server_error",
+            "message": "Internal server error",
+            "audio_url": await fallback_audio("Something went wrong")
+        }, 500)
+
+
+async def echo_tts(request: Request):
+    filename, audio_upload = await read_upload(request, "audio")
+    if filename is None:
+        return JSONResponse({
+            'error': 'No audio file provided',
+            'message': 'Please record or upload an audio file',
+            'audio_url': await fallback_audio("No audio file was provided.") or ""
+        }, 400)
+    if filename == '':
+        return JSONResponse({
+            'error': 'No selected file',
+            'message': 'Please select a valid audio file',
+            'audio_url': await fallback_audio("The selected file has no name.") or ""
+        }, 400)
+    if not flask_app.allowed_file(filename):
+        return JSONResponse({
+            'error': 'Invalid file type',
+            'message': f'Allowed formats: {", ".join(flask_app.ALLOWED_EXTENSIONS)}',
+            'audio_url': await fallback_audio("Invalid file type was uploaded.") or ""
+        }, 400)
+
+    try:
+        if not audio_upload.size:
+            return JSONResponse({
+                'error': 'Empty audio file',
+                'message': 'The uploaded file contains no data',
+                'audio_url': await fallback_audio("The audio file was empty.") or ""
+            }, 400)
+
+        valid_voices = flask_app.get_valid_voices()  # In-memory catalogue
+        if not valid_voices:
+            return JSONResponse({
+                "error": "No available voices",
+                "message": "Could not retrieve valid voices from Murf API",
+                "audio_url": await fallback_audio("Voice options are currently unavailable.") or ""
+            }, 500)
+        default_voice = "en-US-Natalie" if "en-US-Natalie" in valid_voices else valid_voices[0]
+
+        turn = await audio_turn(audio_upload, voice_id=default_voice)
+        try:
+            await echo_pipeline.run_async(turn)
+        except StageFailed as e:
+            return JSONResponse(*flask_app.echo_failure(e, default_voice))
+
+        return JSONResponse({
+            "success": True,
+            "audio_url": turn.audio_url,
+            "transcription": turn.transcription,
+            "voice_used": default_voice,
+            "text_length": len(turn.transcription)
+        })
+
+    except Exception as e:
+        logger.error(f"Unexpected error in echo_tts: {str(e)}")
+        return JSONResponse({
+            "error": "Internal server error",
+            "message": str(e),
+            "type": type(e).__name__,
+            "audio_url": await fallback_audio("An unexpected error occurred.") or ""
+        }, 500)
+
+
+async def process_audio(request: Request):
+    filename, audio_upload = await read_upload(request, "audio")
+    if filename is None:
+        return JSONResponse({"error": "No audio file provided"}, 400)
+    try:
+        turn = await audio_turn(audio_upload)
+        try:
+            await voice_pipeline.run_async(turn)
+        except StageFailed as e:
+            return JSONResponse(*flask_app.process_audio_failure(e))
+
+        return JSONResponse({
+            "success": True,
+            "transcription": turn.transcription,
+            "response": turn.response_text,
+            "audio_url": turn.audio_url
+        })
+    except Exception as e:
+        return JSONResponse({
+            "error": "processing_error",
+            "message": str(e)
+        }, 500)
+
+
+async def generate_audio(request: Request):
+    try:
+        data = await request.json()
+        text = data.get('text')
+        requested_voice = data.get('voice', 'en-US-Natalie')
+        if not text:
+            return JSONResponse({"error": "Text is required"}, 400)
+
+        turn = Turn(transcription=text, voice_id=requested_voice, route=current_route.get(),
+                    tts_options={"url": f"{flask_app.MURF_BASE_URL}/speech/generate-with-key"})
+        try:
+            await speech_pipeline.run_async(turn)
+        except StageFailed as e:
+            return JSONResponse(*flask_app.generate_audio_failure(e))
+
+        return JSONResponse({
+            "success": True,
+            "audio_url": turn.audio_url,
+            "voice_used": requested_voice
+        })
+    except Exception as e:
+        return JSONResponse({
+            "error": "Internal server error",
+            "message": str(e)
+        }, flask_app.error_status(e))
+
+
+async def transcribe_file(request: Request):
+    filename, audio_upload = await read_upload(request, "file")
+    if filename is None:
+        return JSONResponse({"error": "No file provided"}, 400)
+    turn = await audio_turn(audio_upload)
+    try:
+        await transcribe_pipeline.run_async(turn)
+    except StageFailed as e:
+        # Silence is a successful (empty) transcription here
+        if not isinstance(e.cause, NoSpeechError):
+            return JSONResponse({"error": str(e.cause)}, flask_app.error_status(e.cause))
+    return JSONResponse({
+        "transcription": turn.transcription,
+        "status": "success",
+        "message": "Audio transcribed successfully"
+    })
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await murf_async.aclose()
+    await aai_async.aclose()
+
+
+async_app = Starlette(
+    routes=[
+        Route('/llm/query', instrumented(query_llm), methods=['POST']),
+        Route('/agent/chat/{session_id}', instrumented(chat_with_history), methods=['POST']),
+        Route('/tts/echo', instrumented(echo_tts), methods=['POST']),
+        Route('/api/process-audio', instrumented(process_audio), methods=['POST']),
+        Route('/generate_audio', instrumented(generate_audio), methods=['POST']),
+        Route('/transcribe/file', instrumented(transcribe_file), methods=['POST']),
+    ],
+    lifespan=lifespan,
+)
+wsgi_app = WsgiToAsgi(flask_app.app)
+ASYNC_PATHS = {'/llm/query', '/tts/echo', '/api/process-audio', '/generate_audio', '/transcribe/file'}
+
+
+def _is_async_route(scope):
+    """Plain JSON POSTs go to the async routes; everything else stays on Flask"""
+    if scope["type"] != "http" or scope["method"] != "POST":
+        return False
+    path = scope["path"]
+    if path not in ASYNC_PATHS and not path.startswith('/agent/chat/'):
+        return False
+    # Streaming replies (?stream=1 / SSE) keep using the Flask generators, and
+    # background jobs (?async=1 / Prefer: respond-async) the Flask job queue
+    # (the same tests as app.wants_stream() and app.wants_job())
+    headers = dict(scope.get("headers") or [])
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if query.get("stream") or b"text/event-stream" in headers.get(b"accept", b""):
+        return False
+    if query.get("async", [None])[0] == "1" or b"respond-async" in headers.get(b"prefer", b""):
+        return False
+    return True
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await async_app(scope, receive, send)
+    elif scope["type"] == "websocket":
+        # Close the handshake rather than hand it to WsgiToAsgi, which would fail on it
+        await WebSocketClose(reason="WebSocket routes need the Flask server")(scope, receive, send)
+    elif _is_async_route(scope):
+        await async_app(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
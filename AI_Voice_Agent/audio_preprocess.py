@@ -0,0 +1,192 @@
+"""Shrink uploads before speech-to-text: mono, 16 kHz, silence trimmed, compact encoding
+
+Decoding uses the stdlib `wave` module for WAV input and ffmpeg (if it is on
+PATH) for everything else, e.g. the webm/ogg that MediaRecorder produces.
+The signal work (downmix, resample, energy VAD) is vectorised NumPy and takes
+a few milliseconds for a typical utterance. Whenever something is missing or
+the result would not be smaller, the original audio is sent unchanged.
+"""
+import io
+import logging
+import shutil
+import subprocess
+import threading
+import wave
+
+try:
+    import numpy as np
+except ImportError:  # Optional: preprocessing is skipped without NumPy
+    np = None
+
+logger = logging.getLogger(__name__)
+
+TARGET_RATE = 16000
+
+
+def _ffmpeg():
+    return shutil.which("ffmpeg")
+
+
+def decode(data):
+    """Return (float32 samples shaped (frames, channels), sample_rate) or None"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            return _decode_wav(data)
+        except (wave.Error, EOFError, ValueError) as e:
+            logger.debug(f"WAV decode failed, trying ffmpeg: {str(e)}")
+    ffmpeg = _ffmpeg()
+    if ffmpeg is None:
+        return None
+    # Let ffmpeg downmix and resample while it decodes
+    result = subprocess.run(
+        [ffmpeg, "-v", "error", "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(TARGET_RATE), "pipe:1"],
+        input=data, capture_output=True, timeout=30
+    )
+    if result.returncode != 0 or not result.stdout:
+        return None
+    samples = np.frombuffer(result.stdout, dtype="<i2").astype(np.float32) / 32768.0
+    return samples.reshape(-1, 1), TARGET_RATE
+
+
+def _decode_wav(data):
+    with wave.open(io.BytesIO(data)) as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        as_int = (packed[:, 0].astype(np.int32) | (packed[:, 1].astype(np.int32) << 8)
+                  | (packed[:, 2].astype(np.int32) << 16))
+        samples = (np.where(as_int >= 1 << 23, as_int - (1 << 24), as_int)).astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+    return samples.reshape(-1, channels), rate
+
+
+def to_mono(samples):
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def resample(samples, rate, target=TARGET_RATE):
+    """Linear-interpolation resample; good enough for speech recognition input"""
+    if rate == target or samples.size == 0:
+        return samples
+    if rate > target:
+        # Box filter over each output sample's span to limit aliasing before decimating
+        width = int(rate // target)
+        if width > 1:
+            kernel = np.ones(width, dtype=np.float32) / width
+            samples = np.convolve(samples, kernel, mode="same")
+    duration = samples.size / rate
+    positions = np.arange(int(duration * target), dtype=np.float64) * (rate / target)
+    return np.interp(positions, np.arange(samples.size), samples).astype(np.float32)
+
+
+def trim_silence(samples, rate, frame_ms=20, threshold_db=-40.0, floor_margin_db=12.0, pad_ms=200):
+    """Drop leading/trailing frames quieter than the speech threshold
+
+    A frame is voiced when its RMS level is above `threshold_db` (dBFS) and
+    `floor_margin_db` above the recording's noise floor (10th percentile).
+    `pad_ms` of audio is kept around the voiced region so words aren't clipped.
+    """
+    frame = int(rate * frame_ms / 1000)
+    count = samples.size // frame
+    if count == 0:
+        return samples
+    frames = samples[:count * frame].reshape(count, frame)
+    levels = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    threshold = max(threshold_db, np.percentile(levels, 10) + floor_margin_db)
+    voiced = np.flatnonzero(levels > threshold)
+    if voiced.size == 0:
+        return samples[:0]
+    pad = int(pad_ms / frame_ms)
+    start = max(voiced[0] - pad, 0) * frame
+    end = min((voiced[-1] + 1 + pad) * frame, samples.size)
+    return samples[start:end]
+
+
+def encode(samples, rate=TARGET_RATE):
+    """Opus in Ogg via ffmpeg when available, otherwise 16-bit PCM WAV"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    ffmpeg = _ffmpeg()
+    if ffmpeg is not None:
+        result = subprocess.run(
+            [ffmpeg, "-v", "error", "-f", "s16le", "-ac", "1", "-ar", str(rate), "-i", "pipe:0",
+             "-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg", "pipe:1"],
+            input=pcm, capture_output=True, timeout=30
+        )
+        if result.returncode == 0 and result.stdout:
+            return result.stdout, "ogg"
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue(), "wav"
+
+
+class AudioPreprocessor:
+    """Runs decode -> mono -> 16 kHz -> VAD trim -> encode and keeps totals"""
+
+    def __init__(self, enabled=True, **trim_options):
+        self.enabled = enabled and np is not None
+        self.trim_options = trim_options
+        self.processed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds_in = 0.0
+        self.seconds_out = 0.0
+        self._lock = threading.Lock()
+
+    def process(self, data):
+        """Return smaller audio bytes for `data`, or `data` itself if that isn't possible"""
+        if not self.enabled or not data:
+            return data
+        try:
+            decoded = decode(data)
+            if decoded is None:
+                return self._skip(data)
+            samples, rate = decoded
+            duration_in = samples.shape[0] / rate
+            speech = trim_silence(resample(to_mono(samples), rate), TARGET_RATE, **self.trim_options)
+            if speech.size == 0:
+                return self._skip(data)  # All silence: let STT report "no speech"
+            encoded, _ = encode(speech)
+        except Exception as e:
+            logger.warning(f"Audio preprocessing failed, sending original: {str(e)}")
+            return self._skip(data)
+
+        if len(encoded) >= len(data):
+            return self._skip(data)
+        with self._lock:
+            self.processed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(encoded)
+            self.seconds_in += duration_in
+            self.seconds_out += speech.size / TARGET_RATE
+        return encoded
+
+    def _skip(self, data):
+        with self._lock:
+            self.skipped += 1
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ffmpeg": _ffmpeg() is not None,
+                "processed": self.processed,
+                "skipped": self.skipped,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "seconds_in": round(self.seconds_in, 2),
+                "seconds_out": round(self.seconds_out, 2),
+            }
@@ -0,0 +1,137 @@
+"""Synthesised audio served by this server instead of Murf's CDN
+
+Clients normally fetch each clip from the URL Murf returns, which means a new
+connection (DNS, TCP, TLS) to another host before playback can start. The
+relay fetches the clip over the pooled Murf connection instead and streams it
+to the client as it arrives, on the connection the client already has open.
+Clips are addressed by their TTS cache key, so the same text and voice
+always map to the same local URL, and finished clips are kept in a bounded
+in-memory LRU (and, given a blob store, on disk) from which replays
+(including Range requests) are answered without another upstream fetch.
+"""
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 32 * 1024
+EXT = ".mp3"
+
+
+class AudioRelay:
+    """Streams clips from their upstream URL and caches the bytes by key
+
+    `source(key)` returns the upstream URL of a clip (None if unknown or
+    expired). Up to `max_bytes` of clips are cached, least recently used
+    first out; clips larger than `max_clip_bytes` are relayed but not kept.
+    With a `store` (BlobStore) every complete clip is also written to disk,
+    where it outlives both this cache and Murf's URL.
+    """
+
+    def __init__(self, http, source, max_bytes=64 * 1024 * 1024, max_clip_bytes=8 * 1024 * 1024,
+                 endpoint="generate", store=None):
+        self.http = http
+        self.source = source
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_clip_bytes = max_clip_bytes
+        self.endpoint = endpoint
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.relayed_bytes = 0
+        self.evictions = 0
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, key):
+        with self._lock:
+            audio = self._clips.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._clips.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def _store(self, key, audio):
+        with self._lock:
+            old = self._clips.pop(key, None)
+            if old is not None:
+                self.bytes_used -= len(old)
+            self._clips[key] = audio
+            self.bytes_used += len(audio)
+            while self.bytes_used > self.max_bytes and len(self._clips) > 1:
+                _, evicted = self._clips.popitem(last=False)
+                self.bytes_used -= len(evicted)
+                self.evictions += 1
+
+    def _open(self, url):
+        # Murf audio lives on a CDN: don't forward our API key there
+        response = self.http.get(url, endpoint=self.endpoint, headers={"api-key": None}, stream=True)
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    def stream(self, key, url):
+        """Open the upstream clip; returns a generator of its chunks as they arrive
+
+        The request is sent before this returns, so upstream errors raise
+        here rather than halfway through a response. The complete clip is
+        cached once the last chunk has been relayed.
+        """
+        response = self._open(url)
+
+        def chunks():
+            received = []
+            size = 0
+            try:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if size <= self.max_clip_bytes:
+                        received.append(chunk)
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                response.close()
+                with self._lock:
+                    self.relayed_bytes += size
+            if size <= self.max_clip_bytes:
+                audio = b"".join(received)
+                self._store(key, audio)
+                if self.store is not None:
+                    self.store.put(audio, EXT, key=key)
+
+        return chunks()
+
+    def stored(self, key):
+        """Path of the clip in the blob store, or None"""
+        return self.store.locate(key, EXT) if self.store is not None else None
+
+    def fetch(self, key, url=None):
+        """The whole clip, from memory, disk or upstream; None if the key is unknown"""
+        audio = self.cached(key)
+        if audio is not None:
+            return audio
+        audio = self.store.read(key, EXT) if self.store is not None else None
+        if audio is not None:
+            self._store(key, audio)
+            return audio
+        url = url or self.source(key)
+        if url is None:
+            return None
+        return b"".join(self.stream(key, url))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clips": len(self._clips),
+                "bytes": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "relayed_bytes": self.relayed_bytes,
+            }
@@ -0,0 +1,352 @@
+"""Load-test the voice agent end to end against local fake vendors (no network)
+
+    python benchmark.py                                  # Flask server, all routes
+    python benchmark.py --mode asgi --concurrency 64     # same load on asgi.py
+    python benchmark.py --murf 0.4,0.1,0.05 --json run.json
+    python benchmark.py --compare run.json               # exit 1 if p95/throughput regressed
+    python benchmark.py --workers 4 --sticky             # pre-forked workers (workers.py)
+
+The app runs in a child process (so its memory can be measured on its own)
+with AssemblyAI and Murf pointed at `fake_vendors.FakeVendorServer` and
+Gemini replaced by `fake_vendors.FakeGeminiModel`. Vendor profiles are
+"latency[,jitter[,failure_rate]]" in seconds.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from fake_vendors import FakeVendorServer, VendorProfile
+
+ROUTES = ("chat", "llm", "echo", "tts")
+
+
+# ---------- server (child process) ----------
+
+def serve(args):
+    """Run the app on `args.port` with Gemini faked in-process"""
+    if args.workers:
+        import tempfile
+        import workers
+        workers.prepare(tempfile.mkdtemp(prefix="voice-agent-bench-"), args.sticky)
+    import app as flask_app
+    from fake_vendors import FakeGeminiModel
+
+    flask_app.assemblyai_sdk.get().settings.polling_interval = float(os.environ["AAI_POLL_INTERVAL"])
+    flask_app.gemini_model.set(FakeGeminiModel(VendorProfile.parse(args.gemini)))
+
+    if args.workers:
+        workers.run("127.0.0.1", args.port, args.workers, use_asgi=args.mode == "asgi", sticky=args.sticky)
+    elif args.mode == "asgi":
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.app, host="127.0.0.1", port=args.port, log_level="warning")
+    else:
+        from werkzeug.serving import make_server
+        make_server("127.0.0.1", args.port, flask_app.app, threaded=True).serve_forever()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, vendors):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        AAI_API_KEY="bench", MURF_API_KEY="bench", GEMINI_API_KEY="bench",
+        AAI_BASE_URL=vendors.url,
+        MURF_BASE_URL=f"{vendors.url}/v1",
+        AAI_POLL_INTERVAL=str(args.poll_interval),
+        FALLBACK_WARMUP="0",
+        # All load comes from one client, so per-client limits would only measure the limiter
+        RATE_LIMIT_IP="0",
+        RATE_LIMIT_SESSION="0",
+        PYTHONWARNINGS="ignore",
+    )
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--mode", args.mode,
+               "--port", str(port), "--gemini", args.gemini, "--workers", str(args.workers)]
+    if args.sticky:
+        command.append("--sticky")
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if args.quiet else None)
+    base_url = f"http://127.0.0.1:{port}"
+    spawned = time.monotonic()
+    deadline = spawned + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup (code {process.returncode})")
+        try:
+            requests.get(f"{base_url}/get_voices", timeout=1)
+            return process, base_url, time.monotonic() - spawned
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not start within 60s")
+
+
+# ---------- memory ----------
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def rss_mb(pid):
+    """Resident set size of `pid` and its child processes in MB (Linux /proc; None elsewhere)
+
+    Pages that pre-forked workers still share with their parent are counted
+    once per process, so this overstates the memory of a multi-worker server.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total = int(line.split()[1]) / 1024
+                    break
+            else:
+                return None
+    except OSError:
+        return None
+    return total + sum(rss_mb(child) or 0 for child in _children(pid))
+
+
+class MemorySampler:
+    """Polls a process' RSS in the background and keeps the peak"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.start_mb = rss_mb(pid)
+        self.peak_mb = self.start_mb
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = rss_mb(self.pid)
+            if current is not None and (self.peak_mb is None or current > self.peak_mb):
+                self.peak_mb = current
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_mb = rss_mb(self.pid)
+
+
+# ---------- load ----------
+
+_local = threading.local()
+
+
+def _session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def send(base_url, route, index, audio, repeat_audio=False):
+    """Fire one request; returns (route, seconds, ok)"""
+    session = _session()
+    if not repeat_audio:
+        audio += index.to_bytes(4, "big")  # A distinct clip per request, so the STT cache misses
+    worker = threading.current_thread().name.rsplit("_", 1)[-1]
+    started = time.perf_counter()
+    try:
+        if route == "tts":
+            response = session.post(f"{base_url}/generate_audio", timeout=60, json={
+                "text": f"Benchmark sentence number {index} for the speech route.",
+                "voice": "en-US-Natalie",
+            })
+        else:
+            path = {
+                "chat": f"/agent/chat/bench-{worker}",
+                "llm": "/llm/query",
+                "echo": "/tts/echo",
+            }[route]
+            response = session.post(f"{base_url}{path}", timeout=60,
+                                    files={"audio": ("turn.webm", audio, "audio/webm")})
+        ok = response.status_code < 400
+    except requests.exceptions.RequestException:
+        ok = False
+    return route, time.perf_counter() - started, ok
+
+
+def run_load(base_url, routes, total, concurrency, audio, offset=0, repeat_audio=False):
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        futures = [
+            pool.submit(send, base_url, routes[i % len(routes)], offset + i, audio, repeat_audio)
+            for i in range(total)
+        ]
+        return [future.result() for future in futures]
+
+
+# ---------- report ----------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarise(results, elapsed):
+    report = {"routes": {}}
+    for route in sorted({route for route, _, _ in results}):
+        latencies = sorted(seconds for r, seconds, _ in results if r == route)
+        errors = sum(1 for r, _, ok in results if r == route and not ok)
+        report["routes"][route] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+        }
+    report["requests"] = len(results)
+    report["errors"] = sum(1 for _, _, ok in results if not ok)
+    report["elapsed_s"] = round(elapsed, 2)
+    report["rps"] = round(len(results) / elapsed, 2) if elapsed else 0.0
+    return report
+
+
+def print_report(report):
+    workers = f", {report['workers']} workers{' (sticky)' if report.get('sticky') else ''}" if report.get("workers") else ""
+    print(f"\n{report['mode']} mode{workers}, concurrency {report['concurrency']}: "
+          f"{report['requests']} requests in {report['elapsed_s']}s "
+          f"= {report['rps']} req/s, {report['errors']} errors")
+    print(f"{'route':<8}{'reqs':>6}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for route, stats in report["routes"].items():
+        print(f"{route:<8}{stats['requests']:>6}{stats['errors']:>8}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['mean_ms']:>10}")
+    memory = report["memory_mb"]
+    if memory["start"] is not None:
+        print(f"server RSS: start {memory['start']:.1f} MB, peak {memory['peak']:.1f} MB, "
+              f"end {memory['end']:.1f} MB, growth {memory['growth']:+.1f} MB")
+    print(f"vendor calls: {report['vendor_calls']}")
+    startup = report["startup"]
+    phases = ", ".join(f"{name} {ms:.0f}" for name, ms in startup["phases_ms"].items())
+    print(f"startup: first response after {startup['first_response_s']}s, "
+          f"app ready in {startup['ready_ms']:.0f} ms ({phases})")
+
+
+def compare(report, baseline, tolerance):
+    """List regressions of p95 latency, throughput or startup time beyond `tolerance` (a fraction)"""
+    regressions = []
+    for route, stats in report["routes"].items():
+        old = baseline.get("routes", {}).get(route)
+        if old and stats["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {old['p95_ms']} -> {stats['p95_ms']} ms")
+    if baseline.get("rps") and report["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(f"throughput: {baseline['rps']} -> {report['rps']} req/s")
+    old_ready = baseline.get("startup", {}).get("ready_ms")
+    if old_ready and report["startup"]["ready_ms"] > old_ready * (1 + tolerance):
+        regressions.append(f"startup: ready {old_ready} -> {report['startup']['ready_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default="wsgi")
+    parser.add_argument("--routes", default=",".join(ROUTES), help=f"comma-separated subset of {','.join(ROUTES)}")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests (spread across routes)")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--audio-kb", type=int, default=64, help="size of each fake audio upload")
+    parser.add_argument("--repeat-audio", action="store_true", help="send the same clip every time (exercises the STT cache)")
+    parser.add_argument("--aai", default="0.3,0.1", help="AssemblyAI profile: latency[,jitter[,failure_rate]]")
+    parser.add_argument("--gemini", default="0.6,0.2", help="Gemini profile")
+    parser.add_argument("--murf", default="0.2,0.05", help="Murf profile")
+    parser.add_argument("--workers", type=int, default=0, help="serve from this many pre-forked workers (0 = one process)")
+    parser.add_argument("--sticky", action="store_true", help="with --workers: route sessions to consistent workers")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="transcript polling interval")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed regression vs baseline")
+    parser.add_argument("--quiet", action="store_true", help="hide server logs")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args)
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    vendors = FakeVendorServer(aai=VendorProfile.parse(args.aai), murf=VendorProfile.parse(args.murf)).start()
+    process, base_url, first_response = start_server(args, vendors)
+    audio = b"\x1aE\xdf\xa3" + os.urandom(args.audio_kb * 1024)
+    try:
+        startup = requests.get(f"{base_url}/debug/startup", timeout=5).json()
+        run_load(base_url, routes, args.warmup, args.concurrency, audio, repeat_audio=args.repeat_audio)
+        with MemorySampler(process.pid) as memory:
+            started = time.perf_counter()
+            results = run_load(base_url, routes, args.requests, args.concurrency, audio,
+                               offset=args.warmup, repeat_audio=args.repeat_audio)
+            elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        vendors.stop()
+
+    report = summarise(results, elapsed)
+    report.update(
+        mode=args.mode,
+        workers=args.workers,
+        sticky=args.sticky,
+        concurrency=args.concurrency,
+        profiles={"aai": args.aai, "gemini": args.gemini, "murf": args.murf},
+        vendor_calls=dict(vendors.calls),
+        startup={
+            "first_response_s": round(first_response, 2),
+            "ready_ms": startup["ready_ms"],
+            "phases_ms": startup["phases_ms"],
+            "deferred_imports_ms": startup["deferred_imports_ms"],
+        },
+        memory_mb={
+            "start": memory.start_mb,
+            "peak": memory.peak_mb,
+            "end": memory.end_mb,
+            "growth": (memory.end_mb - memory.start_mb) if memory.start_mb is not None and memory.end_mb is not None else None,
+        },
+    )
+    print_report(report)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions vs baseline:\n  " + "\n  ".join(regressions))
+        else:
+            print("\nNo regressions vs baseline")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
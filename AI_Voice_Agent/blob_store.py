@@ -0,0 +1,258 @@
+"""Content-addressed audio blobs on local disk with size/age retention
+
+Each blob is stored as `<root>/<k[:2]>/<k[2:4]>/<key><ext>`: the key is a hex
+digest (of the bytes, or of whatever determines them, e.g. a TTS request),
+so the same audio is only ever stored once, and two levels of sharding keep
+every directory small. Blobs are written to a temp file and renamed into
+place, so readers (and other worker processes) never see a partial file.
+
+Retention runs in the background: blobs unused for `max_age` seconds are
+deleted, then the least recently used ones until the store is back under
+`max_bytes`. A blob's mtime records its last use (refreshed on reads at
+most once per `touch_interval`), so it works across worker processes.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl  # Unix only; without it concurrent workers may compact at the same time
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+HEX_DIGITS = frozenset("0123456789abcdef")
+STALE_TEMP_SECONDS = 3600  # Temp files this old were left behind by a crashed writer
+
+
+def valid_key(key):
+    return len(key) >= 8 and set(key) <= HEX_DIGITS
+
+
+class BlobStore:
+    """Sharded directory of immutable blobs, trimmed by size and age
+
+    `max_bytes` / `max_age` of 0 disable that limit; with both at 0 nothing
+    is ever deleted. `start()` compacts every `compact_interval` seconds on
+    a daemon thread.
+    """
+
+    def __init__(self, root, max_bytes=0, max_age=0, compact_interval=600, touch_interval=3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compact_interval = compact_interval
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.files = 0
+        self.bytes_used = 0
+        self.last_compaction_ms = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def path(self, key, ext=""):
+        return os.path.join(self.root, key[:2], key[2:4], key + ext)
+
+    def contains(self, key, ext=""):
+        return valid_key(key) and os.path.exists(self.path(key, ext))
+
+    def locate(self, key, ext=""):
+        """Path of a stored blob (marking it as used), or None"""
+        path = self.path(key, ext) if valid_key(key) else None
+        try:
+            mtime = os.stat(path).st_mtime if path else None
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        if time.time() - mtime > self.touch_interval:
+            try:
+                os.utime(path)
+            except FileNotFoundError:  # Compacted away just now
+                return None
+        return path
+
+    def read(self, key, ext=""):
+        path = self.locate(key, ext)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, data, ext="", key=None):
+        """Store bytes; returns the key (their BLAKE2b-160 digest unless given)"""
+        key = key or hashlib.blake2b(data, digest_size=20).hexdigest()
+        self._commit(key, ext, lambda f: f.write(data))
+        return key
+
+    def put_stream(self, stream, ext="", key=None):
+        """Store a file-like in chunks, hashing it on the way; returns the key
+
+        The stream is read from the start and rewound afterwards, and is never
+        held in memory as a whole.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+
+        def write(f):
+            stream.seek(0)
+            chunk = stream.read(CHUNK_SIZE)
+            while chunk:
+                digest.update(chunk)
+                f.write(chunk)
+                chunk = stream.read(CHUNK_SIZE)
+            stream.seek(0)
+
+        return self._commit(key, ext, write, digest)
+
+    def _commit(self, key, ext, write, digest=None):
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+                size = f.tell()
+            key = key or digest.hexdigest()
+            path = self.path(key, ext)
+            existed = os.path.exists(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)  # Same content under the same key: replacing is harmless
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            self.writes += 1
+            if not existed:
+                self.files += 1
+                self.bytes_used += size
+        return key
+
+    def _entries(self):
+        """(path, size, mtime) of every blob, removing stale temp files on the way"""
+        now = time.time()
+        entries = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".tmp"):
+                    if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                        self._remove(path)
+                    continue
+                if name.startswith("."):
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _scan(self):
+        entries = self._entries()
+        with self._lock:
+            self.files = len(entries)
+            self.bytes_used = sum(size for _, size, _ in entries)
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def compact(self):
+        """Delete expired blobs, then the least recently used until under `max_bytes`
+
+        Worker processes sharing `root` take turns: while one holds the
+        compaction lock the others skip this round. Without limits this only
+        counts what is stored.
+        """
+        if not (self.max_bytes or self.max_age):
+            self._scan()
+            return 0
+        with open(os.path.join(self.root, ".compact.lock"), "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0
+            return self._compact()
+
+    def _compact(self):
+        started = time.perf_counter()
+        entries = sorted(self._entries(), key=lambda entry: entry[2])  # Least recently used first
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age if self.max_age else None
+        removed = 0
+        kept = len(entries)
+        for path, size, mtime in entries:
+            expired = cutoff is not None and mtime < cutoff
+            if not expired and (not self.max_bytes or total <= self.max_bytes):
+                break  # Sorted by age: nothing after this one is expired either
+            if self._remove(path):
+                removed += 1
+            total -= size
+            kept -= 1
+        with self._lock:
+            self.files = kept
+            self.bytes_used = total
+            self.evictions += removed
+            self.last_compaction_ms = round((time.perf_counter() - started) * 1000, 2)
+        if removed:
+            logger.info(f"Blob store {self.root}: removed {removed} blobs, {total} bytes kept")
+        return removed
+
+    def _run(self):
+        limited = self.max_bytes or self.max_age
+        while True:
+            try:
+                self.compact()
+            except Exception as e:
+                logger.warning(f"Blob store compaction failed: {str(e)}")
+            if not limited or self._stop.wait(self.compact_interval):
+                return
+
+    def start(self):
+        """Compact on a daemon thread now and then every `compact_interval` seconds"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="blob-compaction", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "files": self.files,
+                "bytes": self.bytes_used,
+                "max_bytes": self.max_bytes,
+                "max_age": self.max_age,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "last_compaction_ms": self.last_compaction_ms,
+            }
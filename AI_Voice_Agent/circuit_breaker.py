@@ -0,0 +1,184 @@
+"""Per-vendor circuit breakers and latency-based timeouts
+
+A `CircuitBreaker` opens after `failure_threshold` consecutive failed calls
+and then rejects calls immediately with `CircuitOpenError` instead of letting
+each one wait out its timeout. After `reset_timeout` seconds it goes
+half-open and lets `half_open_max` probe calls through: a successful probe
+closes it again, a failed one re-opens it for another `reset_timeout`.
+
+An `AdaptiveTimeout` tracks how long successful calls take and suggests a
+read timeout of a few times their recent p99, so a slow vendor is given up
+on long before a hard-coded worst-case timeout expires.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a vendor whose circuit is open"""
+
+    def __init__(self, vendor, retry_after):
+        super().__init__(f"{vendor} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.vendor = vendor
+        self.retry_after = retry_after
+
+
+class AdaptiveTimeout:
+    """Read timeout derived from recent successful call latencies
+
+    Until `min_samples` calls have been seen the ceiling passed to `current()`
+    is used as is; after that the timeout is `multiplier` x the `percentile`
+    latency of the last `window` calls, kept between `floor` and the ceiling.
+    """
+
+    def __init__(self, floor=2.0, percentile=99, multiplier=2.0, min_samples=20, window=200):
+        self.floor = floor
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def latency(self):
+        """The tracked latency percentile, or None while there are too few samples"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)]
+
+    def current(self, ceiling):
+        latency = self.latency()
+        if latency is None:
+            return ceiling
+        return min(max(latency * self.multiplier, self.floor), ceiling)
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open probe -> closed
+
+    `is_failure(exc)` decides which exceptions count against the vendor; by
+    default all do, but callers can exclude e.g. 4xx responses caused by the
+    request itself. `timeout` (an AdaptiveTimeout) is fed the latency of every
+    successful guarded call.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, half_open_max=1,
+                 is_failure=None, timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.is_failure = is_failure or (lambda exc: True)
+        self.timeout = timeout or AdaptiveTimeout()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._probes = 0
+
+    def before_call(self):
+        """Reserve a call; raises CircuitOpenError when the vendor should not be called"""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and self._probes < self.half_open_max:
+                self._probes += 1
+                return
+            self.rejected += 1
+            retry_after = max(self.reset_timeout - (now - self.opened_at), 0.0)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def record_success(self, seconds=None):
+        if seconds is not None:
+            self.timeout.observe(seconds)
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self._trip()
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._trip()
+
+    def _release(self):
+        # A call that ended without a verdict (cancelled, or not the vendor's
+        # fault) gives its probe slot back
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    @contextmanager
+    def guard(self, record_latency=True):
+        """Wrap one vendor call: fail fast when open, record the outcome otherwise
+
+        Pass `record_latency=False` for calls whose duration says little about
+        the vendor's health (e.g. a whole streamed reply).
+        """
+        self.before_call()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self._release()  # Says nothing about the vendor's health either way
+            raise
+        except BaseException:
+            self._release()
+            raise
+        else:
+            self.record_success(time.perf_counter() - started if record_latency else None)
+
+    def read_timeout(self, ceiling):
+        """Read timeout (seconds) for the next call, at most `ceiling`"""
+        return self.timeout.current(ceiling)
+
+    def stats(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            stats = {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "successes": self.successes,
+                "failures": self.failures,
+            }
+        latency = self.timeout.latency()
+        stats[f"latency_p{self.timeout.percentile}_ms"] = round(latency * 1000, 1) if latency is not None else None
+        return stats
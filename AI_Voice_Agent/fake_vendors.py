@@ -0,0 +1,240 @@
+"""Local stand-ins for AssemblyAI, Murf and Gemini, for benchmarks without network
+
+`FakeVendorServer` answers the AssemblyAI v2 REST calls (upload, create
+transcript, poll) and the Murf calls (generate, voices, audio download) on one
+local port. `FakeGeminiModel` replaces `app.gemini_model` in-process and supports the
+calls the app makes (plain, streamed, chat and async). Each vendor takes a
+`VendorProfile` with a base latency, uniform jitter and a failure rate.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class VendorProfile:
+    """Simulated latency (seconds), +/- jitter and failure probability of one vendor"""
+
+    def __init__(self, latency=0.05, jitter=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+    @classmethod
+    def parse(cls, spec):
+        """Build from "latency[,jitter[,failure_rate]]", e.g. "0.2,0.05,0.01" """
+        values = [float(v) for v in spec.split(",") if v.strip()] if spec else []
+        return cls(*values)
+
+    def __str__(self):
+        return f"{self.latency},{self.jitter},{self.failure_rate}"
+
+    def delay(self):
+        return max(self.latency + random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def wait(self):
+        time.sleep(self.delay())
+
+    def fails(self):
+        return random.random() < self.failure_rate
+
+
+FAKE_MP3 = b"ID3\x03\x00\x00\x00\x00\x00\x00" + b"\xff\xfb\x90\x00" * 512
+FAKE_VOICES = [
+    {"voiceId": "en-US-Natalie", "displayName": "Natalie", "locale": "en-US", "gender": "Female"},
+    {"voiceId": "en-US-Ken", "displayName": "Ken", "locale": "en-US", "gender": "Male"},
+    {"voiceId": "en-GB-Lucy", "displayName": "Lucy", "locale": "en-GB", "gender": "Female"},
+]
+SAMPLE_SENTENCES = [
+    "Sure, here is what I found.",
+    "The weather should stay clear for most of the afternoon.",
+    "Let me know if you would like more detail on any of these points.",
+    "That is a great question, and the short answer is yes.",
+]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeVendors/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        vendors = self.server.vendors
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/v2/transcript/"):
+            return self._send(200, vendors.poll_transcript(path.rsplit("/", 1)[1]))
+        if path.endswith("/speech/voices"):
+            vendors.murf.wait()
+            return self._send(200, FAKE_VOICES)
+        if path.startswith("/audio/"):
+            return self._send(200, FAKE_MP3, "audio/mpeg")
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        vendors = self.server.vendors
+        path = self.path.split("?", 1)[0]
+        body = self._body()
+        if path == "/v2/upload":
+            vendors.aai.wait()
+            return self._send(200, {"upload_url": vendors.store_upload(body)})
+        if path == "/v2/transcript":
+            return self._send(200, vendors.create_transcript(json.loads(body or b"{}")))
+        if path.startswith("/v1/speech/generate"):
+            vendors.murf.wait()
+            vendors.count("murf")
+            if vendors.murf.fails():
+                return self._send(503, {"error": "Service temporarily unavailable"})
+            text = json.loads(body or b"{}").get("text", "")
+            name = hashlib.blake2b(text.encode("utf-8"), digest_size=10).hexdigest()
+            return self._send(200, {
+                "audioFile": f"{vendors.url}/audio/{name}.mp3",
+                "audioLengthInSeconds": round(len(text) / 15, 2),
+            })
+        self._send(404, {"error": "not found"})
+
+
+class FakeVendorServer:
+    """Threaded HTTP server that impersonates the AssemblyAI and Murf REST APIs"""
+
+    def __init__(self, aai=None, murf=None, host="127.0.0.1", port=0):
+        self.aai = aai or VendorProfile(latency=0.3, jitter=0.1)
+        self.murf = murf or VendorProfile(latency=0.2, jitter=0.05)
+        self.calls = {"aai": 0, "murf": 0}
+        self._uploads = {}
+        self._transcripts = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.vendors = self
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        self._thread = None
+
+    def count(self, vendor):
+        with self._lock:
+            self.calls[vendor] += 1
+
+    def store_upload(self, data):
+        with self._lock:
+            upload_id = next(self._ids)
+            self._uploads[upload_id] = len(data)
+        return f"{self.url}/uploads/{upload_id}"
+
+    def create_transcript(self, request):
+        self.count("aai")
+        with self._lock:
+            transcript_id = f"t{next(self._ids)}"
+            # Transcription "finishes" after the profile's latency; polls before that see "processing"
+            self._transcripts[transcript_id] = {
+                "ready_at": time.monotonic() + self.aai.delay(),
+                "failed": self.aai.fails(),
+                "audio_url": request.get("audio_url", ""),
+            }
+        return {"id": transcript_id, "status": "queued", "audio_url": request.get("audio_url", "")}
+
+    def poll_transcript(self, transcript_id):
+        with self._lock:
+            job = self._transcripts.get(transcript_id)
+        if job is None:
+            return {"id": transcript_id, "status": "error", "audio_url": "", "error": "Transcript not found"}
+        response = {"id": transcript_id, "audio_url": job["audio_url"]}
+        if time.monotonic() < job["ready_at"]:
+            return {**response, "status": "processing"}
+        with self._lock:
+            self._transcripts.pop(transcript_id, None)
+        if job["failed"]:
+            return {**response, "status": "error", "error": "Simulated transcription failure"}
+        return {**response, "status": "completed", "text": f"Question number {transcript_id[1:]}: what's the weather like today?"}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-vendors", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeStream:
+    """Iterable of response chunks, like `generate_content(..., stream=True)`"""
+
+    def __init__(self, text, profile, chunks=4):
+        self.text = text
+        self._profile = profile
+        self._chunks = chunks
+
+    def __iter__(self):
+        words = self.text.split(" ")
+        size = max(len(words) // self._chunks, 1)
+        for start in range(0, len(words), size):
+            time.sleep(self._profile.delay() / self._chunks)
+            yield _FakeResponse(" ".join(words[start:start + size]) + " ")
+
+
+class FakeGeminiModel:
+    """Drop-in for `genai.GenerativeModel` with simulated latency and failures"""
+
+    def __init__(self, profile=None, sentences=4):
+        self.profile = profile or VendorProfile(latency=0.6, jitter=0.2)
+        self.sentences = sentences
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _reply(self, prompt):
+        with self._lock:
+            self.calls += 1
+        if self.profile.fails():
+            raise RuntimeError("Simulated Gemini failure (503)")
+        picked = random.sample(SAMPLE_SENTENCES * 2, self.sentences)
+        return f"About '{str(prompt)[:40]}': " + " ".join(picked)
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        text = self._reply(prompt)
+        if stream:
+            return _FakeStream(text, self.profile)
+        self.profile.wait()
+        return _FakeResponse(text)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        text = self._reply(prompt)
+        await asyncio.sleep(self.profile.delay())
+        return _FakeResponse(text)
+
+    def start_chat(self, history=None):
+        return _FakeChat(self, history or [])
+
+
+class _FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history)
+
+    def send_message(self, text, stream=False, **kwargs):
+        return self.model.generate_content(text, stream=stream)
+
+    async def send_message_async(self, text, **kwargs):
+        return await self.model.generate_content_async(text)
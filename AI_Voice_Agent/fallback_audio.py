@@ -0,0 +1,115 @@
+"""Pre-rendered fallback clips so error paths never wait on Murf"""
+import logging
+import os
+import threading
+
+from cache import make_key
+
+try:
+    import fcntl  # Unix only; without it every worker process warms the clips itself
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class FallbackAudio:
+    """Local store of synthesised apology/error messages
+
+    Clips are rendered once (at startup, or on first use) with `render(message,
+    voice_id) -> bytes`, written to the blob `store` and served from
+    `url_prefix`. `get()` never blocks: if a clip is not ready yet it schedules
+    a single background render for it and returns None.
+    """
+
+    EXT = ".mp3"
+
+    def __init__(self, store, url_prefix, render):
+        self.store = store
+        self.url_prefix = url_prefix.rstrip("/")
+        self.render = render
+        self._ready = {}
+        self._inflight = set()
+        self._lock = threading.Lock()
+
+    def _name(self, message, voice_id):
+        return make_key("fallback", message, voice_id)
+
+    def _url(self, name):
+        return f"{self.url_prefix}/{name}{self.EXT}"
+
+    def _lookup(self, message, voice_id):
+        name = self._name(message, voice_id)
+        url = self._ready.get(name)
+        if url is None and self.store.contains(name, self.EXT):  # Rendered by an earlier run
+            url = self._ready[name] = self._url(name)
+        return name, url
+
+    def get(self, message, voice_id="en-US-Natalie"):
+        """Local URL of the clip for `message`, or None while it is being rendered"""
+        name, url = self._lookup(message, voice_id)
+        if url is None:
+            self._render_async(message, voice_id)
+        return url
+
+    def _render_async(self, message, voice_id):
+        name = self._name(message, voice_id)
+        with self._lock:
+            # Single-flight: one render per clip no matter how many requests fail at once
+            if name in self._inflight:
+                return
+            self._inflight.add(name)
+        threading.Thread(
+            target=self._render_one, args=(message, voice_id), daemon=True
+        ).start()
+
+    def _render_one(self, message, voice_id):
+        name = self._name(message, voice_id)
+        try:
+            self.store.put(self.render(message, voice_id), self.EXT, key=name)
+            self._ready[name] = self._url(name)
+        except Exception as e:
+            logger.warning(f"Could not pre-render fallback audio '{message}': {str(e)}")
+        finally:
+            with self._lock:
+                self._inflight.discard(name)
+
+    def warm(self, messages, voice_id="en-US-Natalie"):
+        """Render every message that is not on disk yet (blocking)
+
+        Worker processes sharing the store take turns: while one holds the
+        warm-up lock the others skip, and pick the clips up from disk instead.
+        """
+        with open(os.path.join(self.store.root, ".warm.lock"), "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    logger.info("Fallback audio is being warmed by another worker")
+                    return
+            self._warm(messages, voice_id)
+
+    def _warm(self, messages, voice_id):
+        rendered = 0
+        for message in messages:
+            name, url = self._lookup(message, voice_id)
+            if url is not None:
+                continue
+            with self._lock:
+                if name in self._inflight:
+                    continue
+                self._inflight.add(name)
+            self._render_one(message, voice_id)
+            rendered += 1
+        logger.info(f"Fallback audio ready: {len(self._ready)} clips ({rendered} newly rendered)")
+
+    def warm_in_background(self, messages, voice_id="en-US-Natalie"):
+        thread = threading.Thread(
+            target=self.warm, args=(list(messages), voice_id),
+            name="fallback-warmup", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {"ready": len(self._ready), "rendering": len(self._inflight)}
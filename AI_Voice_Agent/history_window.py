@@ -0,0 +1,183 @@
+"""Token-budgeted chat history with an incrementally updated summary
+
+Each session record holds the recent messages verbatim plus a running
+"summary" of everything older. The prompt sent to Gemini is the summary and
+as many of the latest messages as fit in `token_budget`, so its size stays
+flat however long the conversation runs. Folding old turns into the summary
+happens in the background after a turn, never on the request path.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of our conversation so far:"
+SUMMARY_ACK = "Understood, I'll keep that in mind."
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) that needs no API call"""
+    return len(text) // 4 + 1
+
+
+def _start_on_user(messages):
+    # Gemini expects a chat history to open with a user turn
+    start = 0
+    while start < len(messages) and messages[start].get("role") != "user":
+        start += 1
+    return messages[start:]
+
+
+class HistoryWindow:
+    """Builds bounded Gemini chat histories on top of a SessionStore
+
+    `summarize(summary, messages) -> str` folds `messages` into the previous
+    `summary` (empty string for the first fold) and returns the new summary.
+    Once the verbatim messages exceed `compact_at` tokens the oldest turns are
+    folded until they fit in `keep_tokens` again.
+    """
+
+    def __init__(self, store, summarize, token_budget=2000, keep_tokens=None,
+                 compact_at=None, cache_size=1000, max_workers=2):
+        self.store = store
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.keep_tokens = keep_tokens or token_budget // 2
+        self.compact_at = compact_at or token_budget
+        self.cache_size = cache_size
+        self.compactions = 0
+        self.compaction_failures = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._built = OrderedDict()  # session_id -> (rev, contents)
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-compact")
+
+    # ---------- prompt ----------
+
+    def _window(self, record):
+        """Latest messages that fit in the budget left after the summary"""
+        summary = record.get("summary", "")
+        budget = self.token_budget - (estimate_tokens(summary) if summary else 0)
+        messages = record.get("messages", [])
+        start = len(messages)
+        used = 0
+        while start > 0:
+            cost = estimate_tokens(messages[start - 1]["content"])
+            if used + cost > budget and start < len(messages):
+                break
+            used += cost
+            start -= 1
+        return _start_on_user(messages[start:])
+
+    def _build(self, record):
+        contents = []
+        summary = record.get("summary")
+        if summary:
+            contents.append({"role": "user", "parts": [f"{SUMMARY_PREFIX} {summary}"]})
+            contents.append({"role": "model", "parts": [SUMMARY_ACK]})
+        contents.extend(
+            {"role": msg["role"], "parts": [msg["content"]]}
+            for msg in self._window(record)
+        )
+        return contents
+
+    def contents(self, session_id):
+        """Gemini `history=` for the session's next turn
+
+        The built list is cached per session and reused until the record's
+        `rev` changes, so repeated turns only pay for a store lookup.
+        """
+        record = self.store.load(session_id)
+        if record is None:
+            return []
+        rev = record.get("rev", 0)
+        with self._lock:
+            cached = self._built.get(session_id)
+            if cached is not None and cached[0] == rev:
+                self._built.move_to_end(session_id)
+                self.cache_hits += 1
+                return list(cached[1])
+            self.cache_misses += 1
+
+        contents = self._build(record)
+        with self._lock:
+            self._built[session_id] = (rev, contents)
+            self._built.move_to_end(session_id)
+            while len(self._built) > self.cache_size:
+                self._built.popitem(last=False)
+        return list(contents)
+
+    # ---------- turns ----------
+
+    def add_turn(self, session_id, user_text, response_text):
+        """Store a completed turn and fold older turns into the summary if needed"""
+        self.store.append(
+            session_id,
+            {"role": "user", "content": user_text},
+            {"role": "model", "content": response_text}
+        )
+        self._compact_async(session_id)
+
+    def _overflow(self, messages):
+        """Number of leading messages to fold so the rest fit in `keep_tokens`"""
+        total = sum(estimate_tokens(msg["content"]) for msg in messages)
+        if total <= self.compact_at:
+            return 0
+        count = 0
+        while count < len(messages) and total > self.keep_tokens:
+            total -= estimate_tokens(messages[count]["content"])
+            count += 1
+        # Fold whole turns so the kept messages still open with a user turn
+        while count < len(messages) and messages[count].get("role") != "user":
+            count += 1
+        return count
+
+    def _compact_async(self, session_id):
+        with self._lock:
+            if session_id in self._inflight:
+                return
+            self._inflight.add(session_id)
+        self._executor.submit(self._compact, session_id)
+
+    def _compact(self, session_id):
+        try:
+            record = self.store.load(session_id)
+            if record is None:
+                return
+            messages = record["messages"]
+            count = self._overflow(messages)
+            if not count:
+                return
+            folded = messages[:count]
+            summary = self.summarize(record.get("summary", ""), folded)
+
+            def apply(current):
+                # Skip if another worker compacted (or the store trimmed) meanwhile
+                if current["messages"][:count] != folded:
+                    return False
+                current["messages"] = current["messages"][count:]
+                current["summary"] = summary
+
+            if self.store.update(session_id, apply):
+                self.compactions += 1
+        except Exception as e:
+            self.compaction_failures += 1
+            logger.warning(f"History compaction failed for {session_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._inflight.discard(session_id)
+
+    def stats(self):
+        return {
+            "token_budget": self.token_budget,
+            "keep_tokens": self.keep_tokens,
+            "compactions": self.compactions,
+            "compaction_failures": self.compaction_failures,
+            "cached_histories": len(self._built),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
@@ -0,0 +1,205 @@
+"""Shared, pooled HTTP client for upstream vendor APIs (Murf etc.)"""
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+class PoolStats:
+    """Thread-safe counters describing how the connection pool is used"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+
+    def record_open(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def record_request(self, ok=True):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.checkouts - self.connections_opened, 0)
+            return {
+                "connections_opened": self.connections_opened,
+                "connections_reused": reused,
+                "checkouts": self.checkouts,
+                "reuse_ratio": round(reused / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_time_total_ms": round(self.wait_time_total * 1000, 2),
+                "wait_time_avg_ms": round(self.wait_time_total * 1000 / self.checkouts, 2) if self.checkouts else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 2),
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+            }
+
+
+class CountingRetry(Retry):
+    """Retry policy that reports every retry it allows to a PoolStats"""
+
+    def __init__(self, *args, stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+
+    def new(self, **kwargs):
+        # urllib3 builds a fresh Retry per attempt; carry the stats along
+        retry = super().new(**kwargs)
+        retry.stats = self.stats
+        return retry
+
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)  # Raises once retries are exhausted
+        if self.stats is not None:
+            self.stats.record_retry()
+        return retry
+
+
+def _instrumented_pool(base, stats, pool_timeout):
+    """Build a connection pool class that reports opens/checkouts to `stats`
+
+    requests never passes a pool timeout, so a blocking pool would otherwise
+    wait forever for a free connection; `pool_timeout` bounds that wait.
+    """
+
+    class InstrumentedPool(base):
+        def _new_conn(self):
+            stats.record_open()
+            return super()._new_conn()
+
+        def _get_conn(self, timeout=None):
+            started = time.perf_counter()
+            conn = super()._get_conn(timeout=pool_timeout if timeout is None else timeout)
+            stats.record_checkout(time.perf_counter() - started)
+            return conn
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools feed a shared PoolStats object"""
+
+    def __init__(self, stats, pool_timeout=None, **kwargs):
+        self.stats = stats
+        self.pool_timeout = pool_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _instrumented_pool(HTTPConnectionPool, self.stats, self.pool_timeout),
+            "https": _instrumented_pool(HTTPSConnectionPool, self.stats, self.pool_timeout),
+        }
+
+
+class PooledHTTPClient:
+    """One keep-alive session with a bounded pool, retries and per-endpoint timeouts
+
+    `timeouts` maps an endpoint name to a `(connect, read)` tuple; callers pass
+    `endpoint="generate"` instead of hard-coding a timeout at every call site.
+    """
+
+    DEFAULT_TIMEOUT = (3.05, 15)
+
+    def __init__(self, headers=None, pool_size=10, pool_block=True,
+                 pool_timeout=5, retries=2, backoff_factor=0.3,
+                 retry_statuses=(429, 502, 503, 504), timeouts=None):
+        self.stats = PoolStats()
+        self.timeouts = dict(timeouts or {})
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._pool_block = pool_block
+        self._headers = dict(headers or {})
+        self._retry_config = dict(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_statuses,
+            # POSTs (Murf generate) are not idempotent: they are only retried when
+            # the connection failed before the request was sent, never on a read
+            # error or status. A 429's Retry-After could exceed the caller's
+            # deadline, so retries stick to the short backoff instead.
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        self.session = self._new_session()
+        if hasattr(os, "register_at_fork"):
+            # A forked worker must open its own sockets, not share the parent's
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _new_session(self):
+        adapter = InstrumentedAdapter(
+            self.stats,
+            pool_timeout=self.pool_timeout,
+            pool_connections=4,
+            pool_maxsize=self.pool_size,
+            pool_block=self._pool_block,
+            max_retries=CountingRetry(stats=self.stats, **self._retry_config),
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(self._headers)
+        return session
+
+    def _after_fork(self):
+        self.stats = PoolStats()
+        self.session = self._new_session()
+
+    def timeout_for(self, endpoint):
+        return self.timeouts.get(endpoint, self.DEFAULT_TIMEOUT)
+
+    def request(self, method, url, endpoint=None, timeout=None, **kwargs):
+        """Send a request through the shared pool"""
+        if timeout is None:
+            timeout = self.timeout_for(endpoint)
+        try:
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException:
+            self.stats.record_request(ok=False)
+            raise
+        self.stats.record_request(ok=response.status_code < 500)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def pool_stats(self):
+        stats = self.stats.snapshot()
+        stats["pool_size"] = self.pool_size
+        stats["timeouts"] = {name: list(value) for name, value in self.timeouts.items()}
+        return stats
+
+    def close(self):
+        self.session.close()
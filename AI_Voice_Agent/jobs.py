@@ -0,0 +1,344 @@
+"""Background jobs for long pipeline requests: submit now, poll or subscribe for the result
+
+A `JobQueue` is a bounded queue in front of a fixed pool of worker threads.
+`submit()` returns a `Job` straight away, or raises `QueueFull` when
+`max_queued` jobs are already waiting, so callers can answer 429 instead of
+letting waiting times grow without limit. Jobs report progress events while
+they run; finished jobs are kept for `ttl` seconds so clients can fetch the
+result (or replay the events) after a dropped connection.
+
+Jobs run in the worker process that accepted them. With a `SQLiteJobStore`
+every state change is also written to a file shared by the processes on one
+host, so any of them can answer GET /jobs/<id> for it.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFull(Exception):
+    """Raised by `JobQueue.submit` when no more jobs can be queued"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobError(Exception):
+    """Fail a job with `payload` (a JSON-able dict) as its error"""
+
+    def __init__(self, payload):
+        super().__init__(payload.get("message") or payload.get("error"))
+        self.payload = payload
+
+
+class Job:
+    """One queued call and the events it has emitted so far"""
+
+    def __init__(self, kind, fn, args, on_change=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = [("status", {"status": QUEUED})]
+        self._fn = fn
+        self._args = args
+        self._changed = threading.Condition()
+        self._on_change = on_change
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def _emit(self, event, data):
+        with self._changed:
+            self.events.append((event, data))
+            self._changed.notify_all()
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def progress(self, stage, **data):
+        """Report that the job reached `stage` (extra fields are passed to clients)"""
+        self._emit("progress", {"stage": stage, **data})
+
+    def _start(self):
+        self.status = RUNNING
+        self.started_at = time.time()
+        self._emit("status", {"status": RUNNING})
+
+    def _finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.status = FAILED if error is not None else DONE
+        self._emit(self.status, error if error is not None else result)
+
+    def wait_events(self, since, timeout=15.0):
+        """Events after index `since`, waiting up to `timeout`s for one (empty list on timeout)"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > since or self.finished, timeout)
+            return self.events[since:]
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": [data for event, data in self.events if event == "progress"],
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class StoredJob:
+    """Read-only view of a job that another worker process runs, polled from the store"""
+
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, store, data):
+        self._store = store
+        self._update(data)
+
+    def _update(self, data):
+        self.id = data["job_id"]
+        self.kind = data["kind"]
+        self.status = data["status"]
+        self.events = [tuple(event) for event in data["events"]]
+        self._data = data
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def wait_events(self, since, timeout=15.0):
+        deadline = time.monotonic() + timeout
+        while len(self.events) <= since and not self.finished and time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            data = self._store.load_data(self.id)
+            if data is None:
+                break
+            self._update(data)
+        return self.events[since:]
+
+    def to_dict(self):
+        return {key: value for key, value in self._data.items() if key != "events"}
+
+
+class SQLiteJobStore:
+    """Job state in a SQLite file shared by the worker processes on one host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._forget_connections)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, finished_at REAL)"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, job):
+        data = {**job.to_dict(), "events": job.events}
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs (id, data, finished_at) VALUES (?, ?, ?)",
+            (job.id, json.dumps(data), job.finished_at)
+        )
+
+    def load_data(self, job_id):
+        row = self._conn().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load(self, job_id):
+        data = self.load_data(job_id)
+        return StoredJob(self, data) if data is not None else None
+
+    def prune(self, cutoff):
+        self._conn().execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,))
+
+
+class JobQueue:
+    """`workers` threads draining a queue of at most `max_queued` waiting jobs
+
+    `fn(job, *args)` runs on a worker; its return value becomes the result.
+    Raising JobError fails the job with that payload, any other exception
+    with its type and message. Workers start on the first submit. With a
+    `store`, jobs run by other worker processes can be looked up too.
+    """
+
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, workers=4, max_queued=32, ttl=600, store=None):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.store = store
+        self._store_pruned = 0.0
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._threads = []
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time_total = 0.0
+        self.run_time_total = 0.0
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def retry_after(self):
+        """Rough seconds until a queue slot frees up, for Retry-After headers"""
+        with self._lock:
+            finished = self.completed + self.failed
+            average = self.run_time_total / finished if finished else 5.0
+        return max(int(average * (self._queue.qsize() + 1) / self.workers), 1)
+
+    def submit(self, kind, fn, *args):
+        self._prune()
+        if not self._threads:
+            self._start_workers()
+        job = Job(kind, fn, args, on_change=self._save)
+        with self._lock:
+            self._jobs[job.id] = job  # Visible before a worker can pick it up
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+                self.rejected += 1
+            raise QueueFull(self.retry_after())
+        with self._lock:
+            self.submitted += 1
+        self._save(job)
+        return job
+
+    def get(self, job_id):
+        """The job, whether it runs here or (with a store) in another worker process"""
+        self._prune()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+            if job is not None and job.finished and job.to_dict()["finished_at"] < time.time() - self.ttl:
+                return None
+        return job
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        # One save at a time, each taking a fresh snapshot: otherwise submit()'s
+        # "queued" snapshot can land after (and overwrite) the worker's "done"
+        with self._save_lock:
+            try:
+                self.store.save(job)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not store job {job.id}: {str(e)}")
+
+    def _prune(self):
+        now = time.time()
+        cutoff = now - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+            prune_store = self.store is not None and now - self._store_pruned > self.PRUNE_INTERVAL
+            if prune_store:
+                self._store_pruned = now
+        if prune_store:
+            self.store.prune(cutoff)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self.running += 1
+                self.wait_time_total += time.time() - job.created_at
+            try:
+                job._start()
+                result = job._fn(job, *job._args)
+                json.dumps(result)  # An unserialisable result fails the job here, not in the store or event stream
+                job._finish(result=result)
+            except JobError as e:
+                self._fail(job, e.payload)
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+                self._fail(job, {"error": type(e).__name__, "message": str(e)})
+            finally:
+                job._fn = job._args = None  # Drop references to uploads etc.
+                with self._lock:
+                    self.running -= 1
+                    if job.started_at is not None:
+                        self.run_time_total += (job.finished_at or time.time()) - job.started_at
+                    if job.status == DONE:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                self._queue.task_done()
+
+    @staticmethod
+    def _fail(job, error):
+        # A worker thread must outlive any job, even one whose failure can't be recorded
+        try:
+            job._finish(error=error)
+        except Exception:
+            logger.exception(f"Could not record the failure of job {job.id} ({job.kind})")
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self.failed + self.running
+            finished = self.completed + self.failed
+            return {
+                "workers": self.workers,
+                "max_queued": self.max_queued,
+                "queued": self._queue.qsize(),
+                "running": self.running,
+                "stored": len(self._jobs),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "wait_time_avg_ms": round(self.wait_time_total * 1000 / started, 2) if started else 0.0,
+                "run_time_avg_ms": round(self.run_time_total * 1000 / finished, 2) if finished else 0.0,
+            }
@@ -0,0 +1,214 @@
+"""One STT -> LLM -> TTS engine for every route
+
+A `Pipeline` runs named `Stage`s in order over a `Turn`, the state of one
+request (audio in, transcription, reply text, audio URLs out). Routes build a
+Turn, run the stages they need and turn the result, or the `StageFailed`
+error, into their own response shape.
+
+Cross-cutting concerns are `Middleware` hooks around every stage instead of
+code inside each route: `before` can satisfy a stage without running it
+(e.g. a cache hit, reported to `skipped`), `after` sees each successful stage and its duration
+(metrics, cache fill), and `failed` sees each error and may ask for the stage
+to be retried. The same stages and middleware run synchronously (`run`) for
+Flask or on an event loop (`run_async`) for asgi.py, where stage functions
+may be coroutines.
+"""
+import asyncio
+import inspect
+import time
+
+
+class StageFailed(Exception):
+    """A stage raised; `stage` is its name and `cause` the original exception"""
+
+    def __init__(self, stage, cause):
+        super().__init__(f"{stage} stage failed: {cause}")
+        self.stage = stage
+        self.cause = cause
+
+
+class TranscriptionError(Exception):
+    """The STT vendor returned a transcript with an error instead of text"""
+
+
+class NoSpeechError(Exception):
+    """The audio was transcribed but contained no speech"""
+
+
+class Turn:
+    """State of one pass through a pipeline
+
+    Inputs: `audio` (bytes or a readable stream) or `transcription` (text
+    turns), optional `history` (Gemini chat history; None = single-shot
+    prompt), `session_id`, `voice_id`, `route` (metrics label) and `chunked`
+    (split long replies into several clips instead of truncating);
+    `tts_options` are extra keyword arguments for the TTS call.
+    `on_progress(stage, **data)` receives progress events, e.g. for jobs.
+    """
+
+    def __init__(self, audio=None, transcription=None, history=None, session_id=None,
+                 voice_id="en-US-Natalie", route="background", chunked=False,
+                 tts_options=None, on_progress=None):
+        self.audio = audio
+        self.audio_hash = None
+        self.transcription = transcription
+        self.history = history
+        self.session_id = session_id
+        self.voice_id = voice_id
+        self.route = route
+        self.chunked = chunked
+        self.tts_options = tts_options or {}
+        self.response_text = None
+        self.chunks = []
+        self.audio_urls = []
+        self.timings = {}
+        self._on_progress = on_progress
+
+    @property
+    def speech_text(self):
+        """What the TTS stage speaks: the reply if there is one, else the transcription (echo)"""
+        return self.response_text if self.response_text is not None else self.transcription
+
+    @property
+    def audio_url(self):
+        return self.audio_urls[0] if self.audio_urls else None
+
+    def progress(self, stage, **data):
+        if self._on_progress is not None:
+            self._on_progress(stage, **data)
+
+
+class Stage:
+    """A named step; `fn(turn)` fills in the turn and may be a coroutine function
+
+    `produces` names the Turn attributes the stage sets (reported in progress
+    events); `metric` is its label in the stage latency histogram (None = not
+    timed by the pipeline, e.g. because the step times itself).
+    """
+
+    def __init__(self, name, fn, produces=(), metric=None):
+        self.name = name
+        self.fn = fn
+        self.produces = produces
+        self.metric = metric
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+class Middleware:
+    """Hooks around each stage; override the ones you need"""
+
+    def before(self, stage, turn):
+        """Return True if the stage's work is already done (the stage is skipped)"""
+        return False
+
+    def after(self, stage, turn, seconds):
+        pass
+
+    def skipped(self, stage, turn):
+        """Called when some middleware's `before` satisfied the stage"""
+
+    def failed(self, stage, turn, exc, seconds, attempt):
+        """Return a delay in seconds to retry the stage after, or None to fail"""
+        return None
+
+
+class ProgressEvents(Middleware):
+    """Report each stage starting and finishing (with what it produced) to `turn.progress`"""
+
+    def before(self, stage, turn):
+        turn.progress(stage.name, status="started")
+        return False
+
+    def after(self, stage, turn, seconds):
+        turn.progress(stage.name, status="done", **{field: getattr(turn, field) for field in stage.produces})
+
+    def skipped(self, stage, turn):
+        turn.progress(stage.name, status="done", cached=True,
+                      **{field: getattr(turn, field) for field in stage.produces})
+
+
+class RetryStages(Middleware):
+    """Retry the named stages up to `retries` times with exponential backoff
+
+    `retry_on(exc)` decides which errors are worth another attempt.
+    """
+
+    def __init__(self, retries, stages, retry_on=None, backoff=0.5):
+        self.retries = retries
+        self.stages = set(stages)
+        self.retry_on = retry_on or (lambda exc: True)
+        self.backoff = backoff
+
+    def failed(self, stage, turn, exc, seconds, attempt):
+        if stage.name in self.stages and attempt <= self.retries and self.retry_on(exc):
+            return self.backoff * (2 ** (attempt - 1))
+        return None
+
+
+class Pipeline:
+    """Stages run in order over a Turn, with middleware hooks around each"""
+
+    def __init__(self, stages, middleware=()):
+        self.stages = list(stages)
+        self.middleware = middleware  # Shared list: middleware added later applies too
+
+    def _skip(self, stage, turn):
+        if not any(hook.before(stage, turn) for hook in self.middleware):
+            return False
+        for hook in self.middleware:
+            hook.skipped(stage, turn)
+        return True
+
+    def _succeeded(self, stage, turn, seconds):
+        turn.timings[stage.name] = seconds
+        for hook in self.middleware:
+            hook.after(stage, turn, seconds)
+
+    def _retry_delay(self, stage, turn, exc, seconds, attempt):
+        delays = [hook.failed(stage, turn, exc, seconds, attempt) for hook in self.middleware]
+        delays = [delay for delay in delays if delay is not None]
+        return max(delays) if delays else None
+
+    def run(self, turn):
+        for stage in self.stages:
+            if self._skip(stage, turn):
+                continue
+            attempt = 1
+            while True:
+                started = time.perf_counter()
+                try:
+                    stage.fn(turn)
+                except Exception as e:
+                    delay = self._retry_delay(stage, turn, e, time.perf_counter() - started, attempt)
+                    if delay is None:
+                        raise StageFailed(stage.name, e) from e
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self._succeeded(stage, turn, time.perf_counter() - started)
+                break
+        return turn
+
+    async def run_async(self, turn):
+        for stage in self.stages:
+            if self._skip(stage, turn):
+                continue
+            attempt = 1
+            while True:
+                started = time.perf_counter()
+                try:
+                    result = stage.fn(turn)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    delay = self._retry_delay(stage, turn, e, time.perf_counter() - started, attempt)
+                    if delay is None:
+                        raise StageFailed(stage.name, e) from e
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self._succeeded(stage, turn, time.perf_counter() - started)
+                break
+        return turn
@@ -0,0 +1,300 @@
+"""Token-bucket rate limits (memory, SQLite, Redis)
+
+Each named `Limit` is a bucket of `capacity` tokens refilled at `rate` tokens
+per second; a call takes `cost` tokens (1 per request, or e.g. the number of
+characters sent to Murf) from the bucket for its key (an IP, a session ID,
+"global"). Buckets are refilled lazily when they are touched, so checking a
+limit is one dictionary lookup and a little arithmetic. The SQLite and Redis
+backends keep the buckets where several worker processes can share them.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600}
+
+
+class RateLimited(Exception):
+    """Raised when a call would exceed a limit; `retry_after` is in seconds"""
+
+    def __init__(self, limit, retry_after):
+        super().__init__(f"Rate limit '{limit}' exceeded, retry in {retry_after:.1f}s")
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class Limit:
+    """`capacity` tokens, refilled at `rate` per second"""
+
+    def __init__(self, name, capacity, rate):
+        self.name = name
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+
+    @classmethod
+    def parse(cls, name, spec):
+        """Build from "<count>/<period>", e.g. "120/min" or "50000/hour"; None if empty or 0"""
+        if not spec or not spec.strip():
+            return None
+        count, _, period = spec.strip().partition("/")
+        count = float(count)
+        if count <= 0:
+            return None
+        seconds = PERIODS.get(period.strip().lower() or "s")
+        if seconds is None:
+            raise ValueError(f"Unknown rate limit period in {spec!r}")
+        return cls(name, count, count / seconds)
+
+    def __str__(self):
+        return f"{self.capacity:g} per {self.capacity / self.rate:g}s"
+
+
+def _refill(tokens, updated, now, limit):
+    return min(limit.capacity, tokens + (now - updated) * limit.rate)
+
+
+def _decide(tokens, cost, limit):
+    """(granted, tokens_after, retry_after) for a bucket holding `tokens`"""
+    cost = min(cost, limit.capacity)  # A call bigger than the bucket waits for a full one
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / limit.rate
+
+
+class MemoryBuckets:
+    """Per-process buckets; the least recently used are dropped past `max_keys`"""
+
+    blocking = False  # take() never waits on I/O
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, limit, key, cost):
+        now = time.monotonic()
+        bucket_key = (limit.name, key)
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = self._buckets[bucket_key] = [limit.capacity, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(bucket_key)
+            tokens = _refill(bucket[0], bucket[1], now, limit)
+            granted, bucket[0], retry_after = _decide(tokens, cost, limit)
+            bucket[1] = now
+        return granted, retry_after
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBuckets:
+    """Buckets in a SQLite file shared by the worker processes on one host"""
+
+    blocking = True
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        if hasattr(os, "register_at_fork"):
+            # A forked worker opens its own connections instead of using the parent's
+            os.register_at_fork(after_in_child=self._forget_connections)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._writes = 0
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, limit, key, cost):
+        conn = self._conn()
+        bucket_key = f"{limit.name}:{key}"
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (bucket_key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, limit) if row else limit.capacity
+            granted, tokens, retry_after = _decide(tokens, cost, limit)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (bucket_key, tokens, now))
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                # Buckets idle for an hour are full again; dropping them changes nothing
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return granted, retry_after
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+# Refill and take in one round trip; returns {granted, retry_after * 1000}.
+# KEYS[2] indexes the buckets by expiry time so they can be counted without a SCAN.
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), capacity)
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = capacity
+if bucket[1] then
+  tokens = math.min(capacity, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+end
+local granted = 0
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  granted = 1
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+local ttl = math.ceil(capacity / rate) + 1
+redis.call('EXPIRE', KEYS[1], ttl)
+redis.call('ZADD', KEYS[2], now + ttl, KEYS[1])
+return {granted, math.floor(wait * 1000)}
+"""
+
+
+class RedisBuckets:
+    """Buckets in Redis, shared by any number of processes or hosts"""
+
+    blocking = True
+
+    def __init__(self, url, prefix="voice-agent:ratelimit:"):
+        import redis  # Optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+        self._take = self._redis.register_script(_REDIS_TAKE)
+        self.prefix = prefix
+        self.index_key = f"{prefix.rstrip(':')}-index"
+
+    def take(self, limit, key, cost):
+        granted, wait_ms = self._take(
+            keys=[f"{self.prefix}{limit.name}:{key}", self.index_key],
+            args=[limit.capacity, limit.rate, cost, time.time()]
+        )
+        return bool(granted), wait_ms / 1000
+
+    def __len__(self):
+        # Drop the buckets that have expired since, then count the rest
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(self.index_key, "-inf", time.time())
+        pipe.zcard(self.index_key)
+        return pipe.execute()[1]
+
+
+class RateLimiter:
+    """Named limits over one bucket backend, with allowed/limited counters per limit
+
+    Limits that are not configured (None) always allow.
+    """
+
+    def __init__(self, backend, limits):
+        self.backend = backend
+        self.limits = {name: limit for name, limit in limits.items() if limit is not None}
+        self.allowed = {name: 0 for name in self.limits}
+        self.limited = {name: 0 for name in self.limits}
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def enabled(self, name):
+        return name in self.limits
+
+    def try_take(self, name, key="global", cost=1):
+        """Take `cost` tokens if available; returns 0.0 when granted, else seconds to wait"""
+        limit = self.limits.get(name)
+        if limit is None:
+            return 0.0
+        granted, retry_after = self.backend.take(limit, key, cost)
+        with self._lock:
+            if granted:
+                self.allowed[name] += 1
+            else:
+                self.limited[name] += 1
+        return 0.0 if granted else max(retry_after, 0.001)
+
+    async def try_take_async(self, name, key="global", cost=1):
+        """`try_take` for coroutines: SQLite and Redis buckets are taken in a worker thread"""
+        if name not in self.limits or not self.backend.blocking:
+            return self.try_take(name, key, cost)
+        return await asyncio.to_thread(self.try_take, name, key, cost)
+
+    def check(self, name, key="global", cost=1):
+        """Take tokens or raise RateLimited"""
+        retry_after = self.try_take(name, key, cost)
+        if retry_after:
+            raise RateLimited(name, retry_after)
+
+    def acquire(self, name, key="global", cost=1, max_wait=0.0):
+        """Take tokens, sleeping for them if that takes at most `max_wait` seconds"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            retry_after = self.try_take(name, key, cost)
+            if not retry_after:
+                return
+            if time.monotonic() + retry_after > deadline:
+                raise RateLimited(name, retry_after)
+            self._record_wait(retry_after)
+            time.sleep(retry_after)
+
+    async def acquire_async(self, name, key="global", cost=1, max_wait=0.0):
+        """`acquire` for coroutines: waits with asyncio.sleep"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            retry_after = await self.try_take_async(name, key, cost)
+            if not retry_after:
+                return
+            if time.monotonic() + retry_after > deadline:
+                raise RateLimited(name, retry_after)
+            self._record_wait(retry_after)
+            await asyncio.sleep(retry_after)
+
+    def _record_wait(self, seconds):
+        with self._lock:
+            self.waited += seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "buckets": len(self.backend),
+                "waited_s": round(self.waited, 2),
+                "limits": {
+                    name: {"limit": str(limit), "allowed": self.allowed[name], "limited": self.limited[name]}
+                    for name, limit in self.limits.items()
+                },
+            }
+
+
+def build_rate_limiter(limits):
+    """RateLimiter with buckets from RATE_LIMIT_BACKEND (memory | sqlite | redis)"""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        buckets = SQLiteBuckets(os.getenv("RATE_LIMIT_DB_PATH", "data/ratelimits.db"))
+    elif backend == "redis":
+        buckets = RedisBuckets(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    else:
+        buckets = MemoryBuckets(max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+    return RateLimiter(buckets, limits)
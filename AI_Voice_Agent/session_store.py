@@ -0,0 +1,369 @@
+"""Bounded conversation session stores (memory, SQLite, Redis)
+
+A session is a JSON-serialisable record: {"messages": [{"role", "content"}, ...]}
+plus optional extra keys (e.g. a running "summary") and a "rev" counter that
+every update bumps.
+Every backend enforces an idle TTL and a per-session message cap; the
+in-memory backend also bounds the number of sessions (LRU) and total bytes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _record_size(record):
+    """Approximate memory held by a session record, in bytes"""
+    size = 64
+    for message in record.get("messages", []):
+        size += 96 + len(message.get("content", "").encode("utf-8"))
+    for key, value in record.items():
+        if key != "messages" and isinstance(value, str):
+            size += len(value.encode("utf-8"))
+    return size
+
+
+class SessionStore:
+    """Common interface; backends implement load/save/delete/__len__"""
+
+    def __init__(self, idle_ttl=3600, max_messages=200):
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.evictions = 0
+        self.expired = 0
+
+    def load(self, session_id):
+        raise NotImplementedError
+
+    def save(self, session_id, record):
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, session_id):
+        return self.load(session_id) is not None
+
+    def _trim(self, record):
+        messages = record.get("messages", [])
+        if self.max_messages and len(messages) > self.max_messages:
+            messages = messages[-self.max_messages:]
+            # Gemini expects the history to open with a user turn
+            while messages and messages[0].get("role") != "user":
+                messages = messages[1:]
+            record["messages"] = messages
+        return record
+
+    def history(self, session_id):
+        """The session's messages, oldest first ([] for unknown sessions)"""
+        record = self.load(session_id)
+        return list(record["messages"]) if record else []
+
+    def update(self, session_id, mutate):
+        """Apply `mutate(record)` to a session as one read-modify-write step
+
+        The session is created if needed. Returning False from `mutate` leaves
+        the stored record untouched; otherwise its `rev` is bumped and it is saved.
+        """
+        record = self.load(session_id) or {"messages": []}
+        if mutate(record) is False:
+            return False
+        record["rev"] = record.get("rev", 0) + 1
+        self.save(session_id, record)
+        return True
+
+    def append(self, session_id, *messages):
+        """Add messages to a session, creating it if needed"""
+        self.update(session_id, lambda record: record["messages"].extend(messages))
+
+    def stats(self):
+        return {
+            "backend": type(self).__name__,
+            "sessions": len(self),
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "idle_ttl": self.idle_ttl,
+            "max_messages": self.max_messages,
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store with idle TTL, LRU session cap and byte accounting"""
+
+    def __init__(self, max_sessions=10000, max_bytes=0, **kwargs):
+        super().__init__(**kwargs)
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self._sessions = OrderedDict()  # session_id -> (record, last_access, size)
+        self._lock = threading.RLock()
+
+    def _expire_idle(self, now):
+        # Oldest access first, so stop at the first session that is still live
+        while self._sessions:
+            session_id, (_, last_access, size) = next(iter(self._sessions.items()))
+            if now - last_access <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.bytes_used -= size
+            self.expired += 1
+
+    def load(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            record, last_access, size = entry
+            if now - last_access > self.idle_ttl:
+                del self._sessions[session_id]
+                self.bytes_used -= size
+                self.expired += 1
+                return None
+            self._sessions[session_id] = (record, now, size)
+            self._sessions.move_to_end(session_id)
+            return {**record, "messages": list(record["messages"])}
+
+    def save(self, session_id, record):
+        record = self._trim(record)
+        size = _record_size(record)
+        now = time.monotonic()
+        with self._lock:
+            old = self._sessions.pop(session_id, None)
+            if old is not None:
+                self.bytes_used -= old[2]
+            self._sessions[session_id] = (record, now, size)
+            self.bytes_used += size
+
+            self._expire_idle(now)
+            while len(self._sessions) > self.max_sessions or (
+                    self.max_bytes and self.bytes_used > self.max_bytes and len(self._sessions) > 1):
+                _, (_, _, evicted_size) = self._sessions.popitem(last=False)
+                self.bytes_used -= evicted_size
+                self.evictions += 1
+
+    def update(self, session_id, mutate):
+        with self._lock:  # load + save as one step for concurrent turns
+            return super().update(session_id, mutate)
+
+    def delete(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self.bytes_used -= entry[2]
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(
+            max_sessions=self.max_sessions,
+            approx_bytes=self.bytes_used,
+            messages=sum(len(r["messages"]) for r, _, _ in list(self._sessions.values())),
+        )
+        return stats
+
+
+class SQLiteSessionStore(SessionStore):
+    """On-disk store that several worker processes on one host can share"""
+
+    def __init__(self, path, max_sessions=100000, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+        if hasattr(os, "register_at_fork"):
+            # A forked worker opens its own connections instead of using the parent's
+            os.register_at_fork(after_in_child=self._forget_connections)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, data TEXT NOT NULL, "
+            "accessed REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)")
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id):
+        conn = self._conn()
+        row = conn.execute("SELECT data, accessed FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.idle_ttl:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self.expired += 1
+            return None
+        conn.execute("UPDATE sessions SET accessed = ? WHERE id = ?", (now, session_id))
+        return json.loads(row[0])
+
+    def _write(self, conn, session_id, record):
+        """Upsert a record, then drop idle and least-recently-used sessions"""
+        record = self._trim(record)
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, data, accessed, size) VALUES (?, ?, ?, ?)",
+            (session_id, json.dumps(record), now, _record_size(record))
+        )
+        expired = conn.execute("DELETE FROM sessions WHERE accessed < ?", (now - self.idle_ttl,)).rowcount
+        self.expired += max(expired, 0)
+        overflow = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM sessions WHERE id IN "
+                "(SELECT id FROM sessions ORDER BY accessed LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def save(self, session_id, record):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write(conn, session_id, record)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update(self, session_id, mutate):
+        # Read-modify-write inside one write transaction so workers don't lose turns
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            record = json.loads(row[0]) if row else {"messages": []}
+            if mutate(record) is False:
+                conn.execute("ROLLBACK")
+                return False
+            record["rev"] = record.get("rev", 0) + 1
+            self._write(conn, session_id, record)
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, session_id):
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(
+            max_sessions=self.max_sessions,
+            approx_bytes=self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0],
+        )
+        return stats
+
+
+class RedisSessionStore(SessionStore):
+    """Redis-compatible store shared by any number of processes or hosts
+
+    Idle expiry uses key TTLs; bounding the session count is left to the
+    server's `maxmemory-policy` (e.g. allkeys-lru). Session IDs are also kept
+    in a sorted set scored by expiry time, so counting the live sessions
+    (/metrics, /debug/sessions) does not scan the keyspace.
+    """
+
+    def __init__(self, url, prefix="voice-agent:session:", **kwargs):
+        super().__init__(**kwargs)
+        import redis  # Optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+        self.prefix = prefix
+        self.index_key = f"{prefix.rstrip(':')}-index"
+
+    def _key(self, session_id):
+        return f"{self.prefix}{session_id}"
+
+    def _expires_at(self):
+        return time.time() + self.idle_ttl
+
+    def load(self, session_id):
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.getex(self._key(session_id), ex=self.idle_ttl)
+        pipe.zadd(self.index_key, {session_id: self._expires_at()}, xx=True)  # Only if still indexed
+        data = pipe.execute()[0]
+        return json.loads(data) if data else None
+
+    def save(self, session_id, record):
+        pipe = self._redis.pipeline()
+        pipe.set(self._key(session_id), json.dumps(self._trim(record)), ex=self.idle_ttl)
+        pipe.zadd(self.index_key, {session_id: self._expires_at()})
+        pipe.execute()
+
+    def update(self, session_id, mutate):
+        key = self._key(session_id)
+        with self._redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    data = pipe.get(key)
+                    record = json.loads(data) if data else {"messages": []}
+                    if mutate(record) is False:
+                        pipe.unwatch()
+                        return False
+                    record["rev"] = record.get("rev", 0) + 1
+                    pipe.multi()
+                    pipe.set(key, json.dumps(self._trim(record)), ex=self.idle_ttl)
+                    pipe.zadd(self.index_key, {session_id: self._expires_at()})
+                    pipe.execute()
+                    return True
+                except self._watch_error:
+                    continue  # Another worker wrote this session; retry
+
+    def delete(self, session_id):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._key(session_id))
+        pipe.zrem(self.index_key, session_id)
+        pipe.execute()
+
+    def __len__(self):
+        # Drop the sessions whose keys have expired since, then count the rest
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(self.index_key, "-inf", time.time())
+        pipe.zcard(self.index_key)
+        return pipe.execute()[1]
+
+
+def build_session_store():
+    """Pick a backend from SESSION_BACKEND (memory | sqlite | redis)"""
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    common = {
+        "idle_ttl": int(os.getenv("SESSION_IDLE_TTL", "3600")),
+        "max_messages": int(os.getenv("SESSION_MAX_MESSAGES", "200")),
+    }
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            os.getenv("SESSION_DB_PATH", "data/sessions.db"),
+            max_sessions=int(os.getenv("SESSION_MAX_COUNT", "100000")),
+            **common
+        )
+    if backend == "redis":
+        return RedisSessionStore(os.getenv("REDIS_URL", "redis://localhost:6379/0"), **common)
+    return MemorySessionStore(
+        max_sessions=int(os.getenv("SESSION_MAX_COUNT", "10000")),
+        max_bytes=int(os.getenv("SESSION_MAX_BYTES", "0")),
+        **common
+    )
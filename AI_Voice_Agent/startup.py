@@ -0,0 +1,130 @@
+"""Fast startup: vendor clients built on first use, and a startup time report
+
+Importing the vendor SDKs (google.generativeai pulls in gRPC and protobuf,
+assemblyai pydantic models) used to dominate cold start, yet none of them is
+needed to accept a connection. A `LazyClient` imports its SDK and builds the
+client on first use, exactly once across threads; `warm_in_background` does
+that (and any network warm-up) on a daemon thread right after startup, so
+the first request rarely pays for it either.
+
+`StartupReport` records how long each startup phase and each deferred import
+took, for the startup log line and GET /debug/startup.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Durations of the startup phases, deferred imports and background warm-up tasks
+
+    Phases are closed with `mark(name)`: each one lasts from the previous
+    mark (or from when the report was created) to this one.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self.phases = {}
+        self.imports = {}
+        self.warm_up = {}
+        self.ready_after = None
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        with self._lock:
+            self.phases[phase] = now - self._last_mark
+            self._last_mark = now
+
+    def ready(self):
+        """Record that the app can serve requests and log the breakdown"""
+        self.ready_after = time.perf_counter() - self.started
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        logger.info(f"Startup ready in {self.ready_after * 1000:.0f}ms ({phases})")
+
+    def import_module(self, name):
+        """Import `name`, timing it if this is its first import in the process"""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        with self._lock:
+            self.imports.setdefault(name, time.perf_counter() - started)
+        return module
+
+    def record_warm_up(self, task, seconds, error=None):
+        with self._lock:
+            self.warm_up[task] = {"ms": round(seconds * 1000, 1), "error": error}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready_ms": round(self.ready_after * 1000, 1) if self.ready_after is not None else None,
+                "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+                "deferred_imports_ms": {name: round(seconds * 1000, 1) for name, seconds in self.imports.items()},
+                "warm_up": dict(self.warm_up),
+            }
+
+
+class LazyClient:
+    """A client built by `factory()` on the first `get()`, exactly once across threads"""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+        self.build_seconds = None
+
+    def get(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    self._client = self._factory()
+                    self.build_seconds = time.perf_counter() - started
+                client = self._client
+        return client
+
+    def set(self, client):
+        """Use `client` instead of building one (e.g. a fake in tests or benchmarks)"""
+        with self._lock:
+            self._client = client
+
+    @property
+    def ready(self):
+        return self._client is not None
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "build_ms": round(self.build_seconds * 1000, 1) if self.build_seconds is not None else None,
+        }
+
+
+def warm_in_background(report, tasks):
+    """Run `tasks` ({name: callable}) in order on a daemon thread, timing each in `report`
+
+    A failing task is logged and recorded; the rest still run.
+    """
+    def run():
+        for name, task in tasks.items():
+            started = time.perf_counter()
+            try:
+                task()
+            except Exception as e:
+                logger.warning(f"Warm-up task {name} failed: {str(e)}")
+                report.record_warm_up(name, time.perf_counter() - started, error=str(e))
+            else:
+                report.record_warm_up(name, time.perf_counter() - started)
+
+    thread = threading.Thread(target=run, name="startup-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -326,6 +326,70 @@ async function startRecording() {
     }
   }
 
+  // ========== Streaming Playback ==========
+  // Audio URLs arrive sentence by sentence; play them back-to-back in order
+  let playbackQueue = [];
+  let isPlayingQueue = false;
+  let resumeAfterReply = false; // Voice loop: record again once a reply has been played
+
+  function resumeRecordingWhenIdle() {
+    if (resumeAfterReply && !isPlayingQueue && !isWaitingForResponse) {
+      resumeAfterReply = false;
+      startRecording();
+    }
+  }
+
+  function enqueueAudio(url) {
+    playbackQueue.push(url);
+    if (!isPlayingQueue) playNextInQueue();
+  }
+
+  function playNextInQueue() {
+    const url = playbackQueue.shift();
+    if (!url) {
+      // The last clip has already ended, so no later "ended" event will come
+      isPlayingQueue = false;
+      echoPlayback.onended = null;
+      resumeRecordingWhenIdle();
+      return;
+    }
+    isPlayingQueue = true;
+    echoPlayback.src = url;
+    echoPlayback.hidden = false;
+    echoPlayback.onended = playNextInQueue;
+    echoPlayback.play().catch((e) => {
+      console.warn("Playback failed:", e);
+      playNextInQueue();
+    });
+  }
+
+  // Parse a text/event-stream response body, calling onEvent(name, data)
+  async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = "message";
+        let data = "";
+        frame.split("\n").forEach((line) => {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        });
+        if (data) onEvent(event, JSON.parse(data));
+      }
+    }
+  }
+
   async function processRecording() {
     if (isWaitingForResponse) return;
     isWaitingForResponse = true;
@@ -335,8 +399,10 @@ async function startRecording() {
       const formData = new FormData();
       formData.append("audio", audioBlob, "recording.wav");
 
-      const response = await fetch(`/agent/chat/${currentSessionId}`, {
+      // Ask for a streamed reply so playback starts with the first sentence
+      const response = await fetch(`/agent/chat/${currentSessionId}?stream=1`, {
         method: "POST",
+        headers: { Accept: "text/event-stream" },
         body: formData,
       });
 
@@ -345,27 +411,134 @@ async function startRecording() {
         throw new Error(errorData.message || "Request failed");
       }
 
-      const data = await response.json();
+      let gotAudio = false;
+      playbackQueue = [];
+      resumeAfterReply = true;
+
+      await readEventStream(response, (event, data) => {
+        if (event === "transcription") {
+          transcriptionResult.textContent =
+            data.transcription || "No transcription";
+        } else if (event === "audio") {
+          gotAudio = true;
+          enqueueAudio(data.audio_url);
+        } else if (event === "error") {
+          if (data.audio_url) enqueueAudio(data.audio_url);
+          else playFallbackAudio("I'm having trouble responding right now.");
+        }
+      });
 
-      // Handle case where audio_url is not provided
-      if (!data.audio_url) {
+      // Handle case where no audio was streamed
+      if (!gotAudio) {
+        resumeAfterReply = false;
         playFallbackAudio("I didn't get a proper response.");
-        throw new Error("No audio URL in response");
       }
-
-      // Update UI and play audio
-      transcriptionResult.textContent =
-        data.transcription || "No transcription";
-      echoPlayback.src = data.audio_url;
-      echoPlayback.hidden = false;
-
-      // Auto-start next recording
-      echoPlayback.onended = () => !isWaitingForResponse && startRecording();
     } catch (err) {
       console.error("Processing error:", err);
+      resumeAfterReply = false;
       playFallbackAudio("I'm having trouble responding right now.");
     } finally {
       isWaitingForResponse = false;
+      resumeRecordingWhenIdle(); // In case every clip finished before the stream did
+    }
+  }
+
+  // ========== Live Transcription (WebSocket) ==========
+  // Microphone audio is streamed while the user talks, so the transcript (and
+  // the chat reply) is ready as soon as they stop instead of after an upload.
+  // Cleared once the server turns out not to offer /ws/transcribe (no
+  // flask-sock, ASGI mode, no AssemblyAI key): record and upload instead
+  let useLiveTranscription = "WebSocket" in window && "AudioContext" in window;
+  const LIVE_SAMPLE_RATE = 16000;
+  const LIVE_CONNECT_TIMEOUT_MS = 5000;
+  let liveSocket = null;
+  let liveAudioContext = null;
+  let liveProcessor = null;
+  let liveStream = null;
+
+  // Float32 samples at the device rate -> 16 kHz little-endian PCM16
+  function downsampleToPcm16(input, inputRate) {
+    const ratio = inputRate / LIVE_SAMPLE_RATE;
+    const output = new Int16Array(Math.floor(input.length / ratio));
+    for (let i = 0; i < output.length; i++) {
+      const sample = Math.max(-1, Math.min(1, input[Math.floor(i * ratio)]));
+      output[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+    }
+    return output.buffer;
+  }
+
+  function handleLiveMessage(data) {
+    if (data.type === "partial" || data.type === "final") {
+      transcriptionResult.textContent = data.text;
+    } else if (data.type === "reply") {
+      // With audio_bytes the clip itself follows as a binary frame
+      if (!data.audio_bytes) enqueueAudio(data.audio_url);
+      showRecordingStatus("Reply ready", "success");
+    } else if (data.type === "error") {
+      showRecordingStatus(`Live transcription error: ${data.message || data.text}`, "error");
+    } else if (data.type === "closed") {
+      liveSocket.close();
+      liveSocket = null;
+    }
+  }
+
+  async function startLiveTranscription() {
+    const protocol = window.location.protocol === "https:" ? "wss" : "ws";
+    liveSocket = new WebSocket(
+      `${protocol}://${window.location.host}/ws/transcribe/${currentSessionId}?audio=binary`
+    );
+    liveSocket.binaryType = "arraybuffer";
+    // The server sends {"type": "ready"} once its upstream session is open
+    await new Promise((resolve, reject) => {
+      const fail = (message) => {
+        clearTimeout(timer);
+        reject(new Error(message));
+      };
+      const timer = setTimeout(() => fail("No reply from /ws/transcribe"), LIVE_CONNECT_TIMEOUT_MS);
+      liveSocket.onerror = liveSocket.onclose = () => fail("Live transcription unavailable");
+      liveSocket.onmessage = (msg) => {
+        const data = JSON.parse(msg.data);
+        if (data.type !== "ready") return fail(data.message || "Live transcription unavailable");
+        clearTimeout(timer);
+        resolve();
+      };
+    });
+    liveSocket.onerror = liveSocket.onclose = null;
+    liveSocket.onmessage = (msg) => {
+      if (msg.data instanceof ArrayBuffer) {
+        // Reply audio sent inline: play it without another request
+        enqueueAudio(URL.createObjectURL(new Blob([msg.data], { type: "audio/mpeg" })));
+      } else {
+        handleLiveMessage(JSON.parse(msg.data));
+      }
+    };
+
+    liveStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    liveAudioContext = new AudioContext();
+    const source = liveAudioContext.createMediaStreamSource(liveStream);
+    liveProcessor = liveAudioContext.createScriptProcessor(4096, 1, 1);
+    liveProcessor.onaudioprocess = (event) => {
+      if (liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+        liveSocket.send(
+          downsampleToPcm16(
+            event.inputBuffer.getChannelData(0),
+            liveAudioContext.sampleRate
+          )
+        );
+      }
+    };
+    source.connect(liveProcessor);
+    liveProcessor.connect(liveAudioContext.destination);
+  }
+
+  function stopLiveTranscription() {
+    if (liveProcessor) liveProcessor.disconnect();
+    if (liveAudioContext) liveAudioContext.close();
+    if (liveStream) liveStream.getTracks().forEach((track) => track.stop());
+    liveProcessor = liveAudioContext = liveStream = null;
+
+    if (liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+      liveSocket.send(JSON.stringify({ type: "stop" }));
     }
   }
 
@@ -428,6 +601,23 @@ function addMessage(text, isUser) {
 
   // ========== Event Listeners ==========
   startBtn.addEventListener("click", async () => {
+    if (useLiveTranscription) {
+      try {
+        await startLiveTranscription();
+        startBtn.disabled = true;
+        stopBtn.disabled = false;
+        showRecordingStatus("Listening... Speak now!", "info");
+        transcriptionResult.textContent = "";
+        return;
+      } catch (error) {
+        console.warn("Live transcription unavailable, recording instead:", error);
+        useLiveTranscription = false;
+        stopLiveTranscription();
+        if (liveSocket) liveSocket.close();
+        liveSocket = null;
+      }
+    }
+
     const ready = await initRecorder();
     if (ready) {
       audioChunks = [];
@@ -441,6 +631,13 @@ function addMessage(text, isUser) {
   });
 
   stopBtn.addEventListener("click", () => {
+    if (liveSocket) {
+      stopLiveTranscription();
+      startBtn.disabled = false;
+      stopBtn.disabled = true;
+      showRecordingStatus("Processing...", "info");
+      return;
+    }
     if (mediaRecorder?.state !== "inactive") {
       mediaRecorder.stop();
       startBtn.disabled = false;
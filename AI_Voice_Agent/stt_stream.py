@@ -0,0 +1,79 @@
+"""Real-time transcription: browser PCM frames -> AssemblyAI streaming STT"""
+import logging
+import queue
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# AssemblyAI wants 50-1000 ms of audio per message; 16-bit mono PCM is 2 bytes/sample
+MIN_SEND_BYTES = SAMPLE_RATE * 2 // 10  # 100 ms
+
+
+def _streaming_sdk():
+    """AssemblyAI's v3 streaming module, imported on first use (None on older SDKs)"""
+    try:
+        from assemblyai.streaming import v3
+    except ImportError:  # Older SDKs without the v3 streaming client
+        return None
+    return v3
+
+
+class StreamingTranscription:
+    """One streaming STT session whose results are queued for the caller
+
+    Events are put on `self.events` as `(kind, text)` tuples where `kind` is
+    "partial", "final" or "error". AssemblyAI invokes its callbacks on its own
+    reader thread, so the caller drains the queue from the WebSocket thread.
+    """
+
+    def __init__(self, api_key, sample_rate=SAMPLE_RATE, **params):
+        sdk = _streaming_sdk()
+        if sdk is None:
+            raise RuntimeError("Installed assemblyai SDK has no streaming client")
+        self._sdk = sdk
+        self.events = queue.Queue()
+        self.sample_rate = sample_rate
+        self._buffer = bytearray()
+        self._closed = False
+        self._params = params
+        self._client = sdk.StreamingClient(sdk.StreamingClientOptions(api_key=api_key))
+        self._client.on(sdk.StreamingEvents.Turn, self._on_turn)
+        self._client.on(sdk.StreamingEvents.Error, self._on_error)
+
+    def _on_turn(self, client, event):
+        if not event.transcript:
+            return
+        if event.end_of_turn and getattr(event, "turn_is_formatted", True):
+            self.events.put(("final", event.transcript))
+        elif not event.end_of_turn:
+            self.events.put(("partial", event.transcript))
+
+    def _on_error(self, client, error):
+        logger.error(f"Streaming transcription error: {error}")
+        self.events.put(("error", str(error)))
+
+    def start(self):
+        self._client.connect(self._sdk.StreamingParameters(
+            sample_rate=self.sample_rate,
+            format_turns=True,
+            **self._params
+        ))
+
+    def send(self, pcm_bytes):
+        """Buffer raw PCM16 audio and forward it once there is enough to send"""
+        self._buffer.extend(pcm_bytes)
+        if len(self._buffer) >= MIN_SEND_BYTES:
+            self._client.stream(bytes(self._buffer))
+            self._buffer.clear()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._buffer:
+                self._client.stream(bytes(self._buffer))
+                self._buffer.clear()
+            self._client.disconnect(terminate=True)
+        except Exception as e:
+            logger.warning(f"Error closing streaming transcription: {str(e)}")
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules are imported as top-level modules, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """app.py imported without background threads, vendor keys or shared state on disk
+
+    Skipped where the app's own dependencies are not installed.
+    """
+    for module in ("flask", "flask_cors", "assemblyai", "google.generativeai"):
+        pytest.importorskip(module)
+    saved = dict(os.environ)
+    os.environ["PREFORK"] = "1"  # No background threads on import
+    os.environ["BLOB_DIR"] = str(tmp_path_factory.mktemp("blobs"))
+    for name in ("AAI_API_KEY", "MURF_API_KEY", "GEMINI_API_KEY"):
+        os.environ.setdefault(name, "test")
+    try:
+        import app
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    app.app.config["TESTING"] = True
+    return app
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+from pipeline import Pipeline, Stage, Turn
+
+
+@pytest.fixture(scope="module")
+def asgi(app_module):
+    for module in ("starlette", "httpx", "asgiref", "multipart"):
+        pytest.importorskip(module)
+    import asgi
+    return asgi
+
+
+@pytest.fixture
+def client(asgi):
+    from starlette.testclient import TestClient
+    return TestClient(asgi.app)
+
+
+def scope(method, path, query=b"", headers=()):
+    return {"type": "http", "method": method, "path": path, "query_string": query, "headers": list(headers)}
+
+
+def test_only_plain_json_posts_use_the_async_routes(asgi):
+    assert asgi._is_async_route(scope("POST", "/generate_audio"))
+    assert asgi._is_async_route(scope("POST", "/agent/chat/abc"))
+    assert not asgi._is_async_route(scope("GET", "/generate_audio"))
+    assert not asgi._is_async_route(scope("POST", "/generate_audio/batch"))
+    assert not asgi._is_async_route(scope("POST", "/llm/query", query=b"stream=1"))
+    assert not asgi._is_async_route(scope("POST", "/llm/query", query=b"voice=x&async=1"))
+    assert asgi._is_async_route(scope("POST", "/llm/query", query=b"upstream=1&async=0&stream="))
+    assert not asgi._is_async_route(scope("POST", "/llm/query", headers=[(b"prefer", b"respond-async")]))
+    assert not asgi._is_async_route({"type": "websocket", "path": "/ws/transcribe/abc"})
+
+
+def test_generate_audio_runs_the_async_pipeline(asgi, client, monkeypatch):
+    async def synthesize(turn):
+        turn.audio_urls = [f"https://cdn/{turn.transcription}.mp3"]
+
+    monkeypatch.setattr(asgi, "speech_pipeline", Pipeline([Stage("tts", synthesize)]))
+    response = client.post("/generate_audio", json={"text": "hi"})
+    assert response.status_code == 200
+    assert response.json() == {"success": True, "audio_url": "https://cdn/hi.mp3", "voice_used": "en-US-Natalie"}
+    assert client.post("/generate_audio", json={}).status_code == 400
+
+
+def test_client_errors_from_httpx_do_not_trip_the_breaker(app_module, asgi):
+    import httpx
+
+    def status_error(status):
+        request = httpx.Request("POST", "https://api.assemblyai.com/v2/upload")
+        return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+    assert not app_module.vendor_failure(status_error(401))
+    assert app_module.vendor_failure(status_error(429))
+    assert app_module.vendor_failure(status_error(502))
+
+
+def test_remember_stage_runs_off_the_event_loop(app_module, asgi, monkeypatch):
+    threads = []
+    monkeypatch.setattr(app_module.history_window, "add_turn", lambda *args: threads.append(threading.current_thread()))
+    turn = Turn(transcription="hi", session_id="abc")
+    turn.response_text = "hello"
+    asyncio.run(asgi.remember_stage.fn(turn))
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_other_requests_fall_through_to_flask(client):
+    response = client.get(f"/blobs/tts/{'ab' * 20}.mp3")
+    assert response.status_code == 404 and response.json() == {"error": "Audio not found"}
+
+
+def test_websocket_handshakes_are_refused(client):
+    from starlette.websockets import WebSocketDisconnect
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/ws/transcribe/abc"):
+            pass
@@ -0,0 +1,77 @@
+import io
+import wave
+
+import pytest
+
+import audio_preprocess
+from audio_preprocess import AudioPreprocessor, TARGET_RATE
+
+
+@pytest.fixture
+def np(monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    monkeypatch.setattr(audio_preprocess, "_ffmpeg", lambda: None)  # Plain WAV output, no subprocess
+    return numpy
+
+
+def make_wav(samples, rate):
+    """16-bit WAV bytes for float samples shaped (frames,) or (frames, channels)"""
+    frames = samples if samples.ndim == 2 else samples.reshape(-1, 1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(frames.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((frames * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def speech(np, rate, silence=0.5, tone=0.5):
+    gap = np.zeros(int(rate * silence), dtype=np.float32)
+    t = np.arange(int(rate * tone)) / rate
+    return np.concatenate([gap, 0.5 * np.sin(2 * np.pi * 440 * t).astype(np.float32), gap])
+
+
+def test_disabled_preprocessor_passes_audio_through():
+    preprocessor = AudioPreprocessor(enabled=False)
+    assert preprocessor.process(b"RIFF....") == b"RIFF...."
+    assert preprocessor.stats()["processed"] == 0
+
+
+def test_decode_wav_keeps_channels_and_rate(np):
+    stereo = np.stack([speech(np, 8000), speech(np, 8000)], axis=1)
+    samples, rate = audio_preprocess.decode(make_wav(stereo, 8000))
+    assert rate == 8000 and samples.shape == stereo.shape
+    assert np.allclose(samples, stereo, atol=1e-3)
+
+
+def test_resample_to_target_rate(np):
+    assert audio_preprocess.resample(np.zeros(48000, dtype=np.float32), 48000).size == TARGET_RATE
+    assert audio_preprocess.resample(np.zeros(8000, dtype=np.float32), 8000).size == TARGET_RATE
+
+
+def test_trim_silence_keeps_padding_around_speech(np):
+    trimmed = audio_preprocess.trim_silence(speech(np, TARGET_RATE), TARGET_RATE)
+    assert trimmed.size == int(TARGET_RATE * 0.9)  # 0.5 s tone + 200 ms either side
+    silent = np.zeros(TARGET_RATE, dtype=np.float32)
+    assert audio_preprocess.trim_silence(silent, TARGET_RATE).size == 0
+
+
+def test_process_shrinks_audio_and_counts_it(np):
+    stereo = np.stack([speech(np, 44100)] * 2, axis=1)
+    original = make_wav(stereo, 44100)
+    preprocessor = AudioPreprocessor()
+    processed = preprocessor.process(original)
+    samples, rate = audio_preprocess.decode(processed)
+    assert rate == TARGET_RATE and samples.shape[1] == 1
+    assert len(processed) < len(original)
+    stats = preprocessor.stats()
+    assert (stats["processed"], stats["bytes_in"], stats["bytes_out"]) == (1, len(original), len(processed))
+
+
+def test_process_returns_original_when_it_cannot_help(np):
+    preprocessor = AudioPreprocessor()
+    silence = make_wav(np.zeros(TARGET_RATE, dtype=np.float32), TARGET_RATE)
+    assert preprocessor.process(silence) == silence
+    assert preprocessor.process(b"not audio") == b"not audio"
+    assert preprocessor.stats()["skipped"] == 2
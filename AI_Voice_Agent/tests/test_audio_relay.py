@@ -0,0 +1,101 @@
+import pytest
+
+from audio_relay import AudioRelay
+from blob_store import BlobStore
+
+CLIP = bytes(range(256)) * 4
+KEY = "ab" * 20
+
+
+class FakeResponse:
+    def __init__(self, body, status=200):
+        self.body = body
+        self.status = status
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+    def iter_content(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeHTTP:
+    def __init__(self, body=CLIP, status=200):
+        self.body = body
+        self.status = status
+        self.requests = []
+
+    def get(self, url, endpoint=None, headers=None, stream=False):
+        self.requests.append((url, headers))
+        return FakeResponse(self.body, self.status)
+
+
+def test_stream_relays_chunks_then_caches_the_clip():
+    http = FakeHTTP()
+    relay = AudioRelay(http, lambda key: None)
+    assert b"".join(relay.stream(KEY, "https://cdn/a.mp3")) == CLIP
+    assert http.requests == [("https://cdn/a.mp3", {"api-key": None})]  # No API key to the CDN
+    assert relay.fetch(KEY) == CLIP
+    stats = relay.stats()
+    assert (stats["clips"], stats["hits"], stats["relayed_bytes"]) == (1, 1, len(CLIP))
+
+
+def test_upstream_errors_raise_before_streaming():
+    relay = AudioRelay(FakeHTTP(status=404), lambda key: "https://cdn/gone.mp3")
+    with pytest.raises(RuntimeError):
+        relay.stream(KEY, "https://cdn/gone.mp3")
+    assert relay.cached(KEY) is None
+
+
+def test_fetch_uses_the_source_url_and_unknown_keys_are_none():
+    relay = AudioRelay(FakeHTTP(), {KEY: "https://cdn/a.mp3"}.get)
+    assert relay.fetch(KEY) == CLIP
+    assert relay.fetch("cd" * 20) is None
+
+
+def test_least_recently_used_clips_are_evicted_and_big_clips_not_kept():
+    relay = AudioRelay(FakeHTTP(), lambda key: None, max_bytes=2 * len(CLIP), max_clip_bytes=len(CLIP))
+    for key in ("a", "b"):
+        b"".join(relay.stream(key, "u"))
+    relay.cached("a")
+    b"".join(relay.stream("c", "u"))
+    assert relay.cached("b") is None and relay.cached("a") == CLIP
+    assert relay.evictions == 1
+
+    big = AudioRelay(FakeHTTP(CLIP * 2), lambda key: None, max_clip_bytes=len(CLIP))
+    assert b"".join(big.stream("big", "u")) == CLIP * 2
+    assert big.cached("big") is None
+
+
+def test_blob_store_keeps_clips_across_relays(tmp_path):
+    store = BlobStore(str(tmp_path / "tts"))
+    b"".join(AudioRelay(FakeHTTP(), lambda key: None, store=store).stream(KEY, "u"))
+    fresh = AudioRelay(FakeHTTP(status=500), lambda key: "u", store=store)
+    assert fresh.stored(KEY) is not None
+    assert fresh.fetch(KEY) == CLIP
+
+
+def test_range_requests_get_partial_content(app_module, monkeypatch):
+    relay = AudioRelay(FakeHTTP(), {KEY: "https://cdn/a.mp3"}.get)
+    monkeypatch.setattr(app_module, "audio_relay", relay)
+    http = app_module.app.test_client()
+
+    first = http.get(f"/audio/{KEY}", headers={"Range": "bytes=0-99"})
+    assert first.status_code == 206 and first.data == CLIP[:100]
+    assert first.headers["Content-Range"] == f"bytes 0-99/{len(CLIP)}"
+
+    replay = http.get(f"/audio/{KEY}", headers={"Range": "bytes=1000-"})  # Served from memory
+    assert replay.status_code == 206 and replay.data == CLIP[1000:]
+    whole = http.get(f"/audio/{KEY}")
+    assert whole.status_code == 200 and whole.data == CLIP
+    assert len(relay.http.requests) == 1
+
+    unsatisfiable = http.get(f"/audio/{KEY}", headers={"Range": f"bytes={len(CLIP)}-"})
+    assert unsatisfiable.status_code == 416
+    assert http.get(f"/audio/{'cd' * 20}").status_code == 404
@@ -0,0 +1,52 @@
+import json
+
+from pipeline import Pipeline, Stage
+
+
+def fake_speech_pipeline(app_module, calls):
+    def synthesize(turn):
+        calls.append(turn.transcription)
+        if turn.transcription == "fail":
+            raise app_module.MurfAPIError("Voice not found", status=400)
+        turn.audio_urls = [f"https://cdn/{turn.voice_id}/{turn.transcription}.mp3"]
+
+    return Pipeline([Stage("tts", synthesize)])
+
+
+def post_batch(app_module, body):
+    response = app_module.app.test_client().post("/generate_audio/batch", json=body)
+    lines = [json.loads(line) for line in response.data.decode().splitlines()] if response.status_code == 200 else None
+    return response, lines
+
+
+def test_batch_items_groups_duplicates_and_flags_invalid(app_module):
+    items = [{"text": "hi"}, {"text": "hi", "voice": "en-US-Natalie"}, {"text": "hi", "voice": "en-GB-Lucy"},
+             {"text": ""}, "junk"]
+    unique, invalid = app_module.batch_items(items, "en-US-Natalie")
+    assert sorted(indices for _, _, indices in unique.values()) == [[0, 1], [2]]
+    assert invalid == [(3, "Text is required"), (4, "Text is required")]
+
+
+def test_batch_streams_one_result_per_distinct_text(app_module, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "speech_pipeline", fake_speech_pipeline(app_module, calls))
+    response, lines = post_batch(app_module, {"items": [
+        {"text": "one"}, {"text": "two", "voice": "en-GB-Lucy"}, {"text": "one"}, {"text": "fail"}, {}
+    ]})
+    assert response.mimetype == "application/x-ndjson"
+    header, results, done = lines[0], lines[1:-1], lines[-1]
+    assert (header["items"], header["unique"], header["invalid"]) == (5, 3, 1)
+    by_indices = {tuple(result["indices"]): result for result in results}
+    assert by_indices[(0, 2)]["audio_url"] == "https://cdn/en-US-Natalie/one.mp3"
+    assert by_indices[(1,)]["voice_used"] == "en-GB-Lucy"
+    assert by_indices[(3,)]["status"] == 400 and not by_indices[(3,)]["success"]
+    assert by_indices[(4,)]["status"] == 400
+    assert done == {"done": True, "succeeded": 2, "failed": 2}
+    assert sorted(calls) == ["fail", "one", "two"]
+
+
+def test_batch_rejects_bad_requests(app_module, monkeypatch):
+    assert post_batch(app_module, {"items": []})[0].status_code == 400
+    assert post_batch(app_module, {"items": [{"text": "a"}], "concurrency": "many"})[0].status_code == 400
+    monkeypatch.setattr(app_module, "TTS_BATCH_MAX_ITEMS", 2)
+    assert post_batch(app_module, {"items": [{"text": "a"}] * 3})[0].status_code == 400
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from benchmark import compare, percentile, summarise  # noqa: E402
+
+
+def test_percentile_nearest_rank():
+    values = [10, 20, 30, 40]
+    assert percentile(values, 50) == 20
+    assert percentile(values, 95) == 40
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_summarise_per_route():
+    results = [("tts", 0.1, True), ("tts", 0.3, False), ("chat", 1.0, True)]
+    report = summarise(results, elapsed=2.0)
+    assert report["requests"] == 3 and report["errors"] == 1 and report["rps"] == 1.5
+    assert report["routes"]["tts"]["errors"] == 1
+    assert report["routes"]["tts"]["mean_ms"] == 200.0
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"routes": {"tts": {"p95_ms": 100}}, "rps": 10, "startup": {"ready_ms": 500}}
+    report = {"routes": {"tts": {"p95_ms": 105}}, "rps": 9.5, "startup": {"ready_ms": 520}}
+    assert compare(report, baseline, tolerance=0.1) == []
+    report = {"routes": {"tts": {"p95_ms": 150}}, "rps": 5, "startup": {"ready_ms": 900}}
+    assert len(compare(report, baseline, tolerance=0.1)) == 3
@@ -0,0 +1,76 @@
+import io
+import os
+
+import pytest
+
+from blob_store import BlobStore, valid_key
+
+
+def test_valid_key_rejects_paths():
+    assert valid_key("0123abcd")
+    assert not valid_key("../../etc/passwd")
+    assert not valid_key("0123ABCD") and not valid_key("abc")
+
+
+def test_put_is_content_addressed_and_sharded(tmp_path):
+    store = BlobStore(str(tmp_path))
+    key = store.put(b"mp3 bytes", ".mp3")
+    assert store.put(b"mp3 bytes", ".mp3") == key
+    path = store.locate(key, ".mp3")
+    assert path == os.path.join(str(tmp_path), key[:2], key[2:4], key + ".mp3")
+    assert store.read(key, ".mp3") == b"mp3 bytes"
+    stats = store.stats()
+    assert (stats["files"], stats["bytes"], stats["writes"]) == (1, 9, 2)
+
+
+def test_put_stream_matches_put_and_rewinds(tmp_path):
+    store = BlobStore(str(tmp_path))
+    data = os.urandom(200_000)
+    stream = io.BytesIO(data)
+    assert store.put_stream(stream, ".wav") == store.put(data, ".wav")
+    assert stream.tell() == 0
+    assert store.read(store.put(data, ".wav"), ".wav") == data
+
+
+def test_lookups_count_hits_and_misses(tmp_path):
+    store = BlobStore(str(tmp_path))
+    key = store.put(b"x", key="ab" * 10)
+    assert store.contains(key) and not store.contains("../" + key)
+    assert store.locate("cd" * 10) is None
+    assert store.locate("../secrets") is None
+    assert store.read(key) == b"x"
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 2, 0.333)
+
+
+def test_compact_drops_expired_then_least_recently_used(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=250, max_age=3600)
+    keys = [store.put(bytes([n]) * 100) for n in range(4)]
+    paths = [store.path(key) for key in keys]
+    for age, path in zip((7200, 300, 200, 100), paths):
+        stamp = os.stat(path).st_mtime - age
+        os.utime(path, (stamp, stamp))
+
+    assert store.compact() == 2  # keys[0] expired, keys[1] least recently used
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+    assert store.stats()["bytes"] == 200 and store.evictions == 2
+
+
+def test_compact_without_limits_only_counts(tmp_path):
+    store = BlobStore(str(tmp_path))
+    store.put(b"a" * 10)
+    fresh = BlobStore(str(tmp_path))
+    assert fresh.compact() == 0
+    assert fresh.stats()["files"] == 1 and fresh.stats()["bytes"] == 10
+
+
+def test_failed_writes_leave_nothing_behind(tmp_path):
+    class Broken(io.BytesIO):
+        def read(self, size=-1):
+            raise OSError("client went away")
+
+    store = BlobStore(str(tmp_path))
+    with pytest.raises(OSError):
+        store.put_stream(Broken(b"data"))
+    assert os.listdir(os.path.join(str(tmp_path), "tmp")) == []
+    assert store.stats()["files"] == 0
@@ -0,0 +1,75 @@
+import io
+
+import cache
+from cache import DiskBackend, MemoryBackend, ResultCache, build_cache, hash_content, make_key
+
+
+def test_make_key_is_stable_and_order_sensitive():
+    assert make_key("hello", "en-US-Natalie") == make_key("hello", "en-US-Natalie")
+    assert make_key("hello", {"a": 1, "b": 2}) == make_key("hello", {"b": 2, "a": 1})
+    assert make_key("a", "b") != make_key("b", "a")
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1  # "b" is now the least recently used
+    backend.set("c", 3)
+    assert backend.get("b") is None
+    assert (backend.get("a"), backend.get("c")) == (1, 3)
+    assert backend.evictions == 1
+
+
+def test_memory_backend_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    backend = MemoryBackend(ttl=10)
+    backend.set("a", 1)
+    now[0] += 9
+    assert backend.get("a") == 1
+    now[0] += 2
+    assert backend.get("a") is None
+    assert len(backend) == 0
+
+
+def test_disk_backend_persists_and_trims(tmp_path):
+    path = str(tmp_path / "cache" / "tts.sqlite3")
+    backend = DiskBackend(path, max_entries=2)
+    backend.set("a", {"url": "/a"})
+    backend.set("b", {"url": "/b"})
+    backend.set("c", {"url": "/c"})
+    assert len(backend) == 2
+    assert backend.evictions == 1
+    assert DiskBackend(path).get("c") == {"url": "/c"}
+
+
+def test_result_cache_counts_hits_and_skips_none():
+    results = ResultCache(MemoryBackend(), name="tts")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "/audio.mp3"
+
+    assert results.get_or_compute("k", compute) == "/audio.mp3"
+    assert results.get_or_compute("k", compute) == "/audio.mp3"
+    results.set("none", None)
+    assert results.get("none") is None
+    assert len(calls) == 1
+    stats = results.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_build_cache_picks_backend(tmp_path):
+    assert isinstance(build_cache("tts", 10, None).backend, MemoryBackend)
+    assert isinstance(build_cache("tts", 10, None, str(tmp_path / "c.db")).backend, DiskBackend)
+
+
+def test_hash_content_matches_for_bytes_and_streams():
+    data = b"\x00\x01audio" * 50_000
+    stream = io.BytesIO(data)
+    stream.seek(123)
+    assert hash_content(stream, chunk_size=4096) == hash_content(data)
+    assert stream.tell() == 0  # Rewound for the upload that follows
+    assert hash_content(b"a") != hash_content(b"b")
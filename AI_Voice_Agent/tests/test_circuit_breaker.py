@@ -0,0 +1,86 @@
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, AdaptiveTimeout, CircuitBreaker, CircuitOpenError
+
+
+class ClientError(Exception):
+    status = 400
+
+
+def fail(breaker, exc=RuntimeError):
+    with pytest.raises(exc):
+        with breaker.guard():
+            raise exc()
+
+
+def half_open(breaker):
+    breaker.opened_at -= breaker.reset_timeout
+    breaker.stats()  # Refreshes the state
+    assert breaker.state == HALF_OPEN
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker("vendor", failure_threshold=2, reset_timeout=30)
+    fail(breaker)
+    assert breaker.state == CLOSED
+    fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pass
+    assert breaker.rejected == 1
+
+
+def test_successful_probe_closes_and_failed_probe_reopens():
+    breaker = CircuitBreaker("vendor", failure_threshold=1, reset_timeout=30)
+    fail(breaker)
+    half_open(breaker)
+    fail(breaker)
+    assert breaker.state == OPEN
+
+    half_open(breaker)
+    with breaker.guard():
+        pass
+    assert breaker.state == CLOSED
+
+
+def test_non_failure_releases_probe_without_closing():
+    breaker = CircuitBreaker("vendor", failure_threshold=1, reset_timeout=30,
+                             is_failure=lambda e: getattr(e, "status", 500) >= 500)
+    fail(breaker)
+    half_open(breaker)
+    fail(breaker, ClientError)
+    assert breaker.state == HALF_OPEN
+    assert breaker.successes == 0
+    with breaker.guard():  # The probe slot was given back
+        pass
+    assert breaker.state == CLOSED
+
+
+def test_adaptive_timeout_follows_latency_within_bounds():
+    timeout = AdaptiveTimeout(floor=1.0, multiplier=2.0, min_samples=3)
+    assert timeout.current(10) == 10
+    for seconds in (0.1, 0.2, 2.0):
+        timeout.observe(seconds)
+    assert timeout.current(10) == 4.0
+    assert timeout.current(3) == 3
+
+
+class BlockedReply:
+    @property
+    def text(self):
+        raise ValueError("Response was blocked by the safety filters")
+
+
+@pytest.mark.parametrize("call", [
+    lambda app: app.generate_text("hi"),
+    lambda app: app.summarize_history("", [{"role": "user", "content": "hi"}]),
+])
+def test_blocked_gemini_replies_do_not_count_as_failures(app_module, monkeypatch, call):
+    model = type("Model", (), {"generate_content": lambda self, prompt, request_options=None: BlockedReply()})()
+    breaker = CircuitBreaker("gemini")
+    monkeypatch.setattr(app_module.gemini_model, "get", lambda: model)
+    monkeypatch.setattr(app_module, "gemini_breaker", breaker)
+    with pytest.raises(ValueError):
+        call(app_module)
+    assert (breaker.failures, breaker.successes) == (0, 1)
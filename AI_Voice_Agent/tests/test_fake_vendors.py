@@ -0,0 +1,55 @@
+import json
+import urllib.request
+
+import pytest
+
+from fake_vendors import FAKE_MP3, FAKE_VOICES, FakeGeminiModel, FakeVendorServer, VendorProfile
+
+
+@pytest.fixture
+def vendors():
+    server = FakeVendorServer(aai=VendorProfile(latency=0), murf=VendorProfile(latency=0)).start()
+    yield server
+    server.stop()
+
+
+def call(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    with urllib.request.urlopen(urllib.request.Request(url, data=data)) as response:
+        payload = response.read()
+        return payload if response.headers["Content-Type"] == "audio/mpeg" else json.loads(payload)
+
+
+def test_vendor_profile_parse():
+    profile = VendorProfile.parse("0.2,0.05")
+    assert (profile.latency, profile.jitter, profile.failure_rate) == (0.2, 0.05, 0.0)
+    assert str(VendorProfile.parse("")) == "0.05,0.0,0.0"
+    assert not VendorProfile(failure_rate=0).fails()
+    assert VendorProfile(failure_rate=1).fails()
+
+
+def test_assemblyai_upload_transcribe_and_poll(vendors):
+    upload_url = call(f"{vendors.url}/v2/upload", {"audio": "bytes"})["upload_url"]
+    job = call(f"{vendors.url}/v2/transcript", {"audio_url": upload_url})
+    result = call(f"{vendors.url}/v2/transcript/{job['id']}")
+    assert result["status"] == "completed" and result["text"]
+    assert call(f"{vendors.url}/v2/transcript/missing")["status"] == "error"
+    assert vendors.calls["aai"] == 1
+
+
+def test_murf_generate_voices_and_audio(vendors):
+    generated = call(f"{vendors.url}/v1/speech/generate", {"text": "Hello there"})
+    assert call(generated["audioFile"]) == FAKE_MP3
+    assert call(f"{vendors.url}/v1/speech/voices") == FAKE_VOICES
+    assert vendors.calls["murf"] == 1
+
+
+def test_fake_gemini_plain_streamed_and_chat():
+    model = FakeGeminiModel(VendorProfile(latency=0))
+    assert model.generate_content("hi").text.startswith("About 'hi'")
+    streamed = model.generate_content("hi", stream=True)
+    assert "".join(chunk.text for chunk in streamed).strip() == streamed.text
+    assert model.start_chat([]).send_message("again").text
+    assert model.calls == 3
+    with pytest.raises(RuntimeError):
+        FakeGeminiModel(VendorProfile(latency=0, failure_rate=1)).generate_content("hi")
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from blob_store import BlobStore
+from fallback_audio import FallbackAudio
+
+
+def make_fallback(tmp_path, render):
+    return FallbackAudio(BlobStore(str(tmp_path / "fallback")), "/blobs/fallback/", render)
+
+
+def test_warm_renders_each_clip_once_and_serves_it_locally(tmp_path):
+    calls = []
+
+    def render(message, voice_id):
+        calls.append(message)
+        return f"{voice_id}:{message}".encode()
+
+    fallback = make_fallback(tmp_path, render)
+    fallback.warm(["Sorry", "Try again"])
+    fallback.warm(["Sorry", "Try again"])
+    url = fallback.get("Sorry")
+    assert url.startswith("/blobs/fallback/") and url.endswith(".mp3")
+    assert calls == ["Sorry", "Try again"]
+    assert fallback.stats() == {"ready": 2, "rendering": 0}
+
+    # A later run picks the clips up from the store without rendering again
+    again = FallbackAudio(fallback.store, "/blobs/fallback", render)
+    assert again.get("Try again") is not None
+    assert calls == ["Sorry", "Try again"]
+
+
+def test_get_never_blocks_and_renders_once_in_background(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def render(message, voice_id):
+        calls.append(message)
+        release.wait(2)
+        return b"mp3"
+
+    fallback = make_fallback(tmp_path, render)
+    assert fallback.get("Sorry") is None
+    assert fallback.get("Sorry") is None  # Already rendering: no second render
+    release.set()
+    deadline = time.monotonic() + 2
+    while fallback.stats()["rendering"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert calls == ["Sorry"]
+    assert fallback.get("Sorry") is not None
+
+
+def test_render_failure_is_retried_later(tmp_path):
+    outcomes = [RuntimeError("Murf down"), b"mp3"]
+
+    def render(message, voice_id):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    fallback = make_fallback(tmp_path, render)
+    fallback.warm(["Sorry"])
+    assert fallback.stats() == {"ready": 0, "rendering": 0}
+    fallback.warm(["Sorry"])
+    assert fallback.get("Sorry") is not None
@@ -0,0 +1,72 @@
+from history_window import SUMMARY_ACK, SUMMARY_PREFIX, HistoryWindow, estimate_tokens
+from session_store import MemorySessionStore
+
+TEXT = "x" * 39  # 10 tokens
+
+
+def finish_compactions(window):
+    window._executor.shutdown(wait=True)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("abcd" * 10) == 11
+
+
+def test_window_keeps_latest_messages_within_budget():
+    store = MemorySessionStore()
+    window = HistoryWindow(store, summarize=None, token_budget=25, compact_at=10_000)
+    for turn in range(3):
+        store.append("s", {"role": "user", "content": f"{turn}{TEXT[1:]}"},
+                     {"role": "model", "content": TEXT})
+    contents = window.contents("s")
+    assert [c["role"] for c in contents] == ["user", "model"]
+    assert contents[0]["parts"] == [f"2{TEXT[1:]}"]
+    assert window.contents("unknown") == []
+
+
+def test_contents_are_cached_until_the_session_changes():
+    store = MemorySessionStore()
+    window = HistoryWindow(store, summarize=None, compact_at=10_000)
+    window.add_turn("s", "hi", "hello")
+    first = window.contents("s")
+    assert window.contents("s") == first
+    window.add_turn("s", "again", "hi again")
+    assert len(window.contents("s")) == 4
+    assert (window.cache_hits, window.cache_misses) == (1, 2)
+
+
+def test_old_turns_are_folded_into_the_summary():
+    calls = []
+
+    def summarize(summary, messages):
+        calls.append((summary, [m["content"] for m in messages]))
+        return f"{summary}+{len(messages)}"
+
+    store = MemorySessionStore()
+    window = HistoryWindow(store, summarize, token_budget=100, keep_tokens=20, compact_at=30)
+    store.append("s", {"role": "user", "content": TEXT}, {"role": "model", "content": TEXT})
+    window.add_turn("s", TEXT, TEXT)
+    finish_compactions(window)
+
+    record = store.load("s")
+    assert record["summary"] == "+2"
+    assert len(record["messages"]) == 2
+    assert calls == [("", [TEXT, TEXT])]
+    contents = window.contents("s")
+    assert contents[0]["parts"] == [f"{SUMMARY_PREFIX} +2"]
+    assert contents[1]["parts"] == [SUMMARY_ACK]
+    assert window.stats()["compactions"] == 1
+
+
+def test_failed_summary_keeps_the_messages():
+    def summarize(summary, messages):
+        raise RuntimeError("Gemini unavailable")
+
+    store = MemorySessionStore()
+    window = HistoryWindow(store, summarize, token_budget=100, keep_tokens=20, compact_at=30)
+    store.append("s", {"role": "user", "content": TEXT}, {"role": "model", "content": TEXT})
+    window.add_turn("s", TEXT, TEXT)
+    finish_compactions(window)
+    assert len(store.history("s")) == 4
+    assert window.compaction_failures == 1
@@ -0,0 +1,84 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from urllib3.exceptions import ConnectTimeoutError  # noqa: E402
+
+from http_client import CountingRetry, PoolStats, PooledHTTPClient  # noqa: E402
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so the pool can reuse connections
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        status = 503 if self.path == "/down" else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_requests_reuse_pooled_connections(server):
+    client = PooledHTTPClient(retries=0)
+    for _ in range(3):
+        assert client.get(f"{server}/voices").text == "ok"
+    stats = client.pool_stats()
+    assert (stats["connections_opened"], stats["connections_reused"], stats["requests"]) == (1, 2, 3)
+    client.close()
+
+
+def test_server_errors_are_counted(server):
+    client = PooledHTTPClient(retries=0)
+    assert client.get(f"{server}/down").status_code == 503
+    assert client.pool_stats()["errors"] == 1
+    client.close()
+
+
+def test_timeouts_per_endpoint():
+    client = PooledHTTPClient(timeouts={"generate": (2, 30)})
+    assert client.timeout_for("generate") == (2, 30)
+    assert client.timeout_for("voices") == PooledHTTPClient.DEFAULT_TIMEOUT
+    assert client.pool_stats()["timeouts"] == {"generate": [2, 30]}
+    client.close()
+
+
+def retry_policy(**kwargs):
+    client = PooledHTTPClient(**kwargs)
+    try:
+        return client.session.get_adapter("https://").max_retries
+    finally:
+        client.close()
+
+
+def test_post_is_only_retried_on_connect_errors():
+    retry = retry_policy(retries=2)
+    assert retry.is_retry("GET", 503)
+    assert not retry.is_retry("POST", 503)
+    assert not retry._is_method_retryable("POST")
+    assert retry.connect == 2
+
+
+def test_retry_after_is_not_followed():
+    assert retry_policy().respect_retry_after_header is False
+
+
+def test_retries_are_counted():
+    stats = PoolStats()
+    retry = CountingRetry(total=2, stats=stats)
+    retry.increment("GET", "/", error=ConnectTimeoutError())
+    assert stats.snapshot()["retries"] == 1
@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from jobs import DONE, FAILED, QUEUED, JobError, JobQueue, QueueFull, SQLiteJobStore
+
+
+def wait_finished(job, timeout=2.0):
+    job.wait_events(len(job.events), timeout)
+    while not job.finished:
+        if not job.wait_events(len(job.events), timeout):
+            break
+    assert job.finished
+    return job
+
+
+def test_job_reports_progress_and_result():
+    def work(job, text):
+        job.progress("tts", chunk=1)
+        return {"audio_url": f"/{text}.mp3"}
+
+    jobs = JobQueue(workers=1)
+    job = wait_finished(jobs.submit("tts", work, "hi"))
+    assert job.status == DONE and job.result == {"audio_url": "/hi.mp3"}
+    assert [event for event, _ in job.events] == ["status", "status", "progress", DONE]
+    assert job.to_dict()["progress"] == [{"stage": "tts", "chunk": 1}]
+    assert jobs.get(job.id) is job
+    assert jobs.stats()["completed"] == 1
+
+
+def test_failures_carry_their_payload():
+    def refused(job):
+        raise JobError({"error": "Bad input", "message": "No text"})
+
+    def broken(job):
+        raise RuntimeError("boom")
+
+    jobs = JobQueue(workers=1)
+    assert wait_finished(jobs.submit("tts", refused)).error == {"error": "Bad input", "message": "No text"}
+    failed = wait_finished(jobs.submit("tts", broken))
+    assert failed.status == FAILED and failed.error == {"error": "RuntimeError", "message": "boom"}
+    assert jobs.stats()["failed"] == 2
+
+
+def test_full_queue_rejects_with_retry_after():
+    release = threading.Event()
+    started = threading.Event()
+
+    def block(job):
+        started.set()
+        release.wait(2)
+
+    jobs = JobQueue(workers=1, max_queued=1)
+    running = jobs.submit("tts", block)
+    started.wait(2)
+    queued = jobs.submit("tts", block)
+    with pytest.raises(QueueFull) as rejected:
+        jobs.submit("tts", block)
+    assert rejected.value.retry_after >= 1
+    assert jobs.stats()["rejected"] == 1
+    release.set()
+    wait_finished(running)
+    wait_finished(queued)
+
+
+def test_finished_jobs_expire_after_ttl():
+    jobs = JobQueue(workers=1, ttl=0)
+    job = wait_finished(jobs.submit("tts", lambda job: "ok"))
+    job.finished_at -= 1
+    assert jobs.get(job.id) is None
+
+
+def test_store_lets_other_processes_read_jobs(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    jobs = JobQueue(workers=1, store=SQLiteJobStore(path))
+    job = wait_finished(jobs.submit("tts", lambda job: {"audio_url": "/a.mp3"}))
+
+    other = JobQueue(workers=1, store=SQLiteJobStore(path))
+    stored = other.get(job.id)
+    while not stored.finished and stored.wait_events(len(stored.events), timeout=2):
+        pass  # Polls the store until the worker's last save lands
+    assert stored.status == DONE
+    assert stored.to_dict()["result"] == {"audio_url": "/a.mp3"}
+    assert stored.events[-1] == (DONE, {"audio_url": "/a.mp3"})
+    assert other.get("unknown") is None
+
+
+def test_unserialisable_results_fail_the_job():
+    jobs = JobQueue(workers=1)
+    job = wait_finished(jobs.submit("tts", lambda job: {"audio": b"mp3"}))
+    assert job.status == FAILED and job.error["error"] == "TypeError"
+    assert job.result is None
+
+
+class BrokenStore:
+    """Accepts "bad" jobs, then fails every later save of them with an unexpected error"""
+
+    def save(self, job):
+        if job.kind == "bad" and job.status != QUEUED:
+            raise RuntimeError("store unavailable")
+
+    def load(self, job_id):
+        return None
+
+    def prune(self, cutoff):
+        pass
+
+
+def test_worker_survives_jobs_whose_failure_cannot_be_recorded():
+    jobs = JobQueue(workers=1, store=BrokenStore())
+    jobs.submit("bad", lambda job: "never stored")
+    good = wait_finished(jobs.submit("tts", lambda job: "ok"))
+    assert good.status == DONE
+    assert jobs.stats()["failed"] == 1
@@ -0,0 +1,42 @@
+import pytest
+
+from metrics import Counter, Histogram, Registry
+
+
+def test_counter_series_per_label_set():
+    registry = Registry()
+    errors = Counter("errors_total", "Errors", ["vendor"], registry=registry)
+    errors.inc(vendor="murf")
+    errors.inc(2, vendor="murf")
+    errors.inc(vendor="gemini")
+    assert errors.value(vendor="murf") == 3
+    text = registry.render()
+    assert "# TYPE errors_total counter" in text
+    assert 'errors_total{vendor="murf"} 3' in text
+    assert 'errors_total{vendor="gemini"} 1' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = Histogram("stage_seconds", "Latency", ["stage"], buckets=(0.1, 1.0), registry=registry)
+    for seconds in (0.05, 0.5, 5.0):
+        latency.observe(seconds, stage="tts")
+    text = registry.render()
+    assert 'stage_seconds_bucket{stage="tts",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="tts",le="1.0"} 2' in text
+    assert 'stage_seconds_bucket{stage="tts",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="tts"} 3' in text
+
+
+def test_histogram_times_failed_blocks():
+    latency = Histogram("block_seconds", "Latency", registry=None)
+    with pytest.raises(RuntimeError):
+        with latency.time():
+            raise RuntimeError()
+    assert latency.render()[-1] == "block_seconds_count 1"
+
+
+def test_collectors_and_label_escaping():
+    registry = Registry()
+    registry.add_collector(lambda: [("cache_lookups", "counter", "Lookups", [({"cache": 'a"b'}, 2)])])
+    assert 'cache_lookups{cache="a\\"b"} 2' in registry.render()
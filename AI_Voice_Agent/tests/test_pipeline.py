@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from pipeline import Middleware, Pipeline, ProgressEvents, RetryStages, Stage, StageFailed, Turn
+
+
+def transcribe(turn):
+    turn.transcription = "hello"
+
+
+def reply(turn):
+    turn.response_text = turn.transcription.upper()
+
+
+class Recorder(Middleware):
+    def __init__(self, skip=()):
+        self.skip = set(skip)
+        self.calls = []
+
+    def before(self, stage, turn):
+        return stage.name in self.skip
+
+    def after(self, stage, turn, seconds):
+        self.calls.append(("after", stage.name))
+
+    def skipped(self, stage, turn):
+        self.calls.append(("skipped", stage.name))
+
+    def failed(self, stage, turn, exc, seconds, attempt):
+        self.calls.append(("failed", stage.name, attempt))
+
+
+def test_runs_stages_in_order_and_times_them():
+    recorder = Recorder()
+    turn = Pipeline([Stage("stt", transcribe), Stage("llm", reply)], [recorder]).run(Turn())
+    assert turn.speech_text == "HELLO"
+    assert set(turn.timings) == {"stt", "llm"}
+    assert recorder.calls == [("after", "stt"), ("after", "llm")]
+
+
+def test_middleware_can_satisfy_a_stage():
+    recorder = Recorder(skip={"stt"})
+    turn = Pipeline([Stage("stt", transcribe), Stage("llm", reply)], [recorder]).run(Turn(transcription="cached"))
+    assert turn.response_text == "CACHED"
+    assert recorder.calls == [("skipped", "stt"), ("after", "llm")]
+
+
+def test_failures_are_wrapped_with_the_stage_name():
+    def broken(turn):
+        raise ValueError("bad audio")
+
+    recorder = Recorder()
+    with pytest.raises(StageFailed) as failed:
+        Pipeline([Stage("stt", broken)], [recorder]).run(Turn())
+    assert failed.value.stage == "stt" and isinstance(failed.value.cause, ValueError)
+    assert recorder.calls == [("failed", "stt", 1)]
+
+
+def test_retry_stages_retries_with_backoff(monkeypatch):
+    attempts = []
+    sleeps = []
+    monkeypatch.setattr("pipeline.time.sleep", sleeps.append)
+
+    def flaky(turn):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        turn.audio_urls = ["/a.mp3"]
+
+    retry = RetryStages(retries=2, stages=["tts"], backoff=0.5, retry_on=lambda exc: isinstance(exc, ConnectionError))
+    turn = Pipeline([Stage("tts", flaky)], [retry]).run(Turn())
+    assert turn.audio_url == "/a.mp3" and sleeps == [0.5, 1.0]
+    assert retry.failed(Stage("tts", flaky), turn, ValueError(), 0, 1) is None
+    assert retry.failed(Stage("llm", flaky), turn, ConnectionError(), 0, 1) is None
+
+
+def test_progress_events_report_what_stages_produce():
+    events = []
+    turn = Turn(on_progress=lambda stage, **data: events.append((stage, data)))
+    Pipeline([Stage("stt", transcribe, produces=("transcription",))], [ProgressEvents()]).run(turn)
+    assert events == [("stt", {"status": "started"}), ("stt", {"status": "done", "transcription": "hello"})]
+
+
+def test_run_async_awaits_coroutine_stages():
+    async def async_reply(turn):
+        await asyncio.sleep(0)
+        reply(turn)
+
+    turn = asyncio.run(Pipeline([Stage("stt", transcribe), Stage("llm", async_reply)]).run_async(Turn()))
+    assert turn.response_text == "HELLO"
+
+    async def broken(turn):
+        raise RuntimeError("Gemini down")
+
+    with pytest.raises(StageFailed):
+        asyncio.run(Pipeline([Stage("llm", broken)]).run_async(Turn()))
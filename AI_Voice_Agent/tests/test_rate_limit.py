@@ -0,0 +1,132 @@
+import asyncio
+import threading
+
+import pytest
+
+import rate_limit
+from rate_limit import Limit, MemoryBuckets, RateLimited, RateLimiter, RedisBuckets, SQLiteBuckets
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    async def async_sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    monkeypatch.setattr(rate_limit.time, "sleep", sleep)
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", async_sleep)
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def buckets(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteBuckets(str(tmp_path / "ratelimits.db"))
+    return MemoryBuckets()
+
+
+def test_parse_limits():
+    limit = Limit.parse("requests", "120/min")
+    assert (limit.capacity, limit.rate) == (120, 2)
+    assert Limit.parse("chars", "10").rate == 10
+    assert str(Limit.parse("chars", "50000/hour")) == "50000 per 3600s"
+    assert Limit.parse("off", "") is None and Limit.parse("off", "0/min") is None
+    with pytest.raises(ValueError):
+        Limit.parse("bad", "5/fortnight")
+
+
+def test_bucket_drains_then_refills(clock, buckets):
+    limit = Limit("requests", 2, 1)
+    assert buckets.take(limit, "ip", 1) == (True, 0.0)
+    assert buckets.take(limit, "ip", 1) == (True, 0.0)
+    granted, retry_after = buckets.take(limit, "ip", 1)
+    assert not granted and retry_after == pytest.approx(1.0)
+    assert buckets.take(limit, "other-ip", 1)[0]  # Separate bucket per key
+    clock[0] += 1
+    assert buckets.take(limit, "ip", 1)[0]
+
+
+def test_cost_larger_than_capacity_waits_for_a_full_bucket(clock, buckets):
+    limit = Limit("chars", 100, 10)
+    assert buckets.take(limit, "global", 500)[0]
+    granted, retry_after = buckets.take(limit, "global", 500)
+    assert not granted and retry_after == pytest.approx(10.0)
+
+
+def test_memory_buckets_drop_least_recently_used_keys(clock):
+    buckets = MemoryBuckets(max_keys=2)
+    limit = Limit("requests", 1, 1)
+    for key in ("a", "b", "c"):
+        buckets.take(limit, key, 1)
+    assert len(buckets) == 2
+    assert buckets.take(limit, "a", 1)[0]  # Forgotten, so it starts full again
+
+
+def test_limiter_counts_and_raises(clock):
+    limiter = RateLimiter(MemoryBuckets(), {"requests": Limit("requests", 1, 1), "off": None})
+    assert not limiter.enabled("off") and limiter.try_take("off") == 0.0
+    limiter.check("requests", "ip")
+    with pytest.raises(RateLimited) as limited:
+        limiter.check("requests", "ip")
+    assert limited.value.retry_after == pytest.approx(1.0)
+    assert limiter.stats()["limits"]["requests"] == {"limit": "1 per 1s", "allowed": 1, "limited": 1}
+
+
+def test_acquire_waits_up_to_max_wait(clock):
+    limiter = RateLimiter(MemoryBuckets(), {"murf": Limit("murf", 1, 1)})
+    limiter.acquire("murf")
+    limiter.acquire("murf", max_wait=2)
+    assert limiter.stats()["waited_s"] == pytest.approx(1.0)
+    with pytest.raises(RateLimited):
+        limiter.acquire("murf", max_wait=0.5)
+    asyncio.run(limiter.acquire_async("murf", max_wait=2))
+    assert limiter.stats()["waited_s"] == pytest.approx(2.0)
+
+
+def test_async_takes_leave_the_event_loop_for_shared_buckets(buckets, monkeypatch):
+    limiter = RateLimiter(buckets, {"requests": Limit("requests", 1, 1)})
+    threads = []
+    take = buckets.take
+
+    def recording_take(*args):
+        threads.append(threading.current_thread())
+        return take(*args)
+
+    monkeypatch.setattr(buckets, "take", recording_take)
+
+    async def take_twice():
+        return [await limiter.try_take_async("requests", "ip") for _ in range(2)]
+
+    granted, limited = asyncio.run(take_twice())
+    assert granted == 0.0 and limited > 0
+    assert (threads[0] is threading.main_thread()) is not buckets.blocking
+
+def test_redis_buckets_are_counted_from_their_index(clock, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis runs the take script with it
+    import redis
+    server = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis.Redis, "from_url", lambda url: server)
+    monkeypatch.setattr(server, "scan_iter", None)  # Counting must not scan the keyspace
+    buckets = RedisBuckets("redis://test")
+    limiter = RateLimiter(buckets, {"requests": Limit("requests", 2, 1)})
+    limiter.try_take("requests", "a")
+    limiter.try_take("requests", "b")
+    assert limiter.try_take("requests", "a") == 0.0
+    assert limiter.try_take("requests", "a") == pytest.approx(1.0)
+    assert len(buckets) == 2
+    clock[0] += 10  # Past both buckets' TTL (full again after 2s, +1s)
+    assert len(buckets) == 0
+
+def test_build_rate_limiter_reads_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "sqlite")
+    monkeypatch.setenv("RATE_LIMIT_DB_PATH", str(tmp_path / "rl.db"))
+    assert isinstance(rate_limit.build_rate_limiter({}).backend, SQLiteBuckets)
+    monkeypatch.delenv("RATE_LIMIT_BACKEND")
+    assert isinstance(rate_limit.build_rate_limiter({}).backend, MemoryBuckets)
@@ -0,0 +1,106 @@
+import pytest
+
+import session_store
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+def user(text):
+    return {"role": "user", "content": text}
+
+
+def model(text):
+    return {"role": "model", "content": text}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"), max_sessions=2, max_messages=3)
+    return MemorySessionStore(max_sessions=2, max_messages=3)
+
+
+def test_append_update_and_history(store):
+    assert store.history("a") == []
+    store.append("a", user("hi"), model("hello"))
+    assert store.history("a") == [user("hi"), model("hello")]
+    assert "a" in store and "b" not in store
+    assert store.update("a", lambda record: False) is False
+    store.update("a", lambda record: record.update(summary="greeting"))
+    record = store.load("a")
+    assert (record["summary"], record["rev"]) == ("greeting", 2)
+    store.delete("a")
+    assert store.load("a") is None
+
+
+def test_trims_to_max_messages_starting_with_a_user_turn(store):
+    store.append("a", user("1"), model("1"), user("2"), model("2"))
+    assert store.history("a") == [user("2"), model("2")]
+
+
+def test_evicts_least_recently_used_sessions(store, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: clock[0])
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: clock[0])
+    for session_id in ("a", "b"):
+        store.append(session_id, user(session_id))
+        clock[0] += 1
+    store.load("a")  # "b" is now the least recently used
+    clock[0] += 1
+    store.append("c", user("c"))
+    assert len(store) == 2
+    assert "b" not in store and "a" in store
+    assert store.evictions == 1
+
+
+def test_idle_sessions_expire(store, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: clock[0])
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: clock[0])
+    store.append("a", user("hi"))
+    clock[0] += store.idle_ttl + 1
+    assert store.load("a") is None
+    assert store.expired == 1
+
+
+def test_memory_store_bounds_total_bytes():
+    store = MemorySessionStore(max_bytes=600)
+    store.append("a", user("x" * 300))
+    store.append("b", user("y" * 300))
+    assert len(store) == 1 and "b" in store
+    assert store.stats()["approx_bytes"] <= 600
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+    server = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis.Redis, "from_url", lambda url: server)
+    monkeypatch.setattr(server, "scan_iter", None)  # Counting must not scan the keyspace
+    return server
+
+
+def test_redis_store_counts_sessions_from_its_index(fake_redis, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(session_store.time, "time", lambda: clock[0])
+    store = session_store.RedisSessionStore("redis://test", idle_ttl=60)
+    store.append("a", user("hi"))
+    store.append("b", user("hi"))
+    assert len(store) == 2
+    store.delete("a")
+    assert len(store) == 1
+    clock[0] += 30
+    store.load("b")  # Reading a session extends its expiry in the index too
+    clock[0] += 45
+    assert len(store) == 1
+    clock[0] += 60
+    assert len(store) == 0
+
+def test_build_session_store_reads_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_BACKEND", "sqlite")
+    monkeypatch.setenv("SESSION_DB_PATH", str(tmp_path / "s.db"))
+    monkeypatch.setenv("SESSION_IDLE_TTL", "60")
+    built = session_store.build_session_store()
+    assert isinstance(built, SQLiteSessionStore) and built.idle_ttl == 60
+    monkeypatch.setenv("SESSION_BACKEND", "memory")
+    assert isinstance(session_store.build_session_store(), MemorySessionStore)
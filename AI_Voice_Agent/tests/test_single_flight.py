@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+
+def run_concurrently(flight, key, fn, callers=5):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    return results, errors
+
+
+def slow(value, release):
+    def fn():
+        release.wait(2)
+        if isinstance(value, Exception):
+            raise value
+        return value
+    return fn
+
+
+def start_leader(flight, fn):
+    """Start one call and return once it is running, so later callers coalesce"""
+    entered = threading.Event()
+
+    def leader():
+        def run():
+            entered.set()
+            return fn()
+        try:
+            flight.do("k", run)
+        except RuntimeError:
+            pass  # The waiters' results are what is checked
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    entered.wait(2)
+    return thread
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("tts")
+    release = threading.Event()
+    leader = start_leader(flight, slow("/a.mp3", release))
+    threading.Timer(0.05, release.set).start()
+    results, errors = run_concurrently(flight, "k", lambda: "/other.mp3", callers=4)
+    leader.join(2)
+    assert results == ["/a.mp3"] * 4 and errors == []
+    assert flight.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_are_shared_and_nothing_is_cached():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader = start_leader(flight, slow(RuntimeError("Murf down"), release))
+    threading.Timer(0.05, release.set).start()
+    results, errors = run_concurrently(flight, "k", lambda: "unused", callers=3)
+    leader.join(2)
+    assert results == [] and len(errors) == 3
+    assert flight.do("k", lambda: "fresh") == "fresh"
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert [flight.do(key, lambda key=key: key) for key in "ab"] == ["a", "b"]
+    assert flight.executions == 2
+
+
+def test_async_single_flight_coalesces_coroutines():
+    flight = AsyncSingleFlight()
+    executions = []
+
+    async def fetch():
+        executions.append(time.monotonic())
+        await asyncio.sleep(0.01)
+        return "/a.mp3"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["/a.mp3"] * 5
+    assert len(executions) == 1 and flight.coalesced == 4
+
+
+def test_async_single_flight_shares_errors():
+    flight = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("Gemini down")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.executions == 1
+    with pytest.raises(RuntimeError):
+        asyncio.run(flight.do("k", fail))
@@ -0,0 +1,67 @@
+import sys
+import threading
+
+from startup import LazyClient, StartupReport, warm_in_background
+
+
+def test_report_records_phases_and_ready():
+    report = StartupReport()
+    assert report.stats()["ready_ms"] is None
+    report.mark("config")
+    report.mark("routes")
+    report.ready()
+    stats = report.stats()
+    assert list(stats["phases_ms"]) == ["config", "routes"]
+    assert stats["ready_ms"] >= 0
+
+
+def test_import_module_times_first_imports_only():
+    report = StartupReport()
+    assert report.import_module("json") is sys.modules["json"]
+    assert "json" not in report.imports  # Already imported: nothing deferred
+    sys.modules.pop("colorsys", None)
+    report.import_module("colorsys")
+    assert "colorsys" in report.stats()["deferred_imports_ms"]
+
+
+def test_lazy_client_builds_once_across_threads():
+    builds = []
+    release = threading.Event()
+
+    def factory():
+        builds.append(1)
+        release.wait(1)
+        return object()
+
+    lazy = LazyClient("gemini", factory)
+    assert not lazy.ready
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(lazy.get())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert len(builds) == 1 and len(set(map(id, results))) == 1
+    assert lazy.ready and lazy.stats()["build_ms"] is not None
+
+
+def test_lazy_client_set_skips_the_factory():
+    lazy = LazyClient("murf", lambda: 1 / 0)
+    fake = object()
+    lazy.set(fake)
+    assert lazy.get() is fake
+
+
+def test_warm_up_runs_every_task_and_records_failures():
+    report = StartupReport()
+    ran = []
+
+    def broken():
+        raise RuntimeError("no network")
+
+    warm_in_background(report, {"broken": broken, "gemini": lambda: ran.append("gemini")}).join(2)
+    assert ran == ["gemini"]
+    warm_up = report.stats()["warm_up"]
+    assert warm_up["broken"]["error"] == "no network"
+    assert warm_up["gemini"]["error"] is None
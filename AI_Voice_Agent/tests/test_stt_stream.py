@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+import stt_stream
+from stt_stream import MIN_SEND_BYTES, StreamingTranscription
+
+
+class FakeClient:
+    def __init__(self, options):
+        self.handlers = {}
+        self.sent = []
+        self.params = None
+        self.disconnected = False
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def connect(self, params):
+        self.params = params
+
+    def stream(self, data):
+        self.sent.append(data)
+
+    def disconnect(self, terminate=False):
+        self.disconnected = terminate
+
+
+FAKE_SDK = SimpleNamespace(
+    StreamingClient=FakeClient,
+    StreamingClientOptions=lambda **kwargs: kwargs,
+    StreamingParameters=lambda **kwargs: kwargs,
+    StreamingEvents=SimpleNamespace(Turn="turn", Error="error"),
+)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(stt_stream, "_streaming_sdk", lambda: FAKE_SDK)
+    session = StreamingTranscription("key")
+    session.start()
+    return session
+
+
+def drain(session):
+    events = []
+    while not session.events.empty():
+        events.append(session.events.get_nowait())
+    return events
+
+
+def test_requires_streaming_sdk(monkeypatch):
+    monkeypatch.setattr(stt_stream, "_streaming_sdk", lambda: None)
+    with pytest.raises(RuntimeError):
+        StreamingTranscription("key")
+
+
+def test_buffers_audio_until_enough_to_send(session):
+    client = session._client
+    assert client.params["sample_rate"] == 16000
+    session.send(b"\0" * (MIN_SEND_BYTES - 2))
+    assert client.sent == []
+    session.send(b"\0\0")
+    assert client.sent == [b"\0" * MIN_SEND_BYTES]
+    session.send(b"\1\1")
+    session.close()
+    session.close()
+    assert client.sent[-1] == b"\1\1"
+    assert client.disconnected
+
+
+def test_queues_partial_final_and_error_events(session):
+    on_turn = session._client.handlers["turn"]
+    on_turn(None, SimpleNamespace(transcript="hel", end_of_turn=False))
+    on_turn(None, SimpleNamespace(transcript="hello", end_of_turn=True, turn_is_formatted=False))
+    on_turn(None, SimpleNamespace(transcript="Hello.", end_of_turn=True, turn_is_formatted=True))
+    on_turn(None, SimpleNamespace(transcript="", end_of_turn=False))
+    session._client.handlers["error"](None, "socket closed")
+    assert drain(session) == [("partial", "hel"), ("final", "Hello."), ("error", "socket closed")]
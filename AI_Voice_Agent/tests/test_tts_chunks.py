@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from tts_chunks import iter_synthesized, split_sentences, split_text, synthesize_chunks
+
+
+def test_split_sentences_keeps_punctuation():
+    assert split_sentences('Hi there. "Really?" Yes!  ') == ["Hi there.", '"Really?"', "Yes!"]
+
+
+def test_split_text_packs_whole_sentences():
+    text = "One two. Three four. Five six."
+    assert split_text(text, max_chars=20) == ["One two. Three four.", "Five six."]
+    assert all(len(chunk) <= 20 for chunk in split_text(text * 10, max_chars=20))
+
+
+def test_split_text_breaks_long_sentences_and_words():
+    assert split_text("aaaa bbbb cccc.", max_chars=9) == ["aaaa bbbb", "cccc."]
+    assert split_text("x" * 12, max_chars=5) == ["xxxxx", "xxxxx", "xx"]
+    assert split_text("") == []
+
+
+def test_synthesize_chunks_runs_concurrently_and_keeps_order():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def synthesize(chunk):
+        barrier.wait()  # Only returns once all three calls are in flight
+        time.sleep(0.01 if chunk == "a" else 0)
+        return chunk.upper()
+
+    assert synthesize_chunks(["a", "b", "c"], synthesize, max_workers=3) == ["A", "B", "C"]
+
+
+def test_iter_synthesized_reraises_the_first_failure():
+    def synthesize(chunk):
+        if chunk == "bad":
+            raise RuntimeError(chunk)
+        return chunk
+
+    with pytest.raises(RuntimeError):
+        list(iter_synthesized(["ok", "bad"], synthesize, max_workers=1))
+    assert list(iter_synthesized([], synthesize)) == []
@@ -0,0 +1,45 @@
+from tempfile import SpooledTemporaryFile
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("flask")
+
+from uploads import UploadStats, copy_upload, open_upload  # noqa: E402
+
+
+def upload(data, max_size=1024):
+    stream = SpooledTemporaryFile(max_size=max_size, mode="rb+")
+    stream.write(data)
+    return SimpleNamespace(stream=stream)
+
+
+def test_open_upload_sizes_and_rewinds_without_reading():
+    reader, size, in_memory = open_upload(upload(b"abc" * 10))
+    assert (size, in_memory) == (30, 30)
+    assert not hasattr(reader, "fileno")
+    assert b"".join(reader) == b"abc" * 10
+
+
+def test_spilled_uploads_hold_no_memory():
+    _, size, in_memory = open_upload(upload(b"x" * 2048, max_size=1024))
+    assert (size, in_memory) == (2048, 0)
+
+
+def test_copy_upload_outlives_the_original():
+    original = upload(b"audio")
+    copy = copy_upload(original)
+    original.stream.close()
+    assert copy.read() == b"audio"
+
+
+def test_upload_stats_track_memory_in_flight():
+    stats = UploadStats()
+    stats.opened(100, 100)
+    stats.opened(5000, 0)
+    stats.released(100)
+    snapshot = stats.snapshot()
+    assert snapshot["uploads"] == 2
+    assert snapshot["spilled_to_disk"] == 1
+    assert snapshot["in_memory_bytes"] == 0
+    assert snapshot["peak_in_memory_bytes"] == 100
@@ -0,0 +1,111 @@
+import time
+
+from voice_catalog import VoiceCatalog
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, etag=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self):
+        if isinstance(self._data, Exception):
+            raise self._data
+        return self._data
+
+
+class FakeHTTP:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, endpoint=None, headers=None):
+        self.requests.append(headers or {})
+        return self.responses.pop(0)
+
+
+VOICES = [
+    {"voiceId": "en-US-Natalie", "locale": "en-US", "gender": "Female"},
+    {"voiceId": "en-GB-Lucy", "availableStyles": ["Calm"]},
+]
+
+
+def test_defaults_until_loaded_then_indexed_by_locale():
+    http = FakeHTTP(FakeResponse(200, {"voices": VOICES}, etag="v1"))
+    catalog = VoiceCatalog(http, "/voices", ["en-US-Mike"])
+    assert catalog.voice_ids() == ["en-US-Mike"]
+    assert catalog.refresh()
+    assert catalog.voice_ids() == ["en-US-Natalie", "en-GB-Lucy"]
+    assert [v["voiceId"] for v in catalog.by_locale("en-gb")] == ["en-GB-Lucy"]
+    assert catalog.get("en-GB-Lucy")["styles"] == ["Calm"]
+
+
+def test_conditional_refresh_keeps_snapshot_on_304():
+    http = FakeHTTP(FakeResponse(200, VOICES, etag="v1"), FakeResponse(304))
+    catalog = VoiceCatalog(http, "/voices", [])
+    catalog.refresh()
+    assert not catalog.refresh()
+    assert http.requests[1] == {"If-None-Match": "v1"}
+    assert len(catalog.voice_ids()) == 2
+
+
+def test_malformed_entries_are_skipped():
+    voices = VOICES + [{"voiceId": None}, {"displayName": "No id"}, "junk", {"voiceId": 7}]
+    catalog = VoiceCatalog(FakeHTTP(FakeResponse(200, voices)), "/voices", [])
+    assert catalog.refresh()
+    assert catalog.voice_ids() == ["en-US-Natalie", "en-GB-Lucy"]
+
+
+def test_failed_refresh_keeps_current_catalogue():
+    catalog = VoiceCatalog(FakeHTTP(FakeResponse(500)), "/voices", ["en-US-Mike"])
+    assert not catalog.refresh()
+    assert catalog.voice_ids() == ["en-US-Mike"]
+    assert catalog.failures == 1
+
+
+def test_invalid_json_is_a_failure_and_the_refresh_thread_survives():
+    bad = FakeResponse(200, ValueError("Expecting value"))
+    http = FakeHTTP(*[bad] * 5)
+    catalog = VoiceCatalog(http, "/voices", ["en-US-Mike"], refresh_interval=0.01)
+    catalog.start()
+    deadline = time.monotonic() + 2
+    while catalog.failures < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    catalog.stop()
+    assert catalog.failures >= 3  # Still refreshing after the first bad body
+    assert catalog.voice_ids() == ["en-US-Mike"]
+
+
+def test_refresh_thread_survives_unexpected_errors(monkeypatch):
+    catalog = VoiceCatalog(FakeHTTP(), "/voices", [], refresh_interval=0.01)
+    calls = []
+
+    def sync():
+        calls.append(1)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(catalog, "sync", sync)
+    thread = catalog.start()
+    deadline = time.monotonic() + 2
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert thread.is_alive()
+    catalog.stop()
+    thread.join(2)
+    assert len(calls) >= 2
+
+
+def test_unusable_shared_lock_falls_back_to_a_direct_refresh(tmp_path):
+    path = tmp_path / "voices.json"
+    (tmp_path / "voices.json.lock").mkdir()  # open() on the lock file fails
+    catalog = VoiceCatalog(FakeHTTP(FakeResponse(200, VOICES)), "/voices", [], shared_path=str(path))
+    catalog.sync()
+    assert catalog.voice_ids() == ["en-US-Natalie", "en-GB-Lucy"]
+
+def test_forced_refresh_with_invalid_json_still_lists_voices(app_module, monkeypatch):
+    catalog = VoiceCatalog(FakeHTTP(FakeResponse(200, ValueError("Expecting value"))), "/voices", ["en-US-Mike"])
+    monkeypatch.setattr(app_module, "voice_catalog", catalog)
+    response = app_module.app.test_client().get("/get_voices?refresh=1")
+    assert response.status_code == 200
+    assert response.get_json() == {"voices": ["en-US-Mike"]}
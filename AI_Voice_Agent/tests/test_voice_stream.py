@@ -0,0 +1,54 @@
+import pytest
+
+from tts_chunks import SentenceBuffer
+from voice_stream import iter_text, sse_event, stream_speech
+
+
+class Chunk:
+    def __init__(self, text):
+        self._text = text
+
+    @property
+    def text(self):
+        if self._text is None:
+            raise ValueError("no text parts")
+        return self._text
+
+
+def test_sentence_buffer_releases_complete_sentences():
+    buffer = SentenceBuffer(min_chars=5)
+    assert buffer.feed("Hi. How are") == []  # "Hi." is too short to send on its own
+    assert buffer.feed(" you today? I am") == ["Hi. How are you today?"]
+    assert buffer.flush() == ["I am"]
+    assert buffer.flush() == []
+
+
+def test_iter_text_skips_chunks_without_text():
+    assert list(iter_text([Chunk("a"), Chunk(None), Chunk(""), Chunk("b")])) == ["a", "b"]
+
+
+def test_sse_event_frame():
+    assert sse_event("done", {"ok": True}) == 'event: done\ndata: {"ok": true}\n\n'
+
+
+def test_stream_speech_yields_ordered_text_and_audio_then_done():
+    stream = iter(["First sentence here. Second", " sentence here. Tail"])
+    events = list(stream_speech(stream, lambda sentence: f"/audio/{len(sentence)}", min_chars=5))
+    assert events == [
+        ("text", {"index": 0, "text": "First sentence here."}),
+        ("audio", {"index": 0, "audio_url": "/audio/20", "text": "First sentence here."}),
+        ("text", {"index": 1, "text": "Second sentence here."}),
+        ("audio", {"index": 1, "audio_url": "/audio/21", "text": "Second sentence here."}),
+        ("text", {"index": 2, "text": "Tail"}),
+        ("audio", {"index": 2, "audio_url": "/audio/4", "text": "Tail"}),
+        ("done", {"llm_response": "First sentence here. Second sentence here. Tail"}),
+    ]
+
+
+def test_stream_speech_surfaces_llm_errors():
+    def broken():
+        yield "Some text. "
+        raise RuntimeError("stream dropped")
+
+    with pytest.raises(RuntimeError):
+        list(stream_speech(broken(), lambda sentence: sentence, min_chars=1))
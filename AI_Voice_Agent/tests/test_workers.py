@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from workers import StickyRouter, _rewrite_head, rank_workers, session_key, use_shared_state  # noqa: E402
+
+
+def test_session_key_from_path_or_query():
+    assert session_key(b"POST /agent/chat/abc123 HTTP/1.1\r\nHost: x\r\n\r\n") == b"abc123"
+    assert session_key(b"GET /ws/transcribe/s1?x=1 HTTP/1.1\r\n\r\n") == b"s1"
+    assert session_key(b"POST /jobs?voice=a&session_id=s2 HTTP/1.1\r\n\r\n") == b"s2"
+    assert session_key(b"GET /get_voices HTTP/1.1\r\n\r\n") is None
+    assert session_key(b"garbage") is None
+
+
+def test_rendezvous_ranking_is_stable_and_moves_few_keys():
+    keys = [f"session-{n}".encode() for n in range(200)]
+    assert rank_workers(b"abc", 4) == rank_workers(b"abc", 4)
+    assert sorted(rank_workers(b"abc", 4)) == [0, 1, 2, 3]
+    # Adding a fifth worker only moves the sessions that now rank it first
+    moved = [key for key in keys if rank_workers(key, 4)[0] != rank_workers(key, 5)[0]]
+    assert all(rank_workers(key, 5)[0] == 4 for key in moved)
+    assert 0 < len(moved) < len(keys) / 2
+
+
+def test_rewrite_head_forces_close_and_forwards_the_client():
+    head = b"GET / HTTP/1.1\r\nHost: x\r\nConnection: keep-alive\r\nX-Forwarded-For: 6.6.6.6\r\n\r\n"
+    assert _rewrite_head(head, "10.0.0.1") == (
+        b"GET / HTTP/1.1\r\nHost: x\r\nX-Forwarded-For: 10.0.0.1\r\nConnection: close\r\n\r\n"
+    )
+    upgrade = b"GET /ws HTTP/1.1\r\nConnection: Upgrade\r\nUpgrade: websocket\r\n\r\n"
+    assert b"Connection: Upgrade" in _rewrite_head(upgrade, "10.0.0.1")
+
+
+def test_use_shared_state_keeps_explicit_settings(monkeypatch, tmp_path):
+    monkeypatch.setenv("SESSION_DB_PATH", "/custom/sessions.db")
+    monkeypatch.delenv("JOB_DB_PATH", raising=False)
+    monkeypatch.delenv("SESSION_BACKEND", raising=False)
+    use_shared_state(str(tmp_path))
+    assert os.environ["SESSION_DB_PATH"] == "/custom/sessions.db"
+    assert os.environ["JOB_DB_PATH"] == os.path.join(str(tmp_path), "jobs.db")
+    assert os.environ["SESSION_BACKEND"] == "sqlite"
+
+
+def test_router_sends_a_session_to_its_worker():
+    async def worker(index, reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 1\r\n\r\n%d" % index)
+        await writer.drain()
+        writer.close()
+
+    async def request(port, target):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET " + target + b" HTTP/1.1\r\nHost: x\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return int(response.rsplit(b"\r\n\r\n", 1)[1])
+
+    async def main():
+        servers = [await asyncio.start_server(lambda r, w, i=i: worker(i, r, w), "127.0.0.1", 0) for i in range(3)]
+        ports = [server.sockets[0].getsockname()[1] for server in servers]
+        router = StickyRouter("127.0.0.1", 0, ports)
+        front = await asyncio.start_server(router._handle, "127.0.0.1", 0)
+        port = front.sockets[0].getsockname()[1]
+
+        expected = rank_workers(b"abc", 3)
+        answered = [await request(port, b"/agent/chat/abc") for _ in range(3)]
+        servers[expected[0]].close()
+        await servers[expected[0]].wait_closed()
+        failover = await request(port, b"/agent/chat/abc")
+        for server in servers + [front]:
+            server.close()
+        return expected, answered, failover
+
+    expected, answered, failover = asyncio.run(main())
+    assert answered == [expected[0]] * 3
+    assert failover == expected[1]
@@ -0,0 +1,117 @@
+"""Sentence-aware text chunking and concurrent TTS synthesis"""
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Murf rejects requests longer than this many characters
+MURF_MAX_CHARS = 3000
+
+_SENTENCE_END = re.compile(r"(?:(?<=[.!?。][\"')\]])|(?<=[.!?。]))\s+")
+
+
+def split_sentences(text):
+    """Split text into sentences, keeping the trailing punctuation"""
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _split_long(sentence, max_chars):
+    """Break a single over-long sentence on word boundaries"""
+    parts, current = [], ""
+    for word in sentence.split():
+        while len(word) > max_chars:  # A single "word" longer than the limit
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(word[:max_chars])
+            word = word[max_chars:]
+        candidate = f"{current} {word}" if current else word
+        if len(candidate) > max_chars:
+            parts.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_text(text, max_chars=MURF_MAX_CHARS):
+    """Pack whole sentences into chunks of at most `max_chars` characters"""
+    chunks, current = [], ""
+    for sentence in split_sentences(text):
+        if len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_long(sentence, max_chars))
+            continue
+        candidate = f"{current} {sentence}" if current else sentence
+        if len(candidate) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def iter_synthesized(chunks, synthesize, max_workers=4):
+    """Synthesise chunks concurrently, yielding `(index, result)` as each finishes
+
+    `synthesize` is called once per chunk and may raise; the first exception is
+    re-raised to the caller and the remaining chunks are cancelled.
+    """
+    if not chunks:
+        return
+    workers = max(1, min(max_workers, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as pool:
+        futures = {pool.submit(synthesize, chunk): index for index, chunk in enumerate(chunks)}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def synthesize_chunks(chunks, synthesize, max_workers=4):
+    """Synthesise chunks concurrently and return the results in chunk order"""
+    results = [None] * len(chunks)
+    for index, result in iter_synthesized(chunks, synthesize, max_workers):
+        results[index] = result
+    return results
+
+
+class SentenceBuffer:
+    """Accumulate streamed text and release complete sentences as they appear"""
+
+    def __init__(self, min_chars=20, max_chars=MURF_MAX_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._pending = ""
+
+    def feed(self, text):
+        """Add streamed text; return any sentences that are now complete"""
+        self._pending += text
+        ready = []
+        while True:
+            match = None
+            for candidate in _SENTENCE_END.finditer(self._pending):
+                # Very short fragments ("Hi.") are merged with what follows
+                if candidate.start() >= self.min_chars:
+                    match = candidate
+                    break
+            if match is None:
+                break
+            ready.append(self._pending[:match.start()].strip())
+            self._pending = self._pending[match.end():]
+        if len(self._pending) > self.max_chars:
+            parts = split_text(self._pending, self.max_chars)
+            ready.extend(parts[:-1])
+            self._pending = parts[-1] if parts else ""
+        return [s for s in ready if s]
+
+    def flush(self):
+        """Return whatever text is left once the stream has ended"""
+        rest, self._pending = self._pending.strip(), ""
+        return split_text(rest, self.max_chars) if rest else []
@@ -0,0 +1,114 @@
+"""Upload handling that passes the spooled request body on without copying it
+
+Werkzeug parses each file part into a SpooledTemporaryFile: kept in memory
+up to a threshold, spilled to a temp file beyond it. The helpers here hand
+that same object to the transcriber instead of `read()`-ing it into a new
+`bytes` (and then copying it again into `io.BytesIO`).
+"""
+import os
+import shutil
+import threading
+from tempfile import SpooledTemporaryFile
+
+from flask import Request
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SpooledUploadRequest(Request):
+    """Flask request whose file parts stay in memory only up to `spool_max_size` bytes"""
+
+    spool_max_size = 512 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=self.spool_max_size, mode="rb+")
+
+
+class UploadReader:
+    """Read-only view of an upload stream for HTTP clients
+
+    httpx sizes file bodies with `fileno()` when it exists, which makes a
+    SpooledTemporaryFile write its in-memory buffer out to disk. This wrapper
+    only offers read/seek/tell, so the body is sent with a Content-Length
+    straight from wherever it already lives.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._stream.seek(offset, whence)
+
+    def tell(self):
+        return self._stream.tell()
+
+    def __iter__(self):
+        chunk = self._stream.read(CHUNK_SIZE)
+        while chunk:
+            yield chunk
+            chunk = self._stream.read(CHUNK_SIZE)
+
+
+def open_upload(file_storage):
+    """Return (reader, size, in_memory_bytes) for an uploaded file, rewound, without reading it"""
+    stream = file_storage.stream
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+    # A SpooledTemporaryFile that has rolled over lives on disk, not in RAM
+    in_memory = 0 if getattr(stream, "_rolled", False) else size
+    return UploadReader(stream), size, in_memory
+
+
+def copy_upload(file_storage, max_size=512 * 1024):
+    """Copy an upload into a spooled file that outlives the request, rewound
+
+    Werkzeug closes the request's own file parts when the request ends, so
+    work handed to a background job needs its own copy.
+    """
+    copy = SpooledTemporaryFile(max_size=max_size, mode="w+b")
+    stream = file_storage.stream
+    stream.seek(0)
+    shutil.copyfileobj(stream, copy, CHUNK_SIZE)
+    copy.seek(0)
+    return copy
+
+
+class UploadStats:
+    """How much upload data requests hold in memory, per request and in total"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.spilled_to_disk = 0
+        self.bytes_received = 0
+        self.in_memory = 0
+        self.peak_in_memory = 0
+        self.peak_request_memory = 0
+
+    def opened(self, size, in_memory):
+        with self._lock:
+            self.uploads += 1
+            self.bytes_received += size
+            if size and not in_memory:
+                self.spilled_to_disk += 1
+            self.in_memory += in_memory
+            self.peak_in_memory = max(self.peak_in_memory, self.in_memory)
+            self.peak_request_memory = max(self.peak_request_memory, in_memory)
+
+    def released(self, in_memory):
+        with self._lock:
+            self.in_memory -= in_memory
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "spilled_to_disk": self.spilled_to_disk,
+                "bytes_received": self.bytes_received,
+                "in_memory_bytes": self.in_memory,
+                "peak_in_memory_bytes": self.peak_in_memory,
+                "peak_request_memory_bytes": self.peak_request_memory,
+            }
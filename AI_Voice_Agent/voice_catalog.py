@@ -0,0 +1,235 @@
+"""In-memory Murf voice catalogue with background, conditional refresh"""
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl  # Unix only; without it every worker fetches the catalogue itself
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _normalise(voice):
+    """Catalogue entry for one voice from Murf, or None if it has no usable voiceId"""
+    voice_id = voice.get("voiceId") if isinstance(voice, dict) else None
+    if not voice_id or not isinstance(voice_id, str):
+        return None  # One malformed entry must not fail the whole refresh
+    return {
+        "voiceId": voice_id,
+        "displayName": voice.get("displayName"),
+        "locale": str(voice.get("locale") or voice_id.rsplit("-", 1)[0]),
+        "gender": voice.get("gender"),
+        "accent": voice.get("accent"),
+        "styles": voice.get("availableStyles") or voice.get("styles") or [],
+    }
+
+
+class VoiceCatalog:
+    """Voice metadata indexed by id and by locale
+
+    Reads never touch the network: they are served from the last snapshot
+    (or `defaults` until the first load completes). `refresh()` sends the last
+    ETag as If-None-Match so an unchanged catalogue costs a 304 and no parsing.
+
+    With `shared_path`, worker processes on one host share one catalogue: the
+    last snapshot is kept in that JSON file, and a file lock makes sure only
+    one worker per refresh interval asks Murf while the others load its result.
+    """
+
+    def __init__(self, http, url, defaults, refresh_interval=3600, shared_path=None):
+        self.http = http
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.shared_path = shared_path
+        self.shared_loads = 0
+        self.etag = None
+        self.loaded_at = None
+        self.checked_at = None
+        self.refreshes = 0
+        self.not_modified = 0
+        self.failures = 0
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = self._build([{"voiceId": v} for v in defaults])
+        self._shared_mtime = None
+        if shared_path and os.path.dirname(shared_path):
+            os.makedirs(os.path.dirname(shared_path), exist_ok=True)
+
+    @staticmethod
+    def _build(voices):
+        by_id, by_locale = {}, {}
+        for voice in voices:
+            entry = _normalise(voice)
+            if entry is None:
+                continue
+            by_id[entry["voiceId"]] = entry
+            by_locale.setdefault(entry["locale"].lower(), []).append(entry["voiceId"])
+        return list(by_id), by_id, by_locale
+
+    # ---------- reads ----------
+
+    def voice_ids(self):
+        return list(self._snapshot[0])
+
+    def has(self, voice_id):
+        return voice_id in self._snapshot[1]
+
+    def get(self, voice_id):
+        return self._snapshot[1].get(voice_id)
+
+    def by_locale(self, locale):
+        ids, by_id, by_locale = self._snapshot
+        return [by_id[v] for v in by_locale.get(locale.lower(), [])]
+
+    def locales(self):
+        return sorted(self._snapshot[2])
+
+    def all(self):
+        ids, by_id, _ = self._snapshot
+        return [by_id[v] for v in ids]
+
+    # ---------- refresh ----------
+
+    def refresh(self, force=False):
+        """Fetch the catalogue from Murf; returns True if the snapshot changed"""
+        with self._refresh_lock:
+            headers = {}
+            if self.etag and not force:
+                headers["If-None-Match"] = self.etag
+            try:
+                response = self.http.get(self.url, endpoint="voices", headers=headers)
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Voice fetch error, keeping current catalogue: {str(e)}")
+                return False
+
+            self.checked_at = time.time()
+            if response.status_code == 304:
+                self.not_modified += 1
+                self._save_shared()
+                return False
+            if response.status_code != 200:
+                self.failures += 1
+                logger.warning(f"Voice fetch failed: {response.status_code}")
+                return False
+
+            try:
+                data = response.json()
+            except ValueError as e:
+                self.failures += 1
+                logger.warning(f"Voice fetch returned invalid JSON, keeping current catalogue: {str(e)}")
+                return False
+            # Handle different API response formats
+            voices = data if isinstance(data, list) else data.get("voices", []) if isinstance(data, dict) else []
+            snapshot = self._build(voices)
+            if not snapshot[0]:
+                return False
+
+            self._snapshot = snapshot  # Atomic swap; readers never see a half-built index
+            self.etag = response.headers.get("ETag")
+            self.loaded_at = self.checked_at
+            self.refreshes += 1
+            self._save_shared()
+            return True
+
+    # ---------- sharing between worker processes ----------
+
+    def _save_shared(self):
+        if not self.shared_path:
+            return
+        ids, by_id, _ = self._snapshot
+        data = {
+            "etag": self.etag,
+            "loaded_at": self.loaded_at,
+            "checked_at": self.checked_at,
+            "voices": [by_id[v] for v in ids],
+        }
+        tmp_path = f"{self.shared_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.shared_path)  # Readers see the old file or the new one
+            self._shared_mtime = os.stat(self.shared_path).st_mtime
+        except OSError as e:
+            logger.warning(f"Could not write shared voice catalogue: {str(e)}")
+
+    def _load_shared(self):
+        """Adopt the shared snapshot if another worker wrote a newer one"""
+        try:
+            mtime = os.stat(self.shared_path).st_mtime
+            if mtime == self._shared_mtime:
+                return
+            with open(self.shared_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        snapshot = self._build(data.get("voices", []))
+        if snapshot[0]:
+            self._snapshot = snapshot
+            self.etag = data.get("etag")
+            self.loaded_at = data.get("loaded_at")
+            self.checked_at = data.get("checked_at")
+            self.shared_loads += 1
+        self._shared_mtime = mtime
+
+    def _sync_shared(self):
+        """Load the shared snapshot; refresh from Murf only if nobody did recently"""
+        try:
+            lock = open(self.shared_path + ".lock", "a")
+        except OSError as e:
+            logger.warning(f"Shared voice catalogue unavailable, refreshing directly: {str(e)}")
+            self.refresh()
+            return
+        with lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX)  # Other workers wait here, then load our result
+                except OSError as e:
+                    logger.warning(f"Could not lock shared voice catalogue: {str(e)}")
+            self._load_shared()
+            if self.checked_at is None or time.time() - self.checked_at >= self.refresh_interval * 0.9:
+                self.refresh()
+
+    def sync(self):
+        """One scheduled refresh: straight from Murf, or through the shared snapshot"""
+        if self.shared_path:
+            self._sync_shared()
+        else:
+            self.refresh()
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:  # A bad refresh must not end the refresh thread
+                logger.warning(f"Voice catalogue refresh failed: {str(e)}")
+            if self._stop.wait(self.refresh_interval):
+                return
+
+    def start(self):
+        """Load now and keep refreshing on `refresh_interval` in a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="voice-catalog", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "voices": len(self._snapshot[0]),
+            "locales": len(self._snapshot[2]),
+            "etag": self.etag,
+            "loaded_at": self.loaded_at,
+            "checked_at": self.checked_at,
+            "refreshes": self.refreshes,
+            "shared_loads": self.shared_loads,
+            "not_modified": self.not_modified,
+            "failures": self.failures,
+        }
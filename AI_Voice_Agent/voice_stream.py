@@ -0,0 +1,72 @@
+"""Incremental LLM -> TTS streaming delivered as Server-Sent Events"""
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tts_chunks import SentenceBuffer
+
+_END = object()
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iter_text(llm_stream):
+    """Yield the text of each chunk of a streamed Gemini response"""
+    for chunk in llm_stream:
+        try:
+            text = chunk.text
+        except (ValueError, AttributeError):  # Chunks without text parts (e.g. safety stops)
+            continue
+        if text:
+            yield text
+
+
+def stream_speech(text_stream, synthesize, max_workers=4, min_chars=20):
+    """Turn streamed LLM text into ordered `(event, data)` pairs
+
+    A producer thread reads `text_stream`, cuts it into sentences and submits
+    each one to `synthesize` as soon as it is complete, so TTS for the first
+    sentence overlaps with the LLM still generating the rest. Audio events are
+    yielded strictly in sentence order; the final `done` event carries the full
+    response text.
+    """
+    ordered = queue.Queue()
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-stream")
+    parts = []
+
+    def produce():
+        buffer = SentenceBuffer(min_chars=min_chars)
+        index = 0
+        try:
+            for text in text_stream:
+                parts.append(text)
+                for sentence in buffer.feed(text):
+                    ordered.put((index, sentence, pool.submit(synthesize, sentence)))
+                    index += 1
+            for sentence in buffer.flush():
+                ordered.put((index, sentence, pool.submit(synthesize, sentence)))
+                index += 1
+        except Exception as e:
+            ordered.put(e)
+        finally:
+            ordered.put(_END)
+
+    producer = threading.Thread(target=produce, name="llm-stream", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = ordered.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            index, sentence, future = item
+            yield "text", {"index": index, "text": sentence}
+            yield "audio", {"index": index, "audio_url": future.result(), "text": sentence}
+        yield "done", {"llm_response": "".join(parts)}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,320 @@
+"""Serve the voice agent from several worker processes on one host
+
+    python workers.py --workers 4 --port 5000            # Flask, all workers on one socket
+    python workers.py --workers 4 --port 5000 --asgi     # asgi.py under uvicorn in each worker
+    python workers.py --workers 4 --port 5000 --sticky   # a session always reaches the same worker
+
+The app is imported once, here, with PREFORK=1 and then forked into
+`--workers` processes that share its memory pages. Each worker opens its own
+vendor connections and SQLite handles after the fork (the classes holding them
+register fork hooks) and starts its own background threads. State every
+worker must see - sessions, rate-limit buckets, the TTS/STT caches, the voice
+catalogue and background jobs - lives in files under --state-dir unless the
+environment already configures it. Workers that exit are restarted.
+
+Without --sticky all workers accept() on one listening socket and the kernel
+spreads connections across them. With --sticky each worker listens on its own
+loopback port and a router process sends each request to the worker
+picked for its session ID by rendezvous hashing, so the worker that answered
+a session's last turn (and has its history window cached) answers the next
+one; requests without a session ID go round-robin.
+"""
+import argparse
+import asyncio
+import functools
+import hashlib
+import itertools
+import logging
+import os
+import re
+import signal
+import socket
+import sys
+import time
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger("workers")
+
+# Environment defaults that put shared state in --state-dir (paths are relative to it)
+SHARED_STATE = {
+    "SESSION_BACKEND": "sqlite",
+    "SESSION_DB_PATH": "sessions.db",
+    "RATE_LIMIT_BACKEND": "sqlite",
+    "RATE_LIMIT_DB_PATH": "ratelimits.db",
+    "TTS_CACHE_PATH": "tts_cache.db",
+    "STT_CACHE_PATH": "stt_cache.db",
+    "VOICE_CATALOG_PATH": "voices.json",
+    "JOB_DB_PATH": "jobs.db",
+    "BLOB_DIR": "blobs",
+}
+
+RESTART_DELAY = 1.0  # Seconds before restarting a worker that died right after starting
+ROUTER_BUFFER = 64 * 1024
+SESSION_PATH = re.compile(rb"^/(?:agent/chat|ws/transcribe)/([^/?#]+)")
+SESSION_QUERY = re.compile(rb"[?&]session_id=([^&#]+)")
+
+
+def use_shared_state(state_dir):
+    """Point every per-process store at files in `state_dir` unless already configured"""
+    for name, value in SHARED_STATE.items():
+        if not name.endswith("_BACKEND"):
+            value = os.path.join(state_dir, value)
+        os.environ.setdefault(name, value)
+
+
+# ---------- sticky routing ----------
+
+def session_key(head):
+    """Session ID in the request line of a raw HTTP request head, or None"""
+    request_line = head.split(b"\r\n", 1)[0].split(b" ")
+    if len(request_line) < 2:
+        return None
+    target = request_line[1]
+    match = SESSION_PATH.match(target) or SESSION_QUERY.search(target)
+    return match.group(1) if match else None
+
+
+def rank_workers(key, workers):
+    """Worker indices by rendezvous-hash weight for `key`, best first
+
+    A key always maps to the same worker, and if that worker is down its
+    requests move to the next one in its own ranking rather than reshuffling
+    every other session.
+    """
+    return sorted(
+        range(workers),
+        key=lambda index: hashlib.blake2b(b"%s/%d" % (key, index), digest_size=8).digest(),
+        reverse=True
+    )
+
+
+def _rewrite_head(head, peer):
+    """One request per connection (so each is routed), with the client's address forwarded"""
+    lines = head[:-4].split(b"\r\n")
+    upgrade = any(line.lower().startswith(b"upgrade:") for line in lines[1:])
+    kept = [lines[0]]
+    for line in lines[1:]:
+        name = line.split(b":", 1)[0].strip().lower()
+        if name == b"x-forwarded-for" or (name == b"connection" and not upgrade):
+            continue
+        kept.append(line)
+    kept.append(b"X-Forwarded-For: " + peer.encode())
+    if not upgrade:
+        kept.append(b"Connection: close")
+    return b"\r\n".join(kept) + b"\r\n\r\n"
+
+
+class StickyRouter:
+    """TCP router in front of the workers' loopback ports
+
+    It reads a request head, picks a worker from the session ID and then
+    just relays bytes both ways. Requests are sent with "Connection: close"
+    so the next request on a client connection is routed again; WebSocket
+    upgrades stay on their worker for the life of the socket.
+    """
+
+    def __init__(self, host, port, worker_ports):
+        self.host = host
+        self.port = port
+        self.worker_ports = worker_ports
+        self._round_robin = itertools.count()
+        self.routed = [0] * len(worker_ports)
+
+    def _candidates(self, key):
+        if key is not None:
+            return rank_workers(key, len(self.worker_ports))
+        start = next(self._round_robin) % len(self.worker_ports)
+        return [(start + offset) % len(self.worker_ports) for offset in range(len(self.worker_ports))]
+
+    async def _connect(self, key):
+        for index in self._candidates(key):
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", self.worker_ports[index])
+            except OSError:
+                continue  # Restarting; the next worker in this key's ranking takes over
+            self.routed[index] += 1
+            return reader, writer
+        return None, None
+
+    async def _pipe(self, reader, writer):
+        try:
+            while True:
+                chunk = await reader.read(ROUTER_BUFFER)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            try:
+                if writer.can_write_eof():
+                    writer.write_eof()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _handle(self, client_reader, client_writer):
+        upstream_writer = None
+        try:
+            try:
+                head = await client_reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            upstream_reader, upstream_writer = await self._connect(session_key(head))
+            if upstream_writer is None:
+                client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            peer = client_writer.get_extra_info("peername")
+            upstream_writer.write(_rewrite_head(head, peer[0] if peer else "unknown"))
+            to_worker = asyncio.ensure_future(self._pipe(client_reader, upstream_writer))
+            # The worker closes once it has answered; then the exchange is over
+            await self._pipe(upstream_reader, client_writer)
+            to_worker.cancel()
+        finally:
+            for writer in (client_writer, upstream_writer):
+                if writer is not None:
+                    writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port, reuse_address=True)
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        asyncio.run(self.serve())
+
+
+# ---------- workers ----------
+
+def listen(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    return sock
+
+
+def serve_worker(sock, use_asgi):
+    """Worker process body: start this process's background tasks, then serve on `sock`"""
+    import app as flask_app
+    flask_app.start_background_tasks()
+    if use_asgi:
+        import uvicorn
+        import asgi
+        uvicorn.Server(uvicorn.Config(asgi.app, log_level="warning")).run(sockets=[sock])
+    else:
+        from werkzeug.serving import make_server
+        host, port = sock.getsockname()[:2]
+        make_server(host, port, flask_app.app, threaded=True, fd=sock.fileno()).serve_forever()
+
+
+class Supervisor:
+    """Forks one process per target and restarts the ones that exit
+
+    `targets` are (name, callable) pairs; each callable is run in its own
+    child process. The supervisor itself starts no threads, so every fork,
+    including restarts, copies a single-threaded process.
+    """
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.children = {}  # pid -> (target index, started)
+        self.restarts = 0
+        self.stopping = False
+
+    def spawn(self, index):
+        name, target = self.targets[index]
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            status = 1
+            try:
+                target()
+                status = 0
+            except BaseException:
+                logger.exception(f"{name} crashed")
+            finally:
+                os._exit(status)
+        self.children[pid] = (index, time.monotonic())
+        logger.info(f"{name} started (pid {pid})")
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Start every target, then restart any that exits until stopped"""
+        for index in range(len(self.targets)):
+            self.spawn(index)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index, started = self.children.pop(pid, (None, None))
+            if index is None or self.stopping:
+                continue
+            logger.warning(f"{self.targets[index][0]} (pid {pid}) exited with status {status}, restarting")
+            if time.monotonic() - started < RESTART_DELAY:
+                time.sleep(RESTART_DELAY)
+            self.restarts += 1
+            self.spawn(index)
+
+
+def prepare(state_dir, sticky=False):
+    """Environment for a pre-forked run; call before the app is imported"""
+    load_dotenv()  # Before the defaults below, so .env settings win over them
+    use_shared_state(state_dir)
+    os.environ["PREFORK"] = "1"
+    if sticky:
+        os.environ.setdefault("TRUSTED_PROXIES", "1")  # The router sets X-Forwarded-For
+
+
+def run(host, port, workers, use_asgi=False, sticky=False):
+    """Fork the workers (and the router) from the already imported app and supervise them"""
+    import app  # noqa: F401 - imported once here, shared copy-on-write by the workers
+    if use_asgi:
+        import asgi  # noqa: F401
+
+    if sticky:
+        # Worker sockets belong to this process, so connections queue up while a worker restarts
+        sockets = [listen("127.0.0.1", 0) for _ in range(workers)]
+    else:
+        sockets = [listen(host, port)] * workers
+    targets = [(f"Worker {index}", functools.partial(serve_worker, sock, use_asgi))
+               for index, sock in enumerate(sockets)]
+    if sticky:
+        router = StickyRouter(host, port, [sock.getsockname()[1] for sock in sockets])
+        targets.append(("Sticky router", router.run))
+
+    supervisor = Supervisor(targets)
+    signal.signal(signal.SIGTERM, supervisor.stop)
+    signal.signal(signal.SIGINT, supervisor.stop)
+    logger.info(f"Serving on http://{host}:{port} with {workers} workers{' (sticky sessions)' if sticky else ''}")
+    supervisor.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--asgi", action="store_true", help="serve asgi.py under uvicorn in each worker")
+    parser.add_argument("--sticky", action="store_true", help="route each session ID to a consistent worker")
+    parser.add_argument("--state-dir", default="data", help="directory for the state shared by the workers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    prepare(args.state_dir, args.sticky)
+    run(args.host, args.port, args.workers, args.asgi, args.sticky)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())